@@ -0,0 +1,301 @@
+# --- analyse_locale.py ---
+# Interprétation par règles, sans modèle de langage, des plans de diffusion et des demandes de raffinage simples
+# -*- coding: utf-8 -*-
+#
+# Les formulations courantes ("5 séances à Paris (500 pers.) et 2 séances test à Rennes (100 pers.)",
+# "supprime les salles de moins de 100 places") sont reconnues en quelques microsecondes et produisent
+# le même schéma que les réponses validées du modèle (voir reponses_llm.valider_plan et valider_raffinage).
+# L'analyse est volontairement stricte : chaque mot doit être compris, sinon les fonctions retournent
+# None et l'appelant interroge le modèle de langage.
+
+import re
+
+from filtres import TERMES_EQUIPEMENT
+from geocodage import normaliser_nom_ville
+
+# Zones vagues -> villes de référence, partagées avec le prompt du plan (voir texte_expansions_zones)
+EXPANSIONS_ZONES = (
+    (("idf", "île-de-france", "région parisienne"), ("île-de-france",)),
+    (("sud", "paca", "sud de la France", "provence"), ("Marseille", "Toulouse", "Nice")),
+    (("nord", "hauts-de-france"), ("Lille",)),
+    (("ouest", "bretagne", "normandie"), ("Nantes", "Rennes", "Amiens")),
+    (("est", "grand est", "alsace"), ("Strasbourg",)),
+    (("centre", "centre-val de loire", "auvergne"), ("Clermont-Ferrand",)),
+    (("France entière", "toute la France", "province", "le territoire", "le reste du territoire français"),
+     ("Île-de-france", "Lille", "Strasbourg", "Lyon", "Marseille", "Nice",
+      "Toulouse", "Montpellier", "Bordeaux", "Limoges", "Nantes", "Rennes",
+      "Caen", "Dijon", "Clermont-Ferrand", "Orléans", "Besançon")),
+)
+VILLES_PAR_LIGNE = 6  # Mise en forme des longues listes dans le prompt
+
+NOMBRES_EN_LETTRES = {"un": 1, "une": 1, "deux": 2, "trois": 3, "quatre": 4, "cinq": 5, "six": 6, "sept": 7,
+                      "huit": 8, "neuf": 9, "dix": 10, "douze": 12, "quinze": 15, "vingt": 20}
+
+# Mots sans incidence sur le plan, tolérés autour d'une localisation (noms normalisés)
+MOTS_VIDES = {
+    "a", "au", "aux", "en", "sur", "dans", "vers", "pour", "de", "du", "des", "d'", "le", "la", "les", "l'", "un", "une",
+    "avec", "soit", "environ", "public", "total", "tout", "objectif", "cible", "max", "maximum", "min", "minimum",
+    "avant premiere", "avant premieres", "avp", "test", "tests", "projection", "projections",
+}
+
+_INDEX_EXPANSIONS = {normaliser_nom_ville(formulation): villes
+                     for formulations, villes in EXPANSIONS_ZONES for formulation in formulations}
+
+_NOMBRE = r"\d{1,3}(?:[ \u00a0\u202f.]\d{3})+|\d+"  # Séparateurs de milliers : espace, espaces insécables, point
+_NOMBRE_OU_LETTRES = rf"{_NOMBRE}|{'|'.join(NOMBRES_EN_LETTRES)}"
+_PUBLIC = re.compile(
+    rf"(?:\bentre\s+)?(?<![\w-])(?P<min>{_NOMBRE})(?P<kmin>\s*k)?\s*"
+    rf"(?:(?:-|–|à|a|et)\s*(?P<max>{_NOMBRE})(?P<kmax>\s*k)?\s*)?"
+    r"(?:pers(?:onnes)?\b\.?|spectateurs?\b|spect\b\.?|entr[ée]es\b|places\b|participants\b)",
+    re.IGNORECASE)
+_SEANCES = re.compile(rf"(?<![\w-])(?P<n>{_NOMBRE_OU_LETTRES})\s+(?:s[ée]ances?|projections?|salles?)(?![\w-])",
+                      re.IGNORECASE)
+# "... et 2 à Rennes" : nombre de séances sous-entendu après une zone qui en précise
+_SEANCES_ELIDEES = re.compile(rf"\s*(?<![\w-])(?P<n>{_NOMBRE_OU_LETTRES})(?=\s+(?:à|a|au|aux|en|dans|sur|vers)\s)",
+                              re.IGNORECASE)
+_SEPARATEURS = re.compile(r"\s*(?:[,;+\n]|(?<![\w-])(?:et|puis|ainsi que)(?![\w-]))\s*", re.IGNORECASE)
+_MARQUEUR = "§{}§"  # Remplace une audience déjà lue, avant le découpage en segments
+_MARQUEUR_MOTIF = re.compile("§(\\d+)§")
+_TOTAL = re.compile(r"(?<![\w-])(?:au total|en tout|total)(?![\w-])", re.IGNORECASE)
+
+
+def texte_expansions_zones():
+    """Table EXPANSIONS_ZONES rédigée pour le prompt du plan (une ligne par groupe de formulations)."""
+    lignes = []
+    for formulations, villes in EXPANSIONS_ZONES:
+        termes = ", ".join(f"'{formulation}'" for formulation in formulations)
+        if len(villes) <= VILLES_PAR_LIGNE:
+            liste = "[" + ", ".join(f"'{ville}'" for ville in villes) + "]"
+        else:
+            blocs = [", ".join(f"'{ville}'" for ville in villes[i:i + VILLES_PAR_LIGNE])
+                     for i in range(0, len(villes), VILLES_PAR_LIGNE)]
+            liste = "[\n" + ",\n".join(f"   {bloc}" for bloc in blocs) + "\n]"
+        lignes.append(f"- {termes} → {liste}\n")
+    return "".join(lignes)
+
+
+def _entier(texte: str):
+    texte = texte.strip().lower()
+    if texte in NOMBRES_EN_LETTRES:
+        return NOMBRES_EN_LETTRES[texte]
+    return int(re.sub(r"\D", "", texte))
+
+
+def repartir(total: int, poids: list):
+    """
+    Répartit l'entier `total` proportionnellement aux `poids` (plus forts restes) : la somme
+    des parts vaut exactement `total`, les égalités sont départagées dans l'ordre.
+    """
+    somme = sum(poids)
+    parts = [total * p // somme for p in poids]
+    restes = sorted(range(len(poids)), key=lambda i: (-(total * poids[i] % somme), i))
+    for i in restes[:total - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+
+def _mots(texte: str):
+    texte = re.sub(r"[()\[\]:!?.]", " ", texte.replace("’", "'"))
+    return re.sub(r"(?i)\b([ld])'\s*", r"\1' ", texte).split()
+
+
+def _libelle(mots: list):
+    lieu = " ".join(mots).replace("' ", "'")
+    return lieu.title() if lieu == lieu.lower() else lieu
+
+
+def trouver_lieu(texte: str, est_connu, expansions: bool = True):
+    """
+    Localisation désignée par `texte`, entourée au plus de mots vides ("à", "la", "avant-première"...).
+    Retourne la liste des villes (expansion d'une zone vague, ou le lieu lui-même si `est_connu(lieu)`),
+    [] si `texte` ne contient que des mots vides, None si un mot n'est pas compris.
+    """
+    mots = _mots(texte)
+    vides = [normaliser_nom_ville(mot) in MOTS_VIDES for mot in mots]
+    if all(vides):
+        return []
+    candidats = []
+    for debut in range(len(mots)):
+        for fin in range(len(mots), debut, -1):
+            candidats.append(_libelle(mots[debut:fin]))
+            if not vides[fin - 1]:
+                break
+        if not vides[debut]:
+            break
+    # Les zones vagues d'abord : "le sud" est aussi connu du géocodeur, comme une seule ville
+    if expansions:
+        for candidat in candidats:
+            if normaliser_nom_ville(candidat) in _INDEX_EXPANSIONS:
+                return list(_INDEX_EXPANSIONS[normaliser_nom_ville(candidat)])
+    for candidat in candidats:
+        if normaliser_nom_ville(candidat) not in MOTS_VIDES and est_connu(candidat):
+            return [candidat]
+    return None
+
+
+def _public(correspondance):
+    """Nombre de spectateurs visé : la valeur, ou le milieu de la fourchette (bornes ordonnées)."""
+    minimum = _entier(correspondance["min"]) * (1000 if correspondance["kmin"] else 1)
+    if correspondance["max"] is None:
+        return minimum
+    maximum = _entier(correspondance["max"]) * (1000 if correspondance["kmax"] else 1)
+    if maximum < minimum:
+        return None
+    return (minimum + maximum) // 2
+
+
+def analyser_plan(texte: str, est_connu):
+    """
+    Interprète un plan de diffusion simple : segments "N séances à <lieu> (X pers.)" séparés par
+    des virgules ou "et" ("N à <lieu>" après une zone qui précise ses séances), fourchettes ("entre 30 000 et 40 000 spectateurs"), zones vagues de
+    EXPANSIONS_ZONES, et au plus une audience commune ("..., 40 000 spectateurs au total")
+    répartie entre les zones au prorata des séances. `est_connu(lieu)` indique si un lieu se
+    géocode localement. Retourne les instructions (schéma de valider_plan) ou None si le texte
+    n'est pas entièrement compris.
+    """
+    publics = []
+
+    def marquer(correspondance):
+        publics.append(_public(correspondance))
+        return f" {_MARQUEUR.format(len(publics) - 1)} "
+
+    texte = _PUBLIC.sub(marquer, texte)
+    if None in publics:
+        return None
+    zones, publics_communs = [], []
+    for segment in _SEPARATEURS.split(texte):
+        marqueurs = [int(m) for m in _MARQUEUR_MOTIF.findall(segment)]
+        seances = [correspondance["n"] for correspondance in _SEANCES.finditer(segment)]
+        segment = _SEANCES.sub(" ", segment)
+        elision = _SEANCES_ELIDEES.match(segment) if not seances and zones and zones[-1][1] is not None else None
+        if elision:
+            seances, segment = [elision["n"]], segment[elision.end():]
+        if len(marqueurs) > 1 or len(seances) > 1:
+            return None
+        reste = _MARQUEUR_MOTIF.sub(" ", segment)
+        commun = bool(_TOTAL.search(reste))
+        villes = trouver_lieu(_TOTAL.sub(" ", reste), est_connu)
+        if villes is None:
+            return None
+        public = publics[marqueurs[0]] if marqueurs else None
+        nombre_seances = _entier(seances[0]) if seances else None
+        if not villes:
+            if seances:
+                return None  # Séances sans lieu
+            if public is not None:
+                publics_communs.append(public)
+            elif commun:
+                return None
+            continue  # Segment vide ("et" final, ponctuation)
+        zones.append((villes, nombre_seances, public))
+
+    if not zones or len(publics_communs) > 1:
+        return None
+    if len({nombre_seances is None for _, nombre_seances, _ in zones}) > 1:
+        return None  # Séances précisées pour une partie des zones seulement ("2 séances à Lyon et Marseille")
+    if publics_communs and any(public is not None for _, _, public in zones):
+        return None
+    instructions, poids = [], []
+    for villes, nombre_seances, public in zones:
+        if nombre_seances is not None and nombre_seances < len(villes):
+            return None  # Moins de séances que de villes : répartition laissée au modèle
+        seances_villes = repartir(nombre_seances, [1] * len(villes)) if nombre_seances is not None else [None] * len(villes)
+        publics_villes = [None] * len(villes)
+        if public is not None:
+            publics_villes = repartir(public, [s or 1 for s in seances_villes])
+        elif not publics_communs:
+            return None  # Audience inconnue pour cette zone
+        for ville, seances_ville, public_ville in zip(villes, seances_villes, publics_villes):
+            instruction = {"localisation": ville, "nombre": public_ville}
+            if seances_ville is not None:
+                instruction["nombre_seances"] = seances_ville
+            instructions.append(instruction)
+            poids.append(seances_ville or 1)
+    if publics_communs:
+        for instruction, public_ville in zip(instructions, repartir(publics_communs[0], poids)):
+            instruction["nombre"] = public_ville
+    return instructions
+
+
+# --- Raffinage ---
+_LIEU = r"(?:\s+(?:à|a|au|aux|en|de|du|pour|dans|sur|autour de)\s+(?P<lieu>.+?))?"
+_VERBE_SUPPRIMER = r"(?:supprime[rsz]?|enl[èe]ve[rsz]?|enlevez|retire[rsz]?|vire[rsz]?|[ée]limine[rsz]?)"
+_VERBE_VOULOIR = (r"(?:je\s+(?:veux|voudrais|souhaite)|il\s+(?:me|nous)\s+faut|cherche[rsz]?|trouve[rsz]?|garde[rsz]?"
+                  r"|prends?|uniquement|seulement|que)")
+_SALLES = r"(?:salles?|s[ée]ances?|projections?|cin[ée]mas?)"
+_UNITE_PLACES = r"(?:places|si[èe]ges|fauteuils|spectateurs|personnes)"
+
+_RAFFINAGES = (
+    ("ajouter", re.compile(
+        rf"(?:r?ajout(?:e[rsz]?)?|mets|mettre|mettez)\s+(?P<nombre>{_NOMBRE_OU_LETTRES})\s+"
+        rf"(?:autres?\s+|nouvelles?\s+)?{_SALLES}(?:\s+(?:de plus|en plus|suppl[ée]mentaires?))?"
+        r"\s+(?:à|a|au|aux|en|sur|dans|pour|vers)\s+(?P<lieu>.+)", re.IGNORECASE)),
+    ("supprimer_capacite", re.compile(
+        rf"{_VERBE_SUPPRIMER}\s+(?:toutes\s+)?les\s+{_SALLES}\s+(?:de|avec)\s+(?P<sens>moins|plus)\s+de\s+"
+        rf"(?P<valeur>{_NOMBRE})\s+{_UNITE_PLACES}{_LIEU}", re.IGNORECASE)),
+    ("supprimer_distance", re.compile(
+        rf"{_VERBE_SUPPRIMER}\s+(?:toutes\s+)?les\s+{_SALLES}\s+(?:situ[ée]es\s+)?(?:à|a)\s+(?P<sens>moins|plus)\s+de\s+"
+        rf"(?P<valeur>{_NOMBRE})\s*km{_LIEU}", re.IGNORECASE)),
+    ("supprimer_zone", re.compile(
+        rf"{_VERBE_SUPPRIMER}\s+(?:(?:toutes\s+)?les\s+{_SALLES}\s+(?:à|a|au|aux|en|de|du|pour|dans|sur)\s+"
+        r"|la\s+zone\s+(?:de\s+)?)?(?P<lieu>.+)", re.IGNORECASE)),
+    ("modifier_rayon", re.compile(
+        r"(?:augmente[rz]?|[ée]largi[rsz]?|[ée]tend[sz]?|passe[rz]?|porte[rz]?|r[ée]dui[rsz]?|diminue[rz]?|mets|mettre"
+        rf"|change[rz]?|fixe[rz]?)\s+(?:le\s+)?rayon\s+(?:à|a|de)\s+(?P<valeur>{_NOMBRE})\s*km{_LIEU}", re.IGNORECASE)),
+    ("modifier_capacite", re.compile(
+        rf"{_VERBE_VOULOIR}\s+(?:des\s+|les\s+|de\s+)?{_SALLES}\s+de\s+(?P<sens>plus|moins)\s+de\s+(?P<valeur>{_NOMBRE})"
+        rf"\s+{_UNITE_PLACES}{_LIEU}", re.IGNORECASE)),
+    ("modifier_equipement", re.compile(
+        rf"{_VERBE_VOULOIR}\s+(?:des\s+|les\s+|de\s+)?{_SALLES}\s+(?:(?:[ée]quip[ée]e?s?|avec|en)\s+(?:d'|de\s+|du\s+|l'|la\s+|le\s+)?)?"
+        rf"(?P<equipement>.+?){_LIEU}", re.IGNORECASE)),
+)
+
+
+def _instruction_raffinage(nom: str, correspondance, lieu):
+    champs = correspondance.groupdict()
+    if nom == "ajouter":
+        return {"action": "ajouter", "localisation": lieu, "nombre": _entier(champs["nombre"])}
+    if nom == "supprimer_zone":
+        return {"action": "supprimer", "localisation": lieu}
+    instruction = {"action": "supprimer" if nom.startswith("supprimer") else "modifier"}
+    if lieu:
+        instruction["localisation"] = lieu
+    if nom == "modifier_equipement":
+        equipement = champs["equipement"].strip()
+        if normaliser_nom_ville(equipement) not in TERMES_EQUIPEMENT:
+            return None
+        return {**instruction, "critere": "equipement", "valeur": equipement}
+    valeur, plus = _entier(champs["valeur"]), (champs.get("sens") or "").lower() == "plus"
+    if nom == "supprimer_capacite":
+        # Voir filtres.TABLE_SUPPRESSION : capacite_min/inferieur retire < valeur, capacite_max/inferieur retire > valeur
+        return {**instruction, "critere": "capacite_max" if plus else "capacite_min", "valeur": valeur, "operateur": "inferieur"}
+    if nom == "supprimer_distance":
+        return {**instruction, "critere": "distance_max", "valeur": valeur, "operateur": "inferieur" if plus else "superieur"}
+    if nom == "modifier_rayon":
+        return {**instruction, "critere": "distance_max", "valeur": valeur}
+    return {**instruction, "critere": "capacite_min" if plus else "capacite_max", "valeur": valeur}
+
+
+def analyser_raffinage(texte: str, est_connu):
+    """
+    Interprète une demande de raffinage courante : ajout de N salles à un lieu, suppression par
+    capacité, par distance ou d'une zone entière, rayon, capacité ou équipement exigés.
+    Retourne l'action (schéma de valider_raffinage) ou None si la demande n'est pas reconnue
+    ou si le lieu n'est pas connu localement (`est_connu`).
+    """
+    texte = re.sub(r"\s+", " ", texte.replace("’", "'")).strip()
+    texte = re.sub(r"(?i)[\s,.!]*(?:s'il (?:te|vous) pla[îi]t|svp|stp|merci)?[\s.!]*$", "", texte)
+    for nom, motif in _RAFFINAGES:
+        correspondance = motif.fullmatch(texte)
+        if correspondance is None:
+            continue
+        lieu = None
+        if correspondance["lieu"]:
+            villes = trouver_lieu(correspondance["lieu"], est_connu, expansions=False)
+            if not villes:
+                continue
+            lieu = villes[0]
+        instruction = _instruction_raffinage(nom, correspondance, lieu)
+        if instruction is not None:
+            return instruction
+    return None
@@ -0,0 +1,70 @@
+# --- benchmarks/bench_distances.py ---
+# Compare le noyau vectorisé (distances.py) à la boucle geopy.distance.geodesic d'origine
+# -*- coding: utf-8 -*-
+#
+# Usage : python benchmarks/bench_distances.py [fichier_cinemas.json]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from geopy.distance import geodesic
+
+from donnees_cinemas import charger_cinemas
+
+POINTS_REQUETE = {
+    "Paris": (48.8566, 2.3522), "Lille": (50.6292, 3.0573), "Strasbourg": (48.5734, 7.7521),
+    "Lyon": (45.7640, 4.8357), "Marseille": (43.2965, 5.3698), "Nice": (43.7102, 7.2620),
+    "Toulouse": (43.6047, 1.4442), "Montpellier": (43.6108, 3.8767), "Bordeaux": (44.8378, -0.5792),
+    "Limoges": (45.8336, 1.2611), "Nantes": (47.2184, -1.5536), "Rennes": (48.1173, -1.6778),
+    "Caen": (49.1829, -0.3707), "Dijon": (47.3220, 5.0415), "Clermont-Ferrand": (45.7772, 3.0870),
+    "Orléans": (47.9030, 1.9093), "Besançon": (47.2378, 6.0241),
+}
+
+
+def _chronometrer(fonction, repetitions: int):
+    """Retourne la médiane (en ms) de `repetitions` exécutions de `fonction`."""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return float(np.median(durees))
+
+
+def main(chemin: str):
+    jeu = charger_cinemas(chemin)
+    points = jeu.points
+    coords = list(zip(points.lats.tolist(), points.lons.tolist()))
+    requetes = list(POINTS_REQUETE.values())
+    print(f"{len(points)} cinémas, {len(requetes)} points de requête ('France entière')")
+
+    def boucle_geodesic():
+        return [[geodesic(q, c).km for c in coords] for q in requetes]
+
+    def noyau_par_point():
+        return [points.distances_km(lat, lon) for lat, lon in requetes]
+
+    def noyau_matrice():
+        return points.matrice_distances_km([q[0] for q in requetes], [q[1] for q in requetes])
+
+    reference = np.array(boucle_geodesic())
+    matrice = noyau_matrice()
+    ecart_max_m = float(np.max(np.abs(matrice - reference)) * 1000)
+    arrondis_differents = int(np.count_nonzero(np.round(matrice, 2) != np.round(reference, 2)))
+    print(f"Écart max vs geodesic : {ecart_max_m:.6f} m ; "
+          f"arrondis à 2 décimales différents : {arrondis_differents}/{reference.size}")
+
+    t_geodesic = _chronometrer(boucle_geodesic, 1)
+    t_point = _chronometrer(noyau_par_point, 10)
+    t_matrice = _chronometrer(noyau_matrice, 10)
+    print(f"geodesic (boucle Python) : {t_geodesic:9.1f} ms")
+    print(f"noyau, un appel par zone : {t_point:9.1f} ms  (x{t_geodesic / t_point:.0f})")
+    print(f"noyau, matrice unique    : {t_matrice:9.1f} ms  (x{t_geodesic / t_matrice:.0f})")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "cinemas_groupedBig.json")
@@ -0,0 +1,269 @@
+# --- benchmarks/bench_planification.py ---
+# Banc d'essai des chemins critiques : chargement, recherche, plans multi-zones, raffinage, carte, export
+# -*- coding: utf-8 -*-
+#
+# Usage : python benchmarks/bench_planification.py [--echelle N] [--repetitions 20] [--filtre motif]
+#                                                  [--enregistrer] [--tolerance 0.25] [--latence-llm-ms 0]
+#                                                  [--demarrages 5]
+#
+# --echelle 1 mesure le jeu réel (cinemas_grouped.json et cinemas_groupedBig.json) ; au-delà, un jeu
+# synthétique N fois plus grand est généré au premier usage (voir generer_donnees.py).
+# Le modèle de langage et le géocodeur sont simulés : aucun appel réseau, résultats reproductibles.
+# Pour chaque scénario : latences p50 / p95 / p99 et pic mémoire Python (tracemalloc, exécution séparée).
+# --enregistrer sauvegarde les mesures comme référence (benchmarks/baselines/<jeu>.json) ; sinon elles
+# sont comparées à la référence existante et le script sort en erreur en cas de régression.
+# Les scénarios demarrage/* mesurent un démarrage à froid de ai.py dans des processus neufs (voir
+# demarrage.py) : leur p95 doit aussi rester dans BUDGETS_DEMARRAGE_MS, sans charger de module lourd.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from bench_distances import POINTS_REQUETE
+from demarrage import MODULES_DIFFERES
+from carte import generer_carte
+from donnees_cinemas import charger_avec_bundle, charger_cinemas, lire_jeu_de_donnees
+from exports import exporter, supprimer_fichier
+from generer_donnees import chemin_jeu_synthetique, generer
+from geocodage import ResolveurGeocodage, normaliser_nom_ville
+from moteur import MoteurPlanification, OptionsRecherche
+from recherche import DemandeZone
+
+DOSSIER_BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+TOLERANCE = 0.25            # Hausse relative tolérée avant de signaler une régression
+PLANCHER_LATENCE_MS = 1.0   # Écarts absolus en deçà desquels une hausse relève du bruit
+PLANCHER_MEMOIRE_KO = 64
+RAYONS_KM = (10, 50, 100)
+NOMBRES_SALLES = (1, 10, 50)
+NOMBRES_ZONES = (1, 5, 17)
+DEMARRAGES = 5              # Processus lancés pour mesurer le démarrage à froid
+BUDGETS_DEMARRAGE_MS = {"demarrage/import": 1000.0, "demarrage/premier_rendu": 800.0}  # Sur le p95
+
+# Demandes de raffinage -> réponses du modèle simulé (sollicité seulement si analyse_locale.py ne les reconnaît pas)
+RAFFINAGES = {
+    "ajoute 3 salles à Paris": {"action": "ajouter", "localisation": "Paris", "nombre": 3},
+    "ajoute 2 salles à Brest": {"action": "ajouter", "localisation": "Brest", "nombre": 2},
+    "supprime les salles de moins de 200 places": {"action": "supprimer", "critere": "capacite_min", "valeur": 200,
+                                                    "operateur": "inferieur"},
+    "je veux des salles 3D": {"action": "modifier", "critere": "equipement", "valeur": "3D"},
+}
+COORDS_SUPPLEMENTAIRES = {"Brest": (48.3904, -4.4861)}
+# Plan simple : interprété par règles (analyse_locale.py), ou par le modèle simulé quand l'analyse locale est désactivée
+PLAN_SIMPLE = "5 séances à Paris (500 pers.) et 2 séances test à Rennes (100 pers.)"
+REPONSE_PLAN_SIMPLE = {"zones": [{"localisation": "Paris", "nombre": 500, "nombre_seances": 5},
+                                 {"localisation": "Rennes", "nombre": 100, "nombre_seances": 2}]}
+
+
+class ClientLLMSimule:
+    """Remplace ClientLLMEnCache : réponse prédéfinie par texte utilisateur, latence fixe simulée."""
+
+    def __init__(self, reponses: dict, latence_s: float = 0.0):
+        self.reponses = {texte: json.dumps(reponse, ensure_ascii=False) for texte, reponse in reponses.items()}
+        self.latence_s = latence_s
+
+    def completer(self, modele: str, prompt_systeme: str, texte: str, **options):
+        if self.latence_s:
+            time.sleep(self.latence_s)
+        return self.reponses[texte]
+
+
+def resolveur_simule():
+    """Géocodage entièrement local : les 17 villes de référence (et Brest) dans un gazetteer en mémoire."""
+    points = {**POINTS_REQUETE, **COORDS_SUPPLEMENTAIRES}
+    return ResolveurGeocodage({normaliser_nom_ville(ville): coords for ville, coords in points.items()})
+
+
+def _percentiles(durees: list, pic_ko: float):
+    p50, p95, p99 = np.percentile(durees, [50, 95, 99]).tolist()
+    return {"p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3), "pic_memoire_ko": round(pic_ko, 1)}
+
+
+def mesurer(executer, repetitions: int, preparer=None):
+    """
+    Exécute `executer(etat)` après une exécution de chauffe, `preparer()` fournissant un état neuf
+    à chaque exécution (hors chronométrage). Retourne les latences p50 / p95 / p99 (ms) et le pic
+    de mémoire Python (Ko) d'une exécution supplémentaire sous tracemalloc.
+    """
+    preparer = preparer or (lambda: None)
+    executer(preparer())
+    durees = []
+    for _ in range(repetitions):
+        etat = preparer()
+        debut = time.perf_counter()
+        executer(etat)
+        durees.append((time.perf_counter() - debut) * 1000)
+    etat = preparer()
+    tracemalloc.start()
+    try:
+        executer(etat)
+        pic = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return _percentiles(durees, pic / 1024)
+
+
+def mesurer_demarrage(demarrages: int):
+    """
+    Lance `demarrages` fois demarrage.py dans un processus neuf. Retourne les mesures des scénarios
+    demarrage/import et demarrage/premier_rendu (pic mémoire : RSS maximal du processus) et les
+    modules lourds chargés au démarrage (alors qu'ils devraient l'être au premier usage).
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "demarrage.py")
+    imports, rendus, rss, modules_lourds = [], [], [], set()
+    for _ in range(demarrages):
+        sortie = subprocess.run([sys.executable, script], capture_output=True, text=True, check=True).stdout
+        mesure = json.loads(sortie.strip().splitlines()[-1])
+        if mesure["erreurs"]:
+            raise RuntimeError(f"Erreur au premier rendu de ai.py : {mesure['erreurs']}")
+        imports.append(mesure["import_ms"])
+        rendus.append(mesure["premier_rendu_ms"])
+        rss.append(mesure["rss_max_ko"])
+        modules_lourds.update(mesure["modules_lourds"])
+    mesures = {"demarrage/import": _percentiles(imports, max(rss)),
+               "demarrage/premier_rendu": _percentiles(rendus, max(rss))}
+    return mesures, sorted(modules_lourds, key=MODULES_DIFFERES.index)
+
+
+def depassements_budget(mesures: dict):
+    """Retourne les scénarios de démarrage (scénario, p95, budget) dont le p95 dépasse BUDGETS_DEMARRAGE_MS."""
+    return [(nom, mesures[nom]["p95_ms"], budget) for nom, budget in BUDGETS_DEMARRAGE_MS.items()
+            if nom in mesures and mesures[nom]["p95_ms"] > budget]
+
+
+def _instructions(nb_zones: int, seances: int):
+    return [{"localisation": ville, "nombre": 500, "nombre_seances": seances} for ville in list(POINTS_REQUETE)[:nb_zones]]
+
+
+def scenarios(chemins: list, moteur: MoteurPlanification, repetitions: int):
+    """Scénarios (nom, executer, repetitions, preparer) sur le jeu chargé dans `moteur`."""
+    jeu = moteur.jeu
+    for chemin in chemins:
+        nom = os.path.basename(chemin)
+        mtime_ns = os.stat(chemin).st_mtime_ns
+        yield f"chargement/json/{nom}", lambda _, c=chemin, m=mtime_ns: lire_jeu_de_donnees(c, m), max(repetitions // 4, 3), None
+        yield f"chargement/bundle/{nom}", lambda _, c=chemin, m=mtime_ns: charger_avec_bundle(c, m), repetitions, None
+
+    for rayon in RAYONS_KM:
+        for nombre in NOMBRES_SALLES:
+            demandes = [DemandeZone("Paris", nombre, rayon)]
+            yield f"recherche/{rayon}km-{nombre}salles", lambda _, d=demandes: moteur.rechercher(d), repetitions, None
+
+    moteur_sans_regles = MoteurPlanification(jeu, moteur.resolveur, moteur.client_llm, analyse_locale=False)
+    yield "analyse/plan/regles", lambda _: moteur.analyser_requete(PLAN_SIMPLE), repetitions, None
+    yield "analyse/plan/modele", lambda _: moteur_sans_regles.analyser_requete(PLAN_SIMPLE), repetitions, None
+
+    for nb_zones in NOMBRES_ZONES:
+        instructions = _instructions(nb_zones, 2)
+        yield f"plan/{nb_zones}zones", lambda _, i=instructions: moteur.planifier(i), repetitions, None
+
+    options = OptionsRecherche(max_salles_par_cinema=None)
+    for demande in RAFFINAGES:
+        def preparer():
+            return moteur.planifier(_instructions(5, 5), options=options)[0]
+        yield f"raffinage/{RAFFINAGES[demande]['action']}/{demande}", \
+            lambda groupes, d=demande: moteur.raffiner(groupes, d, options), repetitions, preparer
+
+    groupes, _ = moteur.planifier(_instructions(17, 20), options=options)
+    yield "carte/17zones", lambda _: generer_carte(jeu, groupes).get_root().render(), repetitions, None
+    yield "carte/17zones+fond", lambda _: generer_carte(jeu, groupes, avec_fond=True).get_root().render(), \
+        max(repetitions // 4, 3), None
+    yield "export/xlsx/17zones", lambda _: supprimer_fichier(exporter(jeu, groupes, "xlsx")), repetitions, None
+
+
+def comparer(mesures: dict, reference: dict, tolerance: float):
+    """Retourne les régressions (scénario, métrique, valeur, référence) au-delà de la tolérance et du bruit."""
+    regressions = []
+    for nom, mesure in mesures.items():
+        base = reference.get(nom)
+        if base is None:
+            continue
+        for metrique, plancher in (("p50_ms", PLANCHER_LATENCE_MS), ("pic_memoire_ko", PLANCHER_MEMOIRE_KO)):
+            if mesure[metrique] > base[metrique] * (1 + tolerance) and mesure[metrique] - base[metrique] > plancher:
+                regressions.append((nom, metrique, mesure[metrique], base[metrique]))
+    return regressions
+
+
+def main(echelle: int, repetitions: int, filtre: str, enregistrer: bool, tolerance: float, latence_llm_ms: float,
+         demarrages: int = DEMARRAGES):
+    if echelle <= 1:
+        nom_jeu, chemins = "reel", [os.path.abspath("cinemas_grouped.json"), os.path.abspath("cinemas_groupedBig.json")]
+    else:
+        nom_jeu, chemin = f"x{echelle}", chemin_jeu_synthetique(echelle)
+        if not os.path.exists(chemin):
+            _, nb_cinemas, nb_salles = generer(echelle, chemin)
+            print(f"Jeu synthétique généré : {nb_cinemas} cinémas, {nb_salles} salles ('{chemin}').")
+        chemins = [chemin]
+    jeu = charger_cinemas(chemins[-1])
+    client_llm = ClientLLMSimule({**RAFFINAGES, PLAN_SIMPLE: REPONSE_PLAN_SIMPLE}, latence_llm_ms / 1000)
+    moteur = MoteurPlanification(jeu, resolveur_simule(), client_llm)
+    print(f"Jeu '{nom_jeu}' : {len(jeu.cinemas)} cinémas, {len(jeu.salles)} salles ; {repetitions} répétitions.")
+
+    mesures = {}
+    print(f"{'scénario':<62} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'pic Ko':>9}")
+    for nom, executer, nb, preparer in scenarios(chemins, moteur, repetitions):
+        if filtre and filtre not in nom:
+            continue
+        mesures[nom] = mesure = mesurer(executer, nb, preparer)
+        print(f"{nom:<62} {mesure['p50_ms']:>9.2f} {mesure['p95_ms']:>9.2f} {mesure['p99_ms']:>9.2f} "
+              f"{mesure['pic_memoire_ko']:>9.0f}")
+
+    # Démarrage à froid : indépendant du jeu de données mesuré (l'application ne le charge qu'au premier usage)
+    echecs_demarrage = 0
+    if demarrages > 0 and (not filtre or any(filtre in nom for nom in BUDGETS_DEMARRAGE_MS)):
+        mesures_demarrage, modules_lourds = mesurer_demarrage(demarrages)
+        for nom, mesure in mesures_demarrage.items():
+            mesures[nom] = mesure
+            print(f"{nom:<62} {mesure['p50_ms']:>9.2f} {mesure['p95_ms']:>9.2f} {mesure['p99_ms']:>9.2f} "
+                  f"{mesure['pic_memoire_ko']:>9.0f}")
+        for nom, p95, budget in depassements_budget(mesures_demarrage):
+            print(f"BUDGET DÉPASSÉ {nom} : p95 {p95:.0f} ms (budget {budget:.0f} ms)")
+            echecs_demarrage += 1
+        if modules_lourds:
+            print(f"MODULES CHARGÉS AU DÉMARRAGE : {', '.join(modules_lourds)} (à importer au premier usage)")
+            echecs_demarrage += 1
+
+    chemin_reference = os.path.join(DOSSIER_BASELINES, f"{nom_jeu}.json")
+    if enregistrer:
+        reference = {}
+        if os.path.exists(chemin_reference):
+            with open(chemin_reference, "r", encoding="utf-8") as f:
+                reference = json.load(f)["scenarios"]
+        os.makedirs(DOSSIER_BASELINES, exist_ok=True)
+        with open(chemin_reference, "w", encoding="utf-8") as f:
+            json.dump({"jeu": {"nom": nom_jeu, "cinemas": len(jeu.cinemas), "salles": len(jeu.salles)},
+                       "scenarios": {**reference, **mesures}}, f, ensure_ascii=False, indent=1)
+        print(f"Référence enregistrée dans '{chemin_reference}'.")
+        return 1 if echecs_demarrage else 0
+    if not os.path.exists(chemin_reference):
+        print(f"Aucune référence '{chemin_reference}' (lancer avec --enregistrer pour la créer).")
+        return 1 if echecs_demarrage else 0
+    with open(chemin_reference, "r", encoding="utf-8") as f:
+        regressions = comparer(mesures, json.load(f)["scenarios"], tolerance)
+    for nom, metrique, valeur, base in regressions:
+        print(f"RÉGRESSION {nom} : {metrique} {valeur:.2f} (référence {base:.2f}, +{(valeur / base - 1) * 100:.0f} %)")
+    if not regressions:
+        print(f"Aucune régression par rapport à '{chemin_reference}' (tolérance {tolerance * 100:.0f} %).")
+    return 1 if regressions or echecs_demarrage else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banc d'essai de la planification (LLM et géocodeur simulés).")
+    parser.add_argument("--echelle", type=int, default=1, help="1 : jeu réel ; N : jeu synthétique N fois plus grand")
+    parser.add_argument("--repetitions", type=int, default=20, help="exécutions chronométrées par scénario")
+    parser.add_argument("--filtre", default="", help="ne lance que les scénarios dont le nom contient ce motif")
+    parser.add_argument("--enregistrer", action="store_true", help="enregistre les mesures comme référence")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="hausse relative tolérée (0.25 : 25 %%)")
+    parser.add_argument("--latence-llm-ms", type=float, default=0.0, help="latence simulée de chaque appel au modèle")
+    parser.add_argument("--demarrages", type=int, default=DEMARRAGES,
+                        help="démarrages à froid de l'application mesurés (0 : aucun)")
+    arguments = parser.parse_args()
+    sys.exit(main(arguments.echelle, arguments.repetitions, arguments.filtre, arguments.enregistrer,
+                  arguments.tolerance, arguments.latence_llm_ms, arguments.demarrages))
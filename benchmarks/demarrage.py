@@ -0,0 +1,58 @@
+# --- benchmarks/demarrage.py ---
+# Mesure d'un démarrage à froid de l'application : imports de ai.py, puis premier rendu du script
+# -*- coding: utf-8 -*-
+#
+# Usage : python benchmarks/demarrage.py
+#
+# À lancer dans un processus neuf (bench_planification.py le relance pour chaque mesure) : affiche une
+# ligne JSON avec la durée des imports de ai.py, celle de sa première exécution (sans interaction,
+# via streamlit.testing), la mémoire résidente maximale du processus et les modules lourds chargés
+# alors qu'ils ne devraient l'être qu'au premier usage.
+
+import json
+import os
+import resource
+import sys
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES_APPLICATION = ["streamlit", "streamlit.components.v1", "carte", "donnees_cinemas", "exports", "filtres",
+                       "resultats", "traces", "moteur"]  # Imports de tête de ai.py
+MODULES_DIFFERES = ["openai", "geopy", "folium", "pandas", "pyarrow", "altair", "xlsxwriter"]
+
+
+def _rss_max_ko():
+    # VmHWM est propre à l'image du processus ; ru_maxrss conserve sous Linux le maximum du parent avant exec
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for ligne in f:
+                if ligne.startswith("VmHWM:"):
+                    return int(ligne.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def mesurer_demarrage():
+    """Retourne {import_ms, premier_rendu_ms, rss_max_ko, modules_lourds, erreurs} pour ce processus."""
+    os.chdir(RACINE)
+    sys.path.insert(0, RACINE)
+    debut = time.perf_counter()
+    for module in MODULES_APPLICATION:
+        __import__(module)
+    import_ms = (time.perf_counter() - debut) * 1000
+
+    from streamlit.testing.v1 import AppTest
+
+    application = AppTest.from_file(os.path.join(RACINE, "ai.py"), default_timeout=60)
+    debut = time.perf_counter()
+    application.run()
+    premier_rendu_ms = (time.perf_counter() - debut) * 1000
+    return {"import_ms": round(import_ms, 3), "premier_rendu_ms": round(premier_rendu_ms, 3),
+            "rss_max_ko": _rss_max_ko(),
+            "modules_lourds": [module for module in MODULES_DIFFERES if module in sys.modules],
+            "erreurs": [str(exception.value) for exception in application.exception]}
+
+
+if __name__ == "__main__":
+    print(json.dumps(mesurer_demarrage(), ensure_ascii=False))
@@ -0,0 +1,81 @@
+# --- benchmarks/generer_donnees.py ---
+# Génère des jeux de données synthétiques de cinémas français, N fois plus grands que le jeu réel
+# -*- coding: utf-8 -*-
+#
+# Usage : python benchmarks/generer_donnees.py ECHELLE [sortie.json] [--source cinemas_groupedBig.json] [--graine 0]
+#
+# Chaque cinéma synthétique reprend les salles (capacités, équipements, formats) d'un cinéma réel tiré
+# au hasard, placé autour de sa position d'origine (dispersion gaussienne de quelques kilomètres) :
+# la densité des villes, la taille des multiplexes et la répartition des équipements sont conservées.
+# Le fichier a le format de cinemas_groupedBig.json ; la génération est reproductible (graine).
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+DOSSIER_DONNEES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "donnees")
+DISPERSION_KM = 5.0                        # Écart type du déplacement d'un cinéma autour de son modèle
+KM_PAR_DEGRE = 111.2
+BORNES_FRANCE = ((41.3, 51.1), (-5.2, 9.6))  # (lat min, lat max), (lon min, lon max) : métropole et Corse
+
+
+def chemin_jeu_synthetique(echelle: int):
+    """Chemin par défaut du jeu synthétique d'échelle `echelle` (benchmarks/donnees/cinemas_x<echelle>.json)."""
+    return os.path.join(DOSSIER_DONNEES, f"cinemas_x{echelle}.json")
+
+
+def _cinema_synthetique(modele: dict, numero: int, lat: float, lon: float, facteurs_capacite):
+    salles = []
+    for salle, facteur in zip(modele.get("salles", []), facteurs_capacite):
+        capacite = str(salle.get("capacite") or "")
+        if capacite.isdigit():
+            capacite = str(max(int(round(int(capacite) * facteur)), 1))
+        salles.append({**salle, "cnc": f"S{numero:07d}{salle.get('salle', '')}", "capacite": capacite})
+    return {**modele, "cinema": f"{modele.get('cinema')} #{numero}", "lat": round(lat, 7), "lon": round(lon, 7),
+            "salles": salles}
+
+
+def generer(echelle: int, chemin_sortie: str = None, chemin_source: str = "cinemas_groupedBig.json", graine: int = 0):
+    """
+    Écrit un jeu de `echelle` fois plus de cinémas que `chemin_source` (écriture en flux, un
+    cinéma par ligne). Retourne (chemin du fichier, nombre de cinémas, nombre de salles).
+    """
+    chemin_sortie = chemin_sortie or chemin_jeu_synthetique(echelle)
+    with open(chemin_source, "r", encoding="utf-8") as f:
+        modeles = [c for c in json.load(f) if isinstance(c, dict) and c.get("lat") is not None and c.get("lon") is not None]
+    rng = np.random.default_rng(graine)
+    nb_cinemas = len(modeles) * echelle
+    tirages = rng.integers(0, len(modeles), nb_cinemas)
+    lats = np.array([float(modeles[i]["lat"]) for i in tirages.tolist()])
+    lons = np.array([float(modeles[i]["lon"]) for i in tirages.tolist()])
+    lats += rng.normal(0.0, DISPERSION_KM / KM_PAR_DEGRE, nb_cinemas)
+    lons += rng.normal(0.0, DISPERSION_KM / KM_PAR_DEGRE, nb_cinemas) / np.cos(np.radians(lats))
+    (lat_min, lat_max), (lon_min, lon_max) = BORNES_FRANCE
+    lats, lons = np.clip(lats, lat_min, lat_max), np.clip(lons, lon_min, lon_max)
+
+    os.makedirs(os.path.dirname(os.path.abspath(chemin_sortie)), exist_ok=True)
+    nb_salles = 0
+    with open(chemin_sortie, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for numero, (i, lat, lon) in enumerate(zip(tirages.tolist(), lats.tolist(), lons.tolist())):
+            modele = modeles[i]
+            facteurs = rng.uniform(0.8, 1.2, len(modele.get("salles", [])))
+            cinema = _cinema_synthetique(modele, numero, lat, lon, facteurs)
+            nb_salles += len(cinema["salles"])
+            f.write(("" if numero == 0 else ",\n") + json.dumps(cinema, ensure_ascii=False))
+        f.write("\n]\n")
+    return chemin_sortie, nb_cinemas, nb_salles
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un jeu de données synthétique de cinémas.")
+    parser.add_argument("echelle", type=int, help="facteur multiplicatif du nombre de cinémas (ex : 10, 100)")
+    parser.add_argument("sortie", nargs="?", help="fichier JSON produit (défaut : benchmarks/donnees/cinemas_x<echelle>.json)")
+    parser.add_argument("--source", default="cinemas_groupedBig.json", help="jeu réel servant de modèle")
+    parser.add_argument("--graine", type=int, default=0, help="graine du générateur aléatoire")
+    arguments = parser.parse_args()
+    chemin, nb_cinemas, nb_salles = generer(arguments.echelle, arguments.sortie, arguments.source, arguments.graine)
+    print(f"{nb_cinemas} cinémas et {nb_salles} salles écrits dans '{chemin}' "
+          f"({os.path.getsize(chemin) / 1024 / 1024:.1f} Mo).")
@@ -0,0 +1,209 @@
+# --- cache_llm.py ---
+# Cache des réponses du modèle de langage, partagé par tous les appels (plan, contexte, raffinage)
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from traces import attribuer, span
+
+TTL_DEFAUT_S = 7 * 24 * 3600
+TAILLE_MAX_DEFAUT = 2000
+
+
+def normaliser_texte(texte: str):
+    """Normalise le texte utilisateur pour la clé de cache : forme NFC, espaces superflus supprimés."""
+    texte = unicodedata.normalize("NFC", texte or "")
+    return re.sub(r"\s+", " ", texte).strip()
+
+
+def cle_requete(modele: str, prompt_systeme: str, texte_utilisateur: str, **options):
+    """
+    Retourne la clé (SHA-256 hexadécimal) d'un appel : modèle, prompt système, texte
+    utilisateur normalisé et options de génération (ex : format de réponse).
+    Modifier le prompt système invalide donc naturellement les entrées existantes.
+    """
+    contenu = json.dumps(
+        [modele, prompt_systeme, normaliser_texte(texte_utilisateur), options],
+        ensure_ascii=False, sort_keys=True, default=str,
+    )
+    return hashlib.sha256(contenu.encode("utf-8")).hexdigest()
+
+
+class CacheMemoire:
+    """
+    Cache LRU en mémoire du processus, avec durée de vie (TTL) et nombre d'entrées borné.
+    """
+
+    def __init__(self, taille_max: int = TAILLE_MAX_DEFAUT, ttl_s: float = TTL_DEFAUT_S):
+        self.taille_max = taille_max
+        self.ttl_s = ttl_s
+        self._verrou = threading.Lock()
+        self._entrees = OrderedDict()
+
+    def lire(self, cle: str):
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                return None
+            valeur, expire_le = entree
+            if expire_le < time.time():
+                del self._entrees[cle]
+                return None
+            self._entrees.move_to_end(cle)
+            return valeur
+
+    def ecrire(self, cle: str, valeur: str):
+        with self._verrou:
+            self._entrees[cle] = (valeur, time.time() + self.ttl_s)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+class CacheSQLite:
+    """
+    Cache disque (base SQLite) partagé entre processus et redémarrages.
+    Les entrées expirées sont ignorées puis purgées ; au-delà de `taille_max` entrées,
+    les moins récemment utilisées sont supprimées.
+    """
+
+    def __init__(self, chemin: str, taille_max: int = TAILLE_MAX_DEFAUT, ttl_s: float = TTL_DEFAUT_S):
+        self.chemin = chemin
+        self.taille_max = taille_max
+        self.ttl_s = ttl_s
+        self._verrou = threading.Lock()
+        self._initialise = False
+
+    def _connexion(self):
+        if not self._initialise:
+            os.makedirs(os.path.dirname(os.path.abspath(self.chemin)), exist_ok=True)
+        connexion = sqlite3.connect(self.chemin, timeout=5)
+        if not self._initialise:
+            with connexion:
+                connexion.execute(
+                    "CREATE TABLE IF NOT EXISTS reponses ("
+                    "cle TEXT PRIMARY KEY, valeur TEXT NOT NULL, expire_le REAL NOT NULL, utilise_le REAL NOT NULL)"
+                )
+                connexion.execute("CREATE INDEX IF NOT EXISTS reponses_utilise_le ON reponses (utilise_le)")
+            self._initialise = True
+        return connexion
+
+    def lire(self, cle: str):
+        maintenant = time.time()
+        with self._verrou:
+            connexion = self._connexion()
+            try:
+                with connexion:
+                    ligne = connexion.execute(
+                        "SELECT valeur, expire_le FROM reponses WHERE cle = ?", (cle,)
+                    ).fetchone()
+                    if ligne is None:
+                        return None
+                    if ligne[1] < maintenant:
+                        connexion.execute("DELETE FROM reponses WHERE cle = ?", (cle,))
+                        return None
+                    connexion.execute("UPDATE reponses SET utilise_le = ? WHERE cle = ?", (maintenant, cle))
+                    return ligne[0]
+            finally:
+                connexion.close()
+
+    def ecrire(self, cle: str, valeur: str):
+        maintenant = time.time()
+        with self._verrou:
+            connexion = self._connexion()
+            try:
+                with connexion:
+                    connexion.execute(
+                        "INSERT OR REPLACE INTO reponses (cle, valeur, expire_le, utilise_le) VALUES (?, ?, ?, ?)",
+                        (cle, valeur, maintenant + self.ttl_s, maintenant),
+                    )
+                    connexion.execute("DELETE FROM reponses WHERE expire_le < ?", (maintenant,))
+                    connexion.execute(
+                        "DELETE FROM reponses WHERE cle IN ("
+                        "SELECT cle FROM reponses ORDER BY utilise_le DESC LIMIT -1 OFFSET ?)",
+                        (self.taille_max,),
+                    )
+            finally:
+                connexion.close()
+
+    def vider(self):
+        with self._verrou:
+            connexion = self._connexion()
+            try:
+                with connexion:
+                    connexion.execute("DELETE FROM reponses")
+            finally:
+                connexion.close()
+
+
+def creer_cache(type_cache: str, chemin: str = None, taille_max: int = TAILLE_MAX_DEFAUT, ttl_s: float = TTL_DEFAUT_S):
+    """
+    Crée le stockage du cache : "memoire", "sqlite" (fichier `chemin`) ou "aucun" (retourne None).
+    """
+    if type_cache == "aucun":
+        return None
+    if type_cache == "memoire":
+        return CacheMemoire(taille_max, ttl_s)
+    if type_cache == "sqlite":
+        return CacheSQLite(chemin, taille_max, ttl_s)
+    raise ValueError(f"Type de cache LLM inconnu : '{type_cache}' (attendu : memoire, sqlite ou aucun).")
+
+
+class ClientLLMEnCache:
+    """
+    Point d'entrée unique des appels au modèle de langage.
+    Le contenu texte de la réponse est mis en cache sous la clé (modèle, prompt système,
+    texte utilisateur normalisé, options) ; un appel identique ne coûte alors aucune latence API.
+    Les erreurs du client (réseau, quota...) sont propagées et rien n'est mis en cache, pas plus
+    qu'une réponse tronquée (finish_reason autre que "stop", ex : plafond max_tokens atteint).
+    """
+
+    def __init__(self, client, cache=None):
+        self.client = client
+        self.cache = cache
+
+    def completer(self, modele: str, prompt_systeme: str, texte_utilisateur: str, accepter=None, **options):
+        """
+        Retourne le contenu texte (sans espaces de bord) de la réponse du modèle.
+        `accepter(contenu)` (facultatif) indique si la réponse est exploitable : une réponse refusée
+        (ex : hors schéma) est retournée à l'appelant mais n'est ni mise en cache ni servie depuis le cache.
+        """
+        with span("llm", modele=modele):
+            cle = cle_requete(modele, prompt_systeme, texte_utilisateur, **options)
+            if self.cache is not None:
+                contenu = self.cache.lire(cle)
+                if contenu is not None and (accepter is None or accepter(contenu)):
+                    attribuer(cache="hit")
+                    return contenu
+            attribuer(cache="miss")
+            response = self.client.chat.completions.create(
+                model=modele,
+                messages=[
+                    {"role": "system", "content": prompt_systeme},
+                    {"role": "user", "content": texte_utilisateur},
+                ],
+                **options,
+            )
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                attribuer(tokens_prompt=usage.prompt_tokens, tokens_reponse=usage.completion_tokens)
+            choix = response.choices[0]
+            contenu = (choix.message.content or "").strip()
+            complete = choix.finish_reason == "stop"
+            if not complete:
+                attribuer(finish_reason=choix.finish_reason)
+        if self.cache is not None and contenu and complete and (accepter is None or accepter(contenu)):
+            self.cache.ecrire(cle, contenu)
+        return contenu
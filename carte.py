@@ -0,0 +1,122 @@
+# --- carte.py ---
+# Carte Folium des résultats : une couche GeoJSON par zone, regroupement côté client,
+# et couche de fond (tous les cinémas) pré-calculée une fois par jeu de données
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+
+import numpy as np
+
+COULEURS_ZONES = ["blue", "green", "red", "purple", "orange", "darkred", "lightred", "beige", "darkblue",
+                  "darkgreen", "cadetblue", "lightgray", "black"]
+SEUIL_REGROUPEMENT = 30          # Salles à partir desquelles une zone est regroupée en clusters
+ZOOM_FIN_REGROUPEMENT = 12       # Niveau de zoom à partir duquel les clusters sont éclatés
+CHAMPS_POPUP = ["cinema", "salle", "adresse", "capacite", "distance_km", "contact_nom", "contact_email"]
+
+_verrou = threading.Lock()
+_fonds = {}
+
+
+def _texte(chaines, identifiants):
+    return [chaines[i] or "N/A" for i in identifiants.tolist()]
+
+
+def geojson_zone(jeu, resultats):
+    """
+    FeatureCollection des salles retenues d'une zone, lue directement dans les colonnes
+    du jeu de données. Les propriétés ne servent qu'au popup, construit par le navigateur
+    à l'ouverture (aucun HTML par salle dans la page).
+    """
+    chaines, cinemas, salles = jeu.chaines, jeu.cinemas, jeu.salles
+    idx_cinemas = salles.cinema[resultats.ids_salles]
+    colonnes = zip(
+        jeu.points.lons[idx_cinemas].tolist(), jeu.points.lats[idx_cinemas].tolist(),
+        _texte(chaines, cinemas.nom[idx_cinemas]), _texte(chaines, salles.nom[resultats.ids_salles]),
+        _texte(chaines, cinemas.adresse[idx_cinemas]), salles.capacite[resultats.ids_salles].tolist(),
+        resultats.distances_km.tolist(), _texte(chaines, cinemas.contact_nom[idx_cinemas]),
+        _texte(chaines, cinemas.contact_email[idx_cinemas]),
+    )
+    return {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]},
+         "properties": dict(zip(CHAMPS_POPUP, proprietes))}
+        for lon, lat, *proprietes in colonnes
+    ]}
+
+
+def geojson_fond(jeu):
+    """
+    FeatureCollection (texte JSON) de tous les cinémas ayant au moins une salle valide :
+    nom, nombre de salles et nombre de places. Calculée une seule fois par jeu de données
+    (fichier et mtime) et partagée par toutes les sessions.
+    """
+    cle = (jeu.chemin, jeu.mtime_ns)
+    with _verrou:
+        fond = _fonds.get(cle)
+        if fond is None:
+            indices = np.flatnonzero(jeu.cinemas.capacite_max > 0)
+            colonnes = zip(jeu.points.lons[indices].tolist(), jeu.points.lats[indices].tolist(),
+                           _texte(jeu.chaines, jeu.cinemas.nom[indices]), jeu.cinemas.nb_salles[indices].tolist(),
+                           jeu.cinemas.total_places[indices].tolist())
+            fond = json.dumps({"type": "FeatureCollection", "features": [
+                {"type": "Feature", "geometry": {"type": "Point", "coordinates": [round(lon, 5), round(lat, 5)]},
+                 "properties": {"cinema": nom, "salles": nb, "places": places}}
+                for lon, lat, nom, nb, places in colonnes
+            ]}, ensure_ascii=False, separators=(",", ":"))
+            _fonds.clear()  # Seul le jeu de données courant est conservé
+            _fonds[cle] = fond
+    return fond
+
+
+def _couche_fond(jeu):
+    import folium
+    from folium.plugins import MarkerCluster
+
+    groupe = folium.FeatureGroup(name="Tous les cinémas", show=True)
+    regroupement = MarkerCluster(options={"disableClusteringAtZoom": ZOOM_FIN_REGROUPEMENT}).add_to(groupe)
+    folium.GeoJson(
+        geojson_fond(jeu),
+        marker=folium.CircleMarker(radius=3, color="gray", weight=1, fill=True, fill_color="gray", fill_opacity=0.4),
+        tooltip=folium.GeoJsonTooltip(["cinema", "salles", "places"], aliases=["Cinéma", "Salles", "Places"]),
+    ).add_to(regroupement)
+    return groupe
+
+
+def generer_carte(jeu, groupes: list, avec_fond: bool = False):
+    """
+    Crée la carte des résultats : une couche GeoJSON par zone (couleur propre, popups
+    construits à l'ouverture), regroupée en clusters au-delà de SEUIL_REGROUPEMENT salles.
+    Avec `avec_fond`, la couche de tous les cinémas du jeu de données est ajoutée.
+    Retourne folium.Map, ou None si aucune salle n'est retenue.
+    """
+    import folium  # Import coûteux : chargé au premier rendu de carte, pas au démarrage de l'application
+    from folium.plugins import MarkerCluster
+
+    groupes = [groupe for groupe in groupes if len(groupe["resultats"]) > 0]
+    if not groupes:
+        return None
+    idx_cinemas = jeu.salles.cinema[np.concatenate([groupe["resultats"].ids_salles for groupe in groupes])]
+    centre = [float(jeu.points.lats[idx_cinemas].mean()), float(jeu.points.lons[idx_cinemas].mean())]
+    carte = folium.Map(location=centre, zoom_start=6, tiles="CartoDB positron")
+    if avec_fond:
+        _couche_fond(jeu).add_to(carte)
+
+    for idx, groupe in enumerate(groupes):
+        couleur = COULEURS_ZONES[idx % len(COULEURS_ZONES)]
+        localisation, resultats = groupe["localisation"], groupe["resultats"]
+        couche = folium.FeatureGroup(name=f"{localisation} ({len(resultats)} salles)").add_to(carte)
+        parent = couche
+        if len(resultats) >= SEUIL_REGROUPEMENT:
+            parent = MarkerCluster(options={"disableClusteringAtZoom": ZOOM_FIN_REGROUPEMENT}).add_to(couche)
+        folium.GeoJson(
+            geojson_zone(jeu, resultats),
+            marker=folium.CircleMarker(radius=5, color=couleur, fill=True, fill_color=couleur, fill_opacity=0.7),
+            popup=folium.GeoJsonPopup(
+                CHAMPS_POPUP,
+                aliases=["Cinéma", "Salle", "Adresse", "Capacité (places)", f"Distance ({localisation}) (km)",
+                         "Contact", "📧"],
+                max_width=300,
+            ),
+        ).add_to(parent)
+    folium.LayerControl().add_to(carte)
+    return carte
@@ -0,0 +1,39 @@
+# --- compiler_donnees.py ---
+# Compile cinemas_groupedBig.json en bundle binaire projetable en mémoire (voir donnees_cinemas.py)
+# -*- coding: utf-8 -*-
+#
+# Usage : python compiler_donnees.py [cinemas_groupedBig.json]
+#
+# Le bundle est écrit dans "<fichier>.bundle/v<version>-<empreinte>/" : un fichier .npy par colonne,
+# la table de chaînes (bloc UTF-8 + offsets), les index pré-construits (spatial, équipements) et un manifeste.
+# L'application compile le bundle d'elle-même au premier chargement si nécessaire ;
+# ce script permet de le préparer à l'avance (ex : à la construction d'une image de déploiement).
+
+import os
+import sys
+import time
+
+from donnees_cinemas import chemin_bundle, ecrire_bundle, empreinte_fichier, lire_jeu_de_donnees, ouvrir_bundle
+
+
+def compiler(chemin_json: str):
+    chemin_json = os.path.abspath(chemin_json)
+    mtime_ns = os.stat(chemin_json).st_mtime_ns
+    debut = time.perf_counter()
+    jeu = lire_jeu_de_donnees(chemin_json, mtime_ns)
+    empreinte = empreinte_fichier(chemin_json)
+    dossier = ecrire_bundle(jeu, chemin_bundle(chemin_json), empreinte)
+    duree_compilation = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    jeu_bundle = ouvrir_bundle(dossier, chemin_json, mtime_ns, empreinte)
+    duree_ouverture = time.perf_counter() - debut
+    if jeu_bundle is None or len(jeu_bundle.cinemas) != len(jeu.cinemas):
+        sys.exit(f"Erreur : le bundle écrit dans '{dossier}' est illisible.")
+    taille = sum(os.path.getsize(os.path.join(dossier, nom)) for nom in os.listdir(dossier))
+    print(f"{len(jeu.cinemas)} cinémas et {len(jeu.salles.nom)} salles compilés dans '{dossier}' "
+          f"({taille / 1024:.0f} Ko, {duree_compilation * 1000:.0f} ms ; ouverture {duree_ouverture * 1000:.1f} ms).")
+
+
+if __name__ == "__main__":
+    compiler(sys.argv[1] if len(sys.argv) > 1 else "cinemas_groupedBig.json")
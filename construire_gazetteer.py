@@ -0,0 +1,108 @@
+# --- construire_gazetteer.py ---
+# Génère gazetteer_france.json : régions et communes françaises pour le géocodage hors ligne
+# -*- coding: utf-8 -*-
+#
+# Usage : python construire_gazetteer.py [cinemas_groupedBig.json] [gazetteer_france.json]
+#
+# Les communes proviennent de deux sources :
+# - une table de référence (grandes villes, coordonnées du centre-ville),
+# - les adresses du fichier de cinémas ("... - 75017 Paris") : la position retenue est
+#   le barycentre des cinémas de la commune, suffisant pour centrer une recherche par rayon.
+# La table de référence est prioritaire en cas de doublon.
+
+import json
+import re
+import sys
+from collections import defaultdict
+
+from geocodage import normaliser_nom_ville
+
+REGIONS = [
+    ("Île-de-France", 48.6443, 2.7537), ("Hauts-de-France", 50.4801, 2.7937),
+    ("Grand Est", 48.6998, 6.1878), ("Normandie", 49.1210, 0.1102),
+    ("Bretagne", 48.2020, -2.9326), ("Pays de la Loire", 47.7633, -0.3300),
+    ("Centre-Val de Loire", 47.7516, 1.6751), ("Bourgogne-Franche-Comté", 47.2805, 4.9994),
+    ("Nouvelle-Aquitaine", 45.1930, 0.7218), ("Occitanie", 43.8927, 3.2828),
+    ("Auvergne-Rhône-Alpes", 45.4473, 4.3859), ("Provence-Alpes-Côte d'Azur", 43.9352, 6.0679),
+    ("Corse", 42.0396, 9.0129),
+]
+
+VILLES_REFERENCE = [
+    ("Paris", 48.8535, 2.3484), ("Marseille", 43.2962, 5.3700), ("Lyon", 45.7578, 4.8320),
+    ("Toulouse", 43.6045, 1.4442), ("Nice", 43.7009, 7.2684), ("Nantes", 47.2186, -1.5541),
+    ("Montpellier", 43.6112, 3.8767), ("Strasbourg", 48.5846, 7.7507), ("Bordeaux", 44.8412, -0.5800),
+    ("Lille", 50.6366, 3.0635), ("Rennes", 48.1113, -1.6800), ("Reims", 49.2578, 4.0319),
+    ("Toulon", 43.1257, 5.9305), ("Saint-Étienne", 45.4401, 4.3873), ("Le Havre", 49.4939, 0.1080),
+    ("Grenoble", 45.1876, 5.7358), ("Dijon", 47.3216, 5.0415), ("Angers", 47.4740, -0.5516),
+    ("Nîmes", 43.8374, 4.3601), ("Villeurbanne", 45.7733, 4.8869), ("Clermont-Ferrand", 45.7775, 3.0819),
+    ("Le Mans", 48.0074, 0.1968), ("Aix-en-Provence", 43.5298, 5.4475), ("Brest", 48.3905, -4.4860),
+    ("Tours", 47.3900, 0.6889), ("Amiens", 49.8942, 2.2957), ("Limoges", 45.8354, 1.2645),
+    ("Annecy", 45.8992, 6.1289), ("Perpignan", 42.6985, 2.8953), ("Metz", 49.1197, 6.1764),
+    ("Besançon", 47.2380, 6.0244), ("Orléans", 47.9027, 1.9086), ("Rouen", 49.4405, 1.0940),
+    ("Mulhouse", 47.7494, 7.3399), ("Caen", 49.1828, -0.3691), ("Nancy", 48.6937, 6.1834),
+    ("Avignon", 43.9492, 4.8059), ("Poitiers", 46.5803, 0.3402), ("La Rochelle", 46.1591, -1.1520),
+    ("Pau", 43.2958, -0.3686), ("Calais", 50.9527, 1.8534), ("Dunkerque", 51.0348, 2.3773),
+    ("Ajaccio", 41.9264, 8.7376), ("Bastia", 42.7031, 9.4509), ("Cannes", 43.5515, 7.0134),
+    ("Bayonne", 43.4933, -1.4751), ("Biarritz", 43.4833, -1.5593), ("Lorient", 47.7477, -3.3661),
+    ("Vannes", 47.6587, -2.7599), ("Quimper", 47.9960, -4.1025), ("Saint-Malo", 48.6495, -2.0260),
+    ("Chambéry", 45.5663, 5.9204), ("Valence", 44.9332, 4.8920), ("Troyes", 48.2972, 4.0746),
+    ("Versailles", 48.8035, 2.1267), ("Saint-Denis", 48.9358, 2.3580), ("Boulogne-Billancourt", 48.8357, 2.2402),
+    ("Argenteuil", 48.9479, 2.2482), ("Montreuil", 48.8623, 2.4412), ("Nanterre", 48.8924, 2.2071),
+    ("Créteil", 48.7771, 2.4531),
+]
+
+MOTIF_CODE_POSTAL = re.compile(r"\b(\d{5})\s+([^\d,\s-][^\d,]*?)\s*$")
+
+
+def communes_depuis_cinemas(chemin_cinemas: str):
+    """
+    Extrait les communes des adresses de cinémas.
+    Retourne une liste de (nom, lat, lon, nb_cinemas), une entrée par nom normalisé
+    (en cas d'homonymie, la commune qui compte le plus de cinémas est retenue).
+    """
+    with open(chemin_cinemas, "r", encoding="utf-8") as f:
+        cinemas = json.load(f)
+    positions = defaultdict(list)
+    for cinema in cinemas:
+        adresse, lat, lon = cinema.get("adresse") or "", cinema.get("lat"), cinema.get("lon")
+        correspondance = MOTIF_CODE_POSTAL.search(adresse)
+        if correspondance is None or lat is None or lon is None:
+            continue
+        code_postal, nom = correspondance.groups()
+        positions[(code_postal[:2], nom.strip())].append((float(lat), float(lon)))
+
+    par_nom = {}
+    for (_, nom), coords in positions.items():
+        cle = normaliser_nom_ville(nom)
+        if cle in par_nom and par_nom[cle][3] >= len(coords):
+            continue
+        lat = sum(c[0] for c in coords) / len(coords)
+        lon = sum(c[1] for c in coords) / len(coords)
+        par_nom[cle] = (nom, round(lat, 4), round(lon, 4), len(coords))
+    return list(par_nom.values())
+
+
+def construire(chemin_cinemas: str, chemin_sortie: str):
+    communes = {normaliser_nom_ville(nom): {"nom": nom, "lat": lat, "lon": lon}
+                for nom, lat, lon, _ in communes_depuis_cinemas(chemin_cinemas)}
+    for nom, lat, lon in VILLES_REFERENCE:
+        communes[normaliser_nom_ville(nom)] = {"nom": nom, "lat": lat, "lon": lon}
+    gazetteer = {
+        "regions": [{"nom": nom, "lat": lat, "lon": lon} for nom, lat, lon in REGIONS],
+        "communes": sorted(communes.values(), key=lambda c: normaliser_nom_ville(c["nom"])),
+    }
+    # Une entrée par ligne : fichier compact mais lisible dans un diff
+    with open(chemin_sortie, "w", encoding="utf-8") as f:
+        f.write("{\n")
+        for i, section in enumerate(("regions", "communes")):
+            lignes = ",\n".join(json.dumps(e, ensure_ascii=False) for e in gazetteer[section])
+            f.write(f'"{section}": [\n{lignes}\n]' + (",\n" if i == 0 else "\n"))
+        f.write("}\n")
+    print(f"{len(gazetteer['regions'])} régions et {len(gazetteer['communes'])} communes écrites dans '{chemin_sortie}'.")
+
+
+if __name__ == "__main__":
+    construire(
+        sys.argv[1] if len(sys.argv) > 1 else "cinemas_groupedBig.json",
+        sys.argv[2] if len(sys.argv) > 2 else "gazetteer_france.json",
+    )
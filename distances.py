@@ -0,0 +1,122 @@
+# --- distances.py ---
+# Calcul vectorisé des distances géodésiques (ellipsoïde WGS-84) avec NumPy
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+# Paramètres de l'ellipsoïde WGS-84 (identiques à ceux utilisés par geopy.distance.geodesic)
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+
+VINCENTY_TOLERANCE = 1e-12
+VINCENTY_ITERATIONS_MAX = 200
+
+
+def _latitude_reduite(lats_deg: np.ndarray):
+    """Retourne (sin U, cos U) de la latitude réduite pour des latitudes en degrés."""
+    u = np.arctan((1 - WGS84_F) * np.tan(np.radians(lats_deg)))
+    return np.sin(u), np.cos(u)
+
+
+def _vincenty_km(sin_u1, cos_u1, lon1_rad, sin_u2, cos_u2, lon2_rad):
+    """
+    Formule inverse de Vincenty, vectorisée (les entrées sont diffusées entre elles).
+    Retourne (distances_km, masque_non_convergent). La précision est submillimétrique
+    sauf pour les points quasi antipodaux, signalés dans le masque.
+    """
+    L = lon2_rad - lon1_rad
+    lam = L
+    sin_u1_sin_u2 = sin_u1 * sin_u2
+    cos_u1_cos_u2 = cos_u1 * cos_u2
+    converge = np.zeros(np.broadcast(sin_u1, sin_u2, L).shape, dtype=bool)
+    for _ in range(VINCENTY_ITERATIONS_MAX):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+        cos_sigma = sin_u1_sin_u2 + cos_u1_cos_u2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1_cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1_sin_u2 / cos2_alpha)
+        C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+        lam_precedent = lam
+        lam = L + (1 - C) * WGS84_F * sin_alpha * (
+            sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+        )
+        converge = np.abs(lam - lam_precedent) <= VINCENTY_TOLERANCE
+        if converge.all():
+            break
+
+    u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = B * sin_sigma * (
+        cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        )
+    )
+    distances_km = WGS84_B * A * (sigma - delta_sigma) / 1000.0
+    return distances_km, ~converge
+
+
+class PointsGeodesiques:
+    """
+    Nuage de points fixe (ex : tous les cinémas) stocké en tableaux float64 contigus,
+    avec les termes trigonométriques pré-calculés une fois pour toutes.
+    Les distances retournées sont cohérentes avec geopy.distance.geodesic au millimètre près.
+    """
+
+    def __init__(self, lats, lons):
+        self.lats = np.ascontiguousarray(lats, dtype=np.float64)
+        self.lons = np.ascontiguousarray(lons, dtype=np.float64)
+        self._sin_u, self._cos_u = _latitude_reduite(self.lats)
+        self._lons_rad = np.radians(self.lons)
+        for tableau in (self.lats, self.lons, self._sin_u, self._cos_u, self._lons_rad):
+            tableau.flags.writeable = False
+
+    def __len__(self):
+        return len(self.lats)
+
+    def distances_km(self, lat: float, lon: float, indices=None):
+        """
+        Retourne les distances (km) entre le point (lat, lon) et les points du nuage,
+        ou seulement ceux désignés par `indices` si fourni.
+        """
+        if indices is None:
+            sin_u2, cos_u2, lons2 = self._sin_u, self._cos_u, self._lons_rad
+            lats2, lons2_deg = self.lats, self.lons
+        else:
+            sin_u2, cos_u2, lons2 = self._sin_u[indices], self._cos_u[indices], self._lons_rad[indices]
+            lats2, lons2_deg = self.lats[indices], self.lons[indices]
+        sin_u1, cos_u1 = _latitude_reduite(np.float64(lat))
+        distances, non_convergent = _vincenty_km(sin_u1, cos_u1, np.radians(lon), sin_u2, cos_u2, lons2)
+        if non_convergent.any():
+            from geopy.distance import geodesic  # Cas rares (points quasi antipodaux) : geopy chargé au besoin
+
+            for i in np.flatnonzero(non_convergent):
+                distances[i] = geodesic((lat, lon), (lats2[i], lons2_deg[i])).km
+        return distances
+
+    def matrice_distances_km(self, lats, lons, indices=None):
+        """
+        Retourne la matrice (nb_points_requete x nb_points_nuage) des distances en km
+        pour plusieurs points de requête, calculée en un seul appel vectorisé.
+        Avec `indices`, seules ces colonnes du nuage sont calculées.
+        """
+        lats = np.asarray(lats, dtype=np.float64).reshape(-1, 1)
+        lons = np.asarray(lons, dtype=np.float64).reshape(-1, 1)
+        if indices is None:
+            indices = np.arange(len(self), dtype=np.int64)
+        sin_u1, cos_u1 = _latitude_reduite(lats)
+        distances, non_convergent = _vincenty_km(
+            sin_u1, cos_u1, np.radians(lons), self._sin_u[indices], self._cos_u[indices], self._lons_rad[indices]
+        )
+        if non_convergent.any():
+            from geopy.distance import geodesic
+
+            for i, j in zip(*np.nonzero(non_convergent)):
+                point = indices[j]
+                distances[i, j] = geodesic((lats[i, 0], lons[i, 0]), (self.lats[point], self.lons[point])).km
+        return distances
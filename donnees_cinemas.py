@@ -0,0 +1,571 @@
+# --- donnees_cinemas.py ---
+# Couche de données partagée : chargement unique des cinémas pré-géocodés
+# -*- coding: utf-8 -*-
+
+import enum
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import numpy as np
+
+from distances import PointsGeodesiques
+from index_drapeaux import IndexDrapeaux
+from index_spatial import IndexGrille
+
+
+class Equipement(enum.IntFlag):
+    """Équipements d'une salle, extraits du champ `equipement` (ex : "3D35mmNumériqueAtmos")."""
+    NUMERIQUE = enum.auto()
+    TROIS_D = enum.auto()
+    MM35 = enum.auto()
+    ATMOS = enum.auto()
+    QUATRE_DX = enum.auto()
+    IMAX = enum.auto()
+    ICE = enum.auto()
+    DOLBY_CINEMA = enum.auto()
+    SCREENX = enum.auto()
+
+
+class FormatProjection(enum.IntFlag):
+    """Formats de projection d'une salle, extraits du champ `format_projection` (ex : "Numérique 2D, IMAX 2D")."""
+    NUMERIQUE_2D = enum.auto()
+    NUMERIQUE_3D = enum.auto()
+    ARGENTIQUE = enum.auto()
+    IMAX = enum.auto()
+    ICE = enum.auto()
+    QUATRE_DX = enum.auto()
+    DOLBY_VISION = enum.auto()
+    LED = enum.auto()
+    MX4D = enum.auto()
+    E_MOTION_4D = enum.auto()
+
+
+# Jetons reconnus dans les champs texte, testés dans cet ordre
+_JETONS_EQUIPEMENT = (
+    ("3D", Equipement.TROIS_D), ("35mm", Equipement.MM35), ("Numérique", Equipement.NUMERIQUE),
+    ("Atmos", Equipement.ATMOS), ("4DX", Equipement.QUATRE_DX), ("Imax", Equipement.IMAX),
+    ("Ice", Equipement.ICE), ("Dolby Cinema", Equipement.DOLBY_CINEMA), ("ScreenX", Equipement.SCREENX),
+)
+_JETONS_FORMAT = (
+    (re.compile(r"num[ée]rique 2d", re.I), FormatProjection.NUMERIQUE_2D),
+    (re.compile(r"num[ée]rique 3d", re.I), FormatProjection.NUMERIQUE_3D),
+    (re.compile(r"argentique", re.I), FormatProjection.ARGENTIQUE),
+    (re.compile(r"\bimax\b", re.I), FormatProjection.IMAX),
+    (re.compile(r"\bice\b", re.I), FormatProjection.ICE),
+    (re.compile(r"\b4dx\b", re.I), FormatProjection.QUATRE_DX),
+    (re.compile(r"dolby ?vision", re.I), FormatProjection.DOLBY_VISION),
+    (re.compile(r"\bled\b", re.I), FormatProjection.LED),
+    (re.compile(r"\bmx4d\b", re.I), FormatProjection.MX4D),
+    (re.compile(r"4de-motion", re.I), FormatProjection.E_MOTION_4D),
+)
+
+
+def analyser_equipement(texte: str):
+    """Retourne les drapeaux Equipement présents dans le texte brut du champ `equipement`."""
+    drapeaux = Equipement(0)
+    for jeton, drapeau in _JETONS_EQUIPEMENT:
+        if jeton in texte:
+            drapeaux |= drapeau
+    return drapeaux
+
+
+def analyser_format_projection(texte: str):
+    """Retourne les drapeaux FormatProjection présents dans le texte brut du champ `format_projection`."""
+    drapeaux = FormatProjection(0)
+    for motif, drapeau in _JETONS_FORMAT:
+        if motif.search(texte):
+            drapeaux |= drapeau
+    return drapeaux
+
+
+@dataclass(frozen=True, slots=True)
+class Salle:
+    """
+    Salle d'un cinéma, normalisée au chargement : capacité entière (0 si absente ou
+    invalide), identifiant CNC, équipements et formats de projection sous forme de
+    drapeaux. Les textes d'origine sont conservés pour l'affichage.
+    """
+    salle: str
+    cnc: str
+    capacite: int
+    equipement: str
+    format_projection: str
+    equipements: Equipement
+    formats: FormatProjection
+
+
+@dataclass(frozen=True, slots=True)
+class Cinema:
+    """
+    Cinéma validé (coordonnées présentes et numériques), étape intermédiaire du
+    chargement avant la compilation en colonnes.
+    `salles_triees` ne contient que les salles de capacité positive, par capacité
+    décroissante (ordre d'origine en cas d'égalité) ; les agrégats portent sur ces salles.
+    """
+    cinema: str
+    adresse: str
+    lat: float
+    lon: float
+    contact: MappingProxyType
+    salles: tuple
+    salles_triees: tuple
+    capacite_max: int
+    total_places: int
+    nb_salles: int
+
+
+class TableChaines:
+    """
+    Table de chaînes internées : chaque texte distinct (nom, adresse, contact, numéro de
+    salle...) n'est stocké qu'une fois et référencé par un identifiant entier.
+    Une table construite par interner() vit en mémoire ; une table ouverte depuis un
+    bundle lit ses textes dans un bloc d'octets UTF-8 projeté en mémoire (voir depuis_octets).
+    """
+
+    def __init__(self, chaines=()):
+        self._chaines = list(chaines)
+        self._ids = None
+        self._octets = None
+        self._offsets = None
+
+    @classmethod
+    def depuis_octets(cls, octets, offsets):
+        """Crée une table en lecture seule : la chaîne i est octets[offsets[i]:offsets[i + 1]]."""
+        table = cls()
+        table._chaines = None
+        table._octets, table._offsets = octets, offsets
+        return table
+
+    def vers_octets(self):
+        """Retourne (octets uint8, offsets int64) pour l'écriture dans un bundle."""
+        encodees = [chaine.encode("utf-8") for chaine in self.chaines]
+        offsets = np.zeros(len(encodees) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encodees], out=offsets[1:])
+        return np.frombuffer(b"".join(encodees), dtype=np.uint8), offsets
+
+    def _index_inverse(self):
+        if self._ids is None:
+            self._ids = {chaine: i for i, chaine in enumerate(self.chaines)}
+        return self._ids
+
+    def interner(self, chaine):
+        """Retourne l'identifiant de la chaîne, en l'ajoutant à la table si nécessaire."""
+        if self._chaines is None:
+            raise TypeError("Table de chaînes en lecture seule (ouverte depuis un bundle).")
+        chaine = "" if chaine is None else str(chaine)
+        ids = self._index_inverse()
+        identifiant = ids.get(chaine)
+        if identifiant is None:
+            identifiant = len(self._chaines)
+            self._chaines.append(chaine)
+            ids[chaine] = identifiant
+        return identifiant
+
+    def identifiant(self, chaine: str):
+        """Retourne l'identifiant d'une chaîne déjà présente, ou None."""
+        return self._index_inverse().get(chaine)
+
+    def __getitem__(self, identifiant):
+        if self._chaines is not None:
+            return self._chaines[identifiant]
+        debut, fin = self._offsets[identifiant], self._offsets[identifiant + 1]
+        return self._octets[debut:fin].tobytes().decode("utf-8")
+
+    def __len__(self):
+        if self._chaines is not None:
+            return len(self._chaines)
+        return len(self._offsets) - 1
+
+    @property
+    def chaines(self):
+        if self._chaines is not None:
+            return tuple(self._chaines)
+        return tuple(self[i] for i in range(len(self)))
+
+
+@dataclass(frozen=True, slots=True)
+class ColonnesCinemas:
+    """
+    Colonnes par cinéma (un élément par cinéma valide). Les textes sont des identifiants
+    dans la TableChaines du jeu de données. Les salles du cinéma i occupent la plage
+    [debut_salles[i], debut_salles[i + 1]) des ColonnesSalles, les `nb_salles[i]`
+    premières étant les salles de capacité positive, par capacité décroissante.
+    """
+    nom: np.ndarray
+    adresse: np.ndarray
+    contact_nom: np.ndarray
+    contact_email: np.ndarray
+    contact_telephone: np.ndarray
+    debut_salles: np.ndarray
+    nb_salles: np.ndarray
+    capacite_max: np.ndarray
+    total_places: np.ndarray
+
+    def __len__(self):
+        return len(self.nom)
+
+
+@dataclass(frozen=True, slots=True)
+class ColonnesSalles:
+    """
+    Colonnes par salle (un élément par salle, identifiant = position). Les salles sont
+    rangées par cinéma, puis par capacité décroissante.
+    """
+    cinema: np.ndarray
+    nom: np.ndarray
+    cnc: np.ndarray
+    capacite: np.ndarray
+    equipement: np.ndarray
+    format_projection: np.ndarray
+    equipements: np.ndarray
+    formats: np.ndarray
+
+    def __len__(self):
+        return len(self.cinema)
+
+
+@dataclass(frozen=True, slots=True)
+class JeuDeDonnees:
+    """
+    Jeu de données chargé depuis un fichier, avec son horodatage de modification,
+    stocké en colonnes NumPy en lecture seule et partagé par toutes les sessions.
+    `points` contient les coordonnées des cinémas en tableaux float64 contigus, dans
+    le même ordre que `cinemas`, et `index` est l'index spatial construit sur ces points.
+    `index_equipements` et `index_formats` sont les index en bitsets des drapeaux des salles.
+    """
+    chemin: str
+    mtime_ns: int
+    nb_ignores: int
+    chaines: TableChaines
+    cinemas: ColonnesCinemas
+    salles: ColonnesSalles
+    points: PointsGeodesiques
+    index: IndexGrille
+    index_equipements: IndexDrapeaux
+    index_formats: IndexDrapeaux
+
+    def masque_equipements(self, exigences):
+        """
+        Masque des salles remplissant toutes les `exigences`, chacune étant un couple
+        (Equipement, FormatProjection) satisfait par l'un de ses drapeaux (ex : IMAX en
+        équipement ou en format). Calculé sur les bitsets ; retourne None sans exigence.
+        """
+        if not exigences:
+            return None
+        bitset = None
+        for equipements, formats in exigences:
+            lignes = self.index_equipements.bitset(equipements) | self.index_formats.bitset(formats)
+            bitset = lignes if bitset is None else bitset & lignes
+        return self.index_equipements.masque(bitset)
+
+    def cinemas_eligibles(self, masque_salles=None):
+        """Masque des cinémas ayant au moins une salle valide (dans `masque_salles` s'il est donné)."""
+        if masque_salles is None:
+            return self.cinemas.capacite_max > 0
+        eligibles = np.zeros(len(self.cinemas), dtype=bool)
+        eligibles[self.salles.cinema[masque_salles & (self.salles.capacite > 0)]] = True
+        return eligibles
+
+    def salles_valides(self, idx_cinema: int):
+        """Retourne les identifiants des salles de capacité positive d'un cinéma, par capacité décroissante."""
+        debut = int(self.cinemas.debut_salles[idx_cinema])
+        return range(debut, debut + int(self.cinemas.nb_salles[idx_cinema]))
+
+
+_verrou = threading.Lock()
+_jeux_charges = {}
+
+
+def _coordonnee_valide(valeur, borne: float):
+    """
+    Convertit une coordonnée en float si elle est exploitable.
+    Retourne le float ou None si la valeur est absente, non numérique ou hors bornes.
+    """
+    if valeur is None or isinstance(valeur, bool):
+        return None
+    try:
+        valeur = float(valeur)
+    except (ValueError, TypeError):
+        return None
+    if not math.isfinite(valeur) or abs(valeur) > borne:
+        return None
+    return valeur
+
+
+def _construire_cinema(brut: dict):
+    """
+    Construit un Cinema immuable à partir d'une entrée brute du JSON.
+    Retourne le Cinema ou None si l'entrée n'a pas de coordonnées valides.
+    """
+    lat = _coordonnee_valide(brut.get("lat"), 90.0)
+    lon = _coordonnee_valide(brut.get("lon"), 180.0)
+    if lat is None or lon is None:
+        return None
+    salles = tuple(_construire_salle(s) for s in brut.get("salles", []) if isinstance(s, dict))
+    salles_triees = tuple(sorted((s for s in salles if s.capacite > 0), key=lambda s: s.capacite, reverse=True))
+    contact = brut.get("contact") or {}
+    return Cinema(
+        cinema=brut.get("cinema"),
+        adresse=brut.get("adresse"),
+        lat=lat,
+        lon=lon,
+        contact=MappingProxyType(dict(contact)),
+        salles=salles,
+        salles_triees=salles_triees,
+        capacite_max=salles_triees[0].capacite if salles_triees else 0,
+        total_places=sum(s.capacite for s in salles_triees),
+        nb_salles=len(salles_triees),
+    )
+
+
+def _capacite_entiere(valeur):
+    """Convertit une capacité brute ("187", 187, "") en int positif, ou 0 si elle n'est pas exploitable."""
+    try:
+        return max(int(valeur), 0)
+    except (ValueError, TypeError):
+        return 0
+
+
+def _construire_salle(brut: dict):
+    """Construit une Salle typée à partir d'une entrée brute du JSON."""
+    equipement = str(brut.get("equipement") or "")
+    format_projection = str(brut.get("format_projection") or "")
+    return Salle(
+        salle=str(brut.get("salle", "")),
+        cnc=str(brut.get("cnc") or ""),
+        capacite=_capacite_entiere(brut.get("capacite")),
+        equipement=equipement,
+        format_projection=format_projection,
+        equipements=analyser_equipement(equipement),
+        formats=analyser_format_projection(format_projection),
+    )
+
+
+def _colonne(valeurs, dtype):
+    """Crée une colonne NumPy en lecture seule."""
+    colonne = np.array(valeurs, dtype=dtype)
+    colonne.flags.writeable = False
+    return colonne
+
+
+def _compiler_colonnes(cinemas: list):
+    """
+    Compile les enregistrements Cinema validés en colonnes et table de chaînes.
+    Retourne (TableChaines, ColonnesCinemas, ColonnesSalles).
+    """
+    chaines = TableChaines()
+    par_cinema = {nom: [] for nom in ColonnesCinemas.__slots__}
+    par_salle = {nom: [] for nom in ColonnesSalles.__slots__}
+    debut = 0
+    for idx_cinema, cinema in enumerate(cinemas):
+        par_cinema["nom"].append(chaines.interner(cinema.cinema))
+        par_cinema["adresse"].append(chaines.interner(cinema.adresse))
+        par_cinema["contact_nom"].append(chaines.interner(cinema.contact.get("nom")))
+        par_cinema["contact_email"].append(chaines.interner(cinema.contact.get("email")))
+        par_cinema["contact_telephone"].append(chaines.interner(cinema.contact.get("telephone")))
+        par_cinema["debut_salles"].append(debut)
+        par_cinema["nb_salles"].append(cinema.nb_salles)
+        par_cinema["capacite_max"].append(cinema.capacite_max)
+        par_cinema["total_places"].append(cinema.total_places)
+        salles = cinema.salles_triees + tuple(s for s in cinema.salles if s.capacite <= 0)
+        for salle in salles:
+            par_salle["cinema"].append(idx_cinema)
+            par_salle["nom"].append(chaines.interner(salle.salle))
+            par_salle["cnc"].append(chaines.interner(salle.cnc))
+            par_salle["capacite"].append(salle.capacite)
+            par_salle["equipement"].append(chaines.interner(salle.equipement))
+            par_salle["format_projection"].append(chaines.interner(salle.format_projection))
+            par_salle["equipements"].append(int(salle.equipements))
+            par_salle["formats"].append(int(salle.formats))
+        debut += len(salles)
+    par_cinema["debut_salles"].append(debut)
+    colonnes_cinemas = ColonnesCinemas(**{nom: _colonne(v, np.int32) for nom, v in par_cinema.items()})
+    colonnes_salles = ColonnesSalles(**{nom: _colonne(v, np.int32) for nom, v in par_salle.items()})
+    return chaines, colonnes_cinemas, colonnes_salles
+
+
+def lire_jeu_de_donnees(chemin: str, mtime_ns: int):
+    """
+    Lit et valide le fichier JSON des cinémas, puis le compile en colonnes.
+    Les enregistrements Cinema/Salle intermédiaires ne sont pas conservés.
+    Lève FileNotFoundError ou json.JSONDecodeError comme json.load.
+    Chaque appel relit le fichier : l'application passe par charger_cinemas (jeu partagé),
+    les outils (compilation du bundle, bancs d'essai) appellent cette fonction directement.
+    """
+    with open(chemin, "r", encoding="utf-8") as f:
+        donnees_brutes = json.load(f)
+    cinemas = []
+    for brut in donnees_brutes:
+        cinema = _construire_cinema(brut) if isinstance(brut, dict) else None
+        if cinema is not None:
+            cinemas.append(cinema)
+    chaines, colonnes_cinemas, colonnes_salles = _compiler_colonnes(cinemas)
+    points = PointsGeodesiques([c.lat for c in cinemas], [c.lon for c in cinemas])
+    return JeuDeDonnees(
+        chemin=chemin,
+        mtime_ns=mtime_ns,
+        nb_ignores=len(donnees_brutes) - len(cinemas),
+        chaines=chaines,
+        cinemas=colonnes_cinemas,
+        salles=colonnes_salles,
+        points=points,
+        index=IndexGrille(points),
+        index_equipements=IndexDrapeaux.depuis_colonne(colonnes_salles.equipements, len(Equipement)),
+        index_formats=IndexDrapeaux.depuis_colonne(colonnes_salles.formats, len(FormatProjection)),
+    )
+
+
+VERSION_BUNDLE = 2
+FICHIER_MANIFESTE = "manifeste.json"
+
+
+def chemin_bundle(chemin_json: str):
+    """Retourne le dossier des bundles binaires associé à un fichier JSON ("x.json" -> "x.bundle")."""
+    return os.path.splitext(chemin_json)[0] + ".bundle"
+
+
+def _nom_bundle(empreinte: str):
+    """Nom du dossier d'un bundle : version du format et empreinte du JSON source."""
+    return f"v{VERSION_BUNDLE}-{empreinte[:16]}"
+
+
+def empreinte_fichier(chemin: str):
+    """Retourne l'empreinte SHA-256 (hexadécimale) du contenu d'un fichier."""
+    empreinte = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 20), b""):
+            empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+
+def _tableaux_du_jeu(jeu: JeuDeDonnees):
+    """Retourne {nom de fichier sans extension: tableau} pour toutes les colonnes du jeu."""
+    tableaux = {f"cinemas.{nom}": getattr(jeu.cinemas, nom) for nom in ColonnesCinemas.__slots__}
+    tableaux.update({f"salles.{nom}": getattr(jeu.salles, nom) for nom in ColonnesSalles.__slots__})
+    tableaux["points.lats"], tableaux["points.lons"] = jeu.points.lats, jeu.points.lons
+    tableaux["index.ordre"], tableaux["index.cles_triees"] = jeu.index.ordre, jeu.index.cles_triees
+    tableaux["index.equipements"], tableaux["index.formats"] = jeu.index_equipements.bitsets, jeu.index_formats.bitsets
+    tableaux["chaines.octets"], tableaux["chaines.offsets"] = jeu.chaines.vers_octets()
+    return tableaux
+
+
+def ecrire_bundle(jeu: JeuDeDonnees, dossier_bundles: str, empreinte: str):
+    """
+    Écrit le jeu de données en bundle binaire : un fichier .npy par colonne (projetable en
+    mémoire), la table de chaînes en bloc UTF-8 + offsets, l'index spatial pré-construit,
+    et un manifeste. Le bundle est écrit dans un dossier temporaire puis renommé en
+    <dossier_bundles>/v<version>-<empreinte[:16]>, et les bundles périmés (autre empreinte
+    ou autre version du format) sont supprimés.
+    Retourne le chemin du bundle.
+    """
+    os.makedirs(dossier_bundles, exist_ok=True)
+    destination = os.path.join(dossier_bundles, _nom_bundle(empreinte))
+    dossier_temp = tempfile.mkdtemp(dir=dossier_bundles, prefix=".tmp-")
+    try:
+        for nom, tableau in _tableaux_du_jeu(jeu).items():
+            np.save(os.path.join(dossier_temp, f"{nom}.npy"), np.ascontiguousarray(tableau), allow_pickle=False)
+        manifeste = {
+            "version": VERSION_BUNDLE,
+            "source": os.path.basename(jeu.chemin),
+            "sha256": empreinte,
+            "nb_ignores": jeu.nb_ignores,
+            "taille_cellule_deg": jeu.index.taille_cellule,
+        }
+        with open(os.path.join(dossier_temp, FICHIER_MANIFESTE), "w", encoding="utf-8") as f:
+            json.dump(manifeste, f, ensure_ascii=False, indent=2)
+        try:
+            os.rename(dossier_temp, destination)
+        except OSError:
+            if not os.path.isdir(destination):
+                raise
+            shutil.rmtree(dossier_temp, ignore_errors=True)  # Écrit entre-temps par un autre processus
+    except Exception:
+        shutil.rmtree(dossier_temp, ignore_errors=True)
+        raise
+    for nom in os.listdir(dossier_bundles):
+        if nom != _nom_bundle(empreinte) and not nom.startswith(".tmp-"):
+            shutil.rmtree(os.path.join(dossier_bundles, nom), ignore_errors=True)
+    return destination
+
+
+def ouvrir_bundle(dossier: str, chemin_json: str, mtime_ns: int, empreinte: str):
+    """
+    Ouvre un bundle en projetant chaque colonne en mémoire (lecture seule) : les processus
+    qui ouvrent le même bundle partagent les pages du cache système.
+    Retourne le JeuDeDonnees, ou None si le bundle est absent, incomplet ou d'une autre empreinte.
+    """
+    try:
+        with open(os.path.join(dossier, FICHIER_MANIFESTE), "r", encoding="utf-8") as f:
+            manifeste = json.load(f)
+        if manifeste.get("version") != VERSION_BUNDLE or manifeste.get("sha256") != empreinte:
+            return None
+
+        def colonne(nom):
+            return np.load(os.path.join(dossier, f"{nom}.npy"), mmap_mode="r", allow_pickle=False)
+
+        points = PointsGeodesiques(colonne("points.lats"), colonne("points.lons"))
+        salles = ColonnesSalles(**{nom: colonne(f"salles.{nom}") for nom in ColonnesSalles.__slots__})
+        return JeuDeDonnees(
+            chemin=chemin_json,
+            mtime_ns=mtime_ns,
+            nb_ignores=int(manifeste["nb_ignores"]),
+            chaines=TableChaines.depuis_octets(colonne("chaines.octets"), colonne("chaines.offsets")),
+            cinemas=ColonnesCinemas(**{nom: colonne(f"cinemas.{nom}") for nom in ColonnesCinemas.__slots__}),
+            salles=salles,
+            points=points,
+            index=IndexGrille(points, manifeste["taille_cellule_deg"],
+                              ordre=colonne("index.ordre"), cles_triees=colonne("index.cles_triees")),
+            index_equipements=IndexDrapeaux(colonne("index.equipements"), len(salles)),
+            index_formats=IndexDrapeaux(colonne("index.formats"), len(salles)),
+        )
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def charger_avec_bundle(chemin_json: str, mtime_ns: int):
+    """
+    Ouvre le bundle correspondant à l'empreinte actuelle du JSON, en le (re)compilant
+    si besoin. Si le bundle ne peut pas être écrit (disque en lecture seule...),
+    le jeu lu depuis le JSON est utilisé directement. Comme lire_jeu_de_donnees, ne passe
+    pas par le jeu partagé de charger_cinemas.
+    """
+    empreinte = empreinte_fichier(chemin_json)
+    dossier_bundles = chemin_bundle(chemin_json)
+    jeu = ouvrir_bundle(os.path.join(dossier_bundles, _nom_bundle(empreinte)), chemin_json, mtime_ns, empreinte)
+    if jeu is not None:
+        return jeu
+    jeu = lire_jeu_de_donnees(chemin_json, mtime_ns)
+    try:
+        dossier = ecrire_bundle(jeu, dossier_bundles, empreinte)
+    except OSError:
+        return jeu
+    return ouvrir_bundle(dossier, chemin_json, mtime_ns, empreinte) or jeu
+
+
+def charger_cinemas(chemin: str, utiliser_bundle: bool = True):
+    """
+    Retourne le JeuDeDonnees partagé pour ce fichier.
+    Le fichier n'est relu que si son mtime a changé depuis le dernier chargement ;
+    toutes les sessions (et tous les reruns Streamlit) partagent la même copie en mémoire.
+    Avec `utiliser_bundle`, les colonnes sont projetées en mémoire depuis le bundle binaire
+    compilé à partir du JSON (recompilé automatiquement quand l'empreinte du JSON change).
+    """
+    chemin_absolu = os.path.abspath(chemin)
+    mtime_ns = os.stat(chemin_absolu).st_mtime_ns
+    with _verrou:
+        jeu = _jeux_charges.get(chemin_absolu)
+        if jeu is None or jeu.mtime_ns != mtime_ns:
+            if utiliser_bundle:
+                jeu = charger_avec_bundle(chemin_absolu, mtime_ns)
+            else:
+                jeu = lire_jeu_de_donnees(chemin_absolu, mtime_ns)
+            _jeux_charges[chemin_absolu] = jeu
+    return jeu
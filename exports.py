@@ -0,0 +1,198 @@
+# --- exports.py ---
+# Exports des résultats (Excel, CSV, Parquet) écrits en flux depuis le jeu de données,
+# mémoïsés sur l'empreinte des résultats
+# -*- coding: utf-8 -*-
+
+import csv
+import hashlib
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+from resultats import COLONNES_EXPORT, colonnes_export
+from traces import span
+
+EXPORTS_MAX_PAR_SESSION = 4  # Artefacts conservés par session (les plus anciens sont libérés)
+TAILLE_LOT_EXPORT = 2048     # Salles lues puis écrites à la fois
+LONGUEUR_MAX_FEUILLE = 31    # Limite d'Excel pour un nom de feuille
+COLONNE_ZONE = "Zone"        # Colonne ajoutée aux exports à plat (CSV, Parquet)
+
+
+def empreinte_groupes(jeu, groupes: list):
+    """
+    Empreinte (SHA-256 hexadécimal) du contenu des groupes de résultats : localisations,
+    identifiants de salles et distances, ainsi que le jeu de données (fichier et mtime).
+    Deux états de session aux résultats identiques partagent donc leurs exports.
+    """
+    empreinte = hashlib.sha256(f"{jeu.chemin}\0{jeu.mtime_ns}".encode("utf-8"))
+    for groupe in groupes:
+        resultats = groupe["resultats"]
+        empreinte.update(b"\0" + groupe["localisation"].encode("utf-8") + b"\0")
+        empreinte.update(resultats.ids_salles.tobytes())
+        empreinte.update(resultats.distances_km.tobytes())
+    return empreinte.hexdigest()
+
+
+def supprimer_fichier(chemin: str):
+    """Supprime un fichier d'export (ignore un fichier déjà supprimé)."""
+    try:
+        os.remove(chemin)
+    except FileNotFoundError:
+        pass
+
+
+def _liberer_tout(artefacts: OrderedDict, liberer):
+    for artefact in artefacts.values():
+        liberer(artefact)
+    artefacts.clear()
+
+
+class CacheExports:
+    """
+    Cache LRU des artefacts d'export d'une session, indexé par (type d'artefact, empreinte).
+    Un artefact n'est construit qu'à la première demande (clic sur un bouton de téléchargement),
+    puis resservi tant que les résultats ne changent pas ; au plus `taille_max` artefacts
+    sont conservés. `liberer` (ex : supprimer_fichier) est appelé sur chaque artefact évincé,
+    et sur ceux qui restent quand le cache est détruit (fin de session).
+    Les boutons de téléchargement appellent le cache depuis un autre thread.
+    """
+
+    def __init__(self, taille_max: int = EXPORTS_MAX_PAR_SESSION, liberer=None):
+        self.taille_max = taille_max
+        self.liberer = liberer
+        self._verrou = threading.Lock()
+        self._artefacts = OrderedDict()
+        if liberer is not None:
+            weakref.finalize(self, _liberer_tout, self._artefacts, liberer)
+
+    def obtenir(self, type_artefact: str, empreinte: str, construire):
+        """Retourne l'artefact (type, empreinte), construit par `construire()` s'il est absent."""
+        cle = (type_artefact, empreinte)
+        with self._verrou:
+            if cle in self._artefacts:
+                self._artefacts.move_to_end(cle)
+                return self._artefacts[cle]
+        artefact = construire()
+        evinces = []
+        with self._verrou:
+            if cle in self._artefacts:
+                # Construit entre-temps par un autre thread, qui a peut-être déjà remis son artefact :
+                # c'est lui qui est conservé, celui-ci est libéré
+                evinces.append(artefact)
+                artefact = self._artefacts[cle]
+            else:
+                self._artefacts[cle] = artefact
+            self._artefacts.move_to_end(cle)
+            while len(self._artefacts) > self.taille_max:
+                evinces.append(self._artefacts.popitem(last=False)[1])
+        if self.liberer is not None:
+            for evince in evinces:
+                self.liberer(evince)
+        return artefact
+
+
+def noms_feuilles_uniques(localisations: list):
+    """
+    Noms de feuilles Excel valides et distincts pour chaque localisation : caractères
+    spéciaux retirés, 31 caractères au plus, suffixe " (2)", " (3)"... en cas de collision
+    (Excel ne distingue pas la casse).
+    """
+    noms, pris = [], set()
+    for localisation in localisations:
+        base = "".join(c for c in localisation if c.isalnum() or c in (" ", "_", "-")).strip() or "Zone"
+        nom, n = base[:LONGUEUR_MAX_FEUILLE].rstrip(), 1
+        while nom.lower() in pris:
+            n += 1
+            suffixe = f" ({n})"
+            nom = base[:LONGUEUR_MAX_FEUILLE - len(suffixe)].rstrip() + suffixe
+        pris.add(nom.lower())
+        noms.append(nom)
+    return noms
+
+
+def _groupes_non_vides(groupes: list):
+    return [groupe for groupe in groupes if len(groupe["resultats"]) > 0]
+
+
+def _lots(jeu, resultats):
+    """Colonnes d'export des salles, lues par lots de TAILLE_LOT_EXPORT salles."""
+    for debut in range(0, len(resultats), TAILLE_LOT_EXPORT):
+        yield colonnes_export(jeu, resultats.tranche(debut, debut + TAILLE_LOT_EXPORT))
+
+
+def ecrire_excel(jeu, groupes: list, chemin: str):
+    """
+    Écrit le classeur Excel (une feuille par zone ayant des salles) dans `chemin`.
+    Mode constant_memory de xlsxwriter : chaque ligne est écrite sur disque dès qu'elle
+    est complète, la mémoire reste constante quel que soit le nombre de salles.
+    """
+    import xlsxwriter
+
+    groupes = _groupes_non_vides(groupes)
+    classeur = xlsxwriter.Workbook(chemin, {"constant_memory": True})
+    try:
+        entete = classeur.add_format({"bold": True})
+        for groupe, nom in zip(groupes, noms_feuilles_uniques([g["localisation"] for g in groupes])):
+            feuille = classeur.add_worksheet(nom)
+            feuille.write_row(0, 0, COLONNES_EXPORT, entete)
+            ligne = 1
+            for lot in _lots(jeu, groupe["resultats"]):
+                for valeurs in zip(*(lot[colonne] for colonne in COLONNES_EXPORT)):
+                    feuille.write_row(ligne, 0, valeurs)
+                    ligne += 1
+    finally:
+        classeur.close()
+
+
+def ecrire_csv(jeu, groupes: list, chemin: str):
+    """Écrit toutes les salles dans un CSV unique (colonne Zone en tête), encodé UTF-8 avec BOM pour Excel."""
+    with open(chemin, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow([COLONNE_ZONE] + COLONNES_EXPORT)
+        for groupe in _groupes_non_vides(groupes):
+            for lot in _lots(jeu, groupe["resultats"]):
+                writer.writerows(zip([groupe["localisation"]] * len(lot["Cinéma"]),
+                                     *(lot[colonne] for colonne in COLONNES_EXPORT)))
+
+
+def ecrire_parquet(jeu, groupes: list, chemin: str):
+    """Écrit toutes les salles dans un fichier Parquet (colonne Zone en tête), un groupe de lignes par lot."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(COLONNE_ZONE, pa.string()), ("Cinéma", pa.string()), ("Salle", pa.string()),
+                        ("Adresse", pa.string()), ("Capacité", pa.int32()), ("Distance (km)", pa.float64()),
+                        ("Contact", pa.string()), ("Latitude", pa.float64()), ("Longitude", pa.float64())])
+    with pq.ParquetWriter(chemin, schema) as writer:
+        for groupe in _groupes_non_vides(groupes):
+            for lot in _lots(jeu, groupe["resultats"]):
+                lot = {COLONNE_ZONE: [groupe["localisation"]] * len(lot["Cinéma"]), **lot}
+                writer.write_table(pa.Table.from_pydict(lot, schema=schema))
+
+
+# Format -> (fonction d'écriture, extension, type MIME)
+FORMATS_EXPORT = {
+    "xlsx": (ecrire_excel, "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (ecrire_csv, "csv", "text/csv"),
+    "parquet": (ecrire_parquet, "parquet", "application/vnd.apache.parquet"),
+}
+
+
+def exporter(jeu, groupes: list, format_export: str, dossier: str = None):
+    """
+    Écrit l'export des groupes au format `format_export` ("xlsx", "csv" ou "parquet") dans
+    un fichier temporaire (dossier temporaire du système par défaut, jamais le répertoire
+    de travail). Retourne le chemin du fichier ; à supprimer par l'appelant (voir CacheExports).
+    """
+    ecrire, extension, _ = FORMATS_EXPORT[format_export]
+    descripteur, chemin = tempfile.mkstemp(prefix="export-", suffix=f".{extension}", dir=dossier)
+    os.close(descripteur)
+    try:
+        with span("export", format=format_export, zones=len(groupes)):
+            ecrire(jeu, groupes, chemin)
+    except BaseException:
+        supprimer_fichier(chemin)
+        raise
+    return chemin
@@ -0,0 +1,207 @@
+# --- filtres.py ---
+# Prédicats déclaratifs sur les salles retenues et compilation des actions de raffinage en masques vectorisés
+# -*- coding: utf-8 -*-
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from donnees_cinemas import Equipement, FormatProjection
+from geocodage import normaliser_nom_ville
+
+# Champs propres à la salle (évaluables sur tout le jeu de données) ; distance et zone dépendent du groupe
+CHAMPS_SALLE = ("capacite", "equipement", "cinema")
+
+# Termes d'équipement ou de format reconnus dans les demandes (nom normalisé -> drapeaux)
+TERMES_EQUIPEMENT = {
+    "imax": (Equipement.IMAX, FormatProjection.IMAX),
+    "3d": (Equipement.TROIS_D, FormatProjection.NUMERIQUE_3D),
+    "atmos": (Equipement.ATMOS, FormatProjection(0)),
+    "dolby atmos": (Equipement.ATMOS, FormatProjection(0)),
+    "4dx": (Equipement.QUATRE_DX, FormatProjection.QUATRE_DX),
+    "ice": (Equipement.ICE, FormatProjection.ICE),
+    "dolby cinema": (Equipement.DOLBY_CINEMA, FormatProjection(0)),
+    "dolby vision": (Equipement(0), FormatProjection.DOLBY_VISION),
+    "screenx": (Equipement.SCREENX, FormatProjection(0)),
+    "35mm": (Equipement.MM35, FormatProjection.ARGENTIQUE),
+    "argentique": (Equipement.MM35, FormatProjection.ARGENTIQUE),
+    "pellicule": (Equipement.MM35, FormatProjection.ARGENTIQUE),
+    "led": (Equipement(0), FormatProjection.LED),
+    "mx4d": (Equipement(0), FormatProjection.MX4D),
+    "4d e motion": (Equipement(0), FormatProjection.E_MOTION_4D),
+    "numerique": (Equipement.NUMERIQUE, FormatProjection.NUMERIQUE_2D | FormatProjection.NUMERIQUE_3D),
+}
+
+# Actions "supprimer" de l'IA : (critère, opérateur) -> salles à retirer (champ, comparaison).
+# Reprend à l'identique la logique historique de l'application.
+TABLE_SUPPRESSION = {
+    ("capacite_min", "inferieur"): ("capacite", "<"),
+    ("capacite_min", "superieur"): ("capacite", ">"),
+    ("capacite_min", "egal"): ("capacite", "!="),
+    ("capacite_max", "inferieur"): ("capacite", ">"),
+    ("capacite_max", "superieur"): ("capacite", "<"),
+    ("capacite_max", "egal"): ("capacite", "!="),
+    ("distance_max", "inferieur"): ("distance", ">"),
+    ("distance_max", "superieur"): ("distance", "<"),
+    ("distance_max", "egal"): ("distance", "!="),
+}
+
+# Actions "modifier" : critère -> condition que les salles doivent remplir (champ, comparaison)
+TABLE_MODIFICATION = {
+    "capacite_min": ("capacite", ">="),
+    "capacite_max": ("capacite", "<="),
+    "distance_max": ("distance", "<="),
+    "equipement": ("equipement", "contient"),
+    "format": ("equipement", "contient"),
+}
+
+_COMPARAISONS = {
+    "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+    "==": np.equal, "!=": np.not_equal,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Predicat:
+    """Condition élémentaire sur une salle retenue : `champ` `operateur` `valeur`."""
+    champ: str
+    operateur: str
+    valeur: object
+
+
+@dataclass(frozen=True, slots=True)
+class SallesGroupes:
+    """
+    Vue à plat des salles de tous les groupes : identifiants, distances et numéro de groupe
+    de chaque salle, pour évaluer un prédicat une seule fois sur l'ensemble des groupes.
+    """
+    ids_salles: np.ndarray
+    distances_km: np.ndarray
+    groupes: np.ndarray
+    localisations: tuple
+    tailles: tuple
+
+    @classmethod
+    def depuis_groupes(cls, groupes: list):
+        resultats = [groupe["resultats"] for groupe in groupes]
+        tailles = tuple(len(r) for r in resultats)
+        return cls(
+            ids_salles=np.concatenate([r.ids_salles for r in resultats] or [np.empty(0, dtype=np.int32)]),
+            distances_km=np.concatenate([r.distances_km for r in resultats] or [np.empty(0)]),
+            groupes=np.repeat(np.arange(len(groupes)), list(tailles)).astype(np.int64),
+            localisations=tuple(normaliser_nom_ville(groupe["localisation"]) for groupe in groupes),
+            tailles=tailles,
+        )
+
+    def par_groupe(self, masque):
+        """Découpe un masque à plat en un masque par groupe."""
+        return np.split(masque, np.cumsum(self.tailles)[:-1]) if self.tailles else []
+
+
+def drapeaux_equipement(terme: str):
+    """Retourne (Equipement, FormatProjection) d'un terme ("IMAX", "3D"...) ; lève ValueError s'il est inconnu."""
+    cle = normaliser_nom_ville(str(terme))
+    if cle not in TERMES_EQUIPEMENT:
+        raise ValueError(f"Équipement inconnu : '{terme}' (connus : {', '.join(sorted(TERMES_EQUIPEMENT))}).")
+    return TERMES_EQUIPEMENT[cle]
+
+
+def _masque_champ_salle(jeu, predicat: Predicat, ids_salles):
+    if predicat.champ == "capacite":
+        return _COMPARAISONS[predicat.operateur](jeu.salles.capacite[ids_salles], float(predicat.valeur))
+    if predicat.champ == "equipement":
+        presents = jeu.masque_equipements([drapeaux_equipement(predicat.valeur)])[ids_salles]
+        return presents if predicat.operateur == "contient" else ~presents
+    if predicat.champ == "cinema":
+        recherche = normaliser_nom_ville(str(predicat.valeur))
+        ids_noms = jeu.cinemas.nom[jeu.salles.cinema[ids_salles]]
+        # Chaque nom distinct n'est normalisé qu'une fois
+        noms, inverse = np.unique(ids_noms, return_inverse=True)
+        correspond = np.array([recherche in normaliser_nom_ville(jeu.chaines[int(n)]) for n in noms], dtype=bool)
+        return correspond[inverse] if predicat.operateur == "contient" else ~correspond[inverse]
+    raise ValueError(f"Champ non évaluable sur une salle : '{predicat.champ}'.")
+
+
+def evaluer(jeu, predicats: list, salles: SallesGroupes):
+    """Retourne le masque (conjonction des prédicats) sur toutes les salles des groupes."""
+    masque = np.ones(len(salles.ids_salles), dtype=bool)
+    for predicat in predicats:
+        if predicat.champ == "distance":
+            masque &= _COMPARAISONS[predicat.operateur](salles.distances_km, float(predicat.valeur))
+        elif predicat.champ == "zone":
+            zones = np.array([loc == normaliser_nom_ville(str(predicat.valeur)) for loc in salles.localisations], dtype=bool)
+            masque &= zones[salles.groupes]
+        else:
+            masque &= _masque_champ_salle(jeu, predicat, salles.ids_salles)
+    return masque
+
+
+def masque_salles(jeu, predicats: list):
+    """
+    Masque sur toutes les salles du jeu de données pour les prédicats propres à la salle
+    (capacité, équipement, cinéma) ; sert à filtrer les salles tirées d'un curseur.
+    """
+    tous = np.arange(len(jeu.salles.capacite))
+    masque = np.ones(len(tous), dtype=bool)
+    for predicat in predicats:
+        if predicat.champ in CHAMPS_SALLE:
+            masque &= _masque_champ_salle(jeu, predicat, tous)
+    return masque
+
+
+def groupes_cibles(groupes: list, localisation: str = None):
+    """Indices des groupes visés par une action (tous si `localisation` est vide)."""
+    if not localisation:
+        return list(range(len(groupes)))
+    cle = normaliser_nom_ville(localisation)
+    return [i for i, groupe in enumerate(groupes) if normaliser_nom_ville(groupe["localisation"]) == cle]
+
+
+def _critere_valeur(instruction: dict):
+    critere, valeur = instruction.get("critere"), instruction.get("valeur")
+    if critere is None or valeur is None:
+        raise ValueError("Critère ou valeur manquant.")
+    return critere, valeur
+
+
+def compiler_suppression(instruction: dict):
+    """
+    Compile une action "supprimer" en prédicats décrivant les salles à retirer.
+    Sans critère, toutes les salles de la localisation sont visées ; avec un critère et une
+    localisation ("supprime les salles de moins de 100 places à Lyon"), le critère ne s'applique
+    qu'à cette zone ; sans localisation, à toutes les zones.
+    Lève ValueError si l'action est incomplète ou non supportée.
+    """
+    localisation = instruction.get("localisation")
+    predicats = [Predicat("zone", "==", localisation)] if localisation else []
+    if not instruction.get("critere"):
+        if not localisation:
+            raise ValueError("Critère ou valeur manquant pour la suppression.")
+        return predicats
+    critere, valeur = _critere_valeur(instruction)
+    if critere in ("equipement", "format"):
+        return predicats + [Predicat("equipement", "contient", valeur)]
+    if critere == "cinema":
+        return predicats + [Predicat("cinema", "contient", valeur)]
+    operateur = instruction.get("operateur") or "inferieur"
+    if (critere, operateur) not in TABLE_SUPPRESSION:
+        raise ValueError(f"Critère de suppression non supporté : '{critere}' / '{operateur}'.")
+    champ, comparaison = TABLE_SUPPRESSION[(critere, operateur)]
+    return predicats + [Predicat(champ, comparaison, float(valeur))]
+
+
+def compiler_modification(instruction: dict):
+    """
+    Compile une action "modifier" en condition que les salles doivent remplir
+    (ex : "cherche des salles de plus de 150 places" -> capacite >= 150,
+    "augmente le rayon à 100 km" -> distance <= 100).
+    Retourne un Predicat ; lève ValueError si l'action est incomplète ou non supportée.
+    """
+    critere, valeur = _critere_valeur(instruction)
+    if critere not in TABLE_MODIFICATION:
+        raise ValueError(f"Critère de modification non supporté : '{critere}'.")
+    champ, comparaison = TABLE_MODIFICATION[critere]
+    if champ == "equipement":
+        drapeaux_equipement(valeur)
+        return Predicat(champ, comparaison, valeur)
+    return Predicat(champ, comparaison, float(valeur))
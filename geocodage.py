@@ -0,0 +1,179 @@
+# --- geocodage.py ---
+# Résolution des localisations en coordonnées : corrections, gazetteer local, cache disque, service distant
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+
+from traces import attribuer, span
+
+# Zones vagues ou régionales ramenées à une ville de référence avant toute recherche
+CORRECTIONS = {
+    "région parisienne": "Paris, France", "idf": "Paris, France", "île-de-france": "Paris, France", "ile de france": "Paris, France",
+    "sud": "Marseille, France", "le sud": "Marseille, France", "paca": "Marseille, France", "provence-alpes-côte d'azur": "Marseille, France",
+    "nord": "Lille, France", "le nord": "Lille, France", "hauts-de-france": "Lille, France",
+    "bretagne": "Rennes, France", "côte d'azur": "Nice, France",
+    "rhône-alpes": "Lyon, France", "auvergne-rhône-alpes": "Lyon, France",
+    "aquitaine": "Bordeaux, France", "nouvelle-aquitaine": "Bordeaux, France",
+    "alsace": "Strasbourg, France", "grand est": "Strasbourg, France",
+    "france": "Paris, France", "territoire français": "Paris, France",
+    "ouest": "Nantes, France", "normandie": "Rouen, France",
+    "centre": "Orléans, France", "centre-val de loire": "Orléans, France",
+    "auvergne": "Clermont-Ferrand, France"
+}
+
+
+def normaliser_nom_ville(nom):
+    """
+    Normalise un nom de ville/zone pour comparaison : enlève accents, met en minuscules, remplace tirets/underscores par espaces, supprime espaces multiples.
+    """
+    nom = ''.join(
+        c for c in unicodedata.normalize('NFD', nom)
+        if unicodedata.category(c) != 'Mn'
+    )
+    nom = nom.lower()
+    nom = re.sub(r"[-_]", " ", nom)
+    nom = re.sub(r"\s+", " ", nom)
+    nom = nom.strip()
+    return nom
+
+
+def corriger_adresse(adresse: str):
+    """
+    Applique la table CORRECTIONS et complète l'adresse avec ', France'.
+    Retourne l'adresse telle qu'elle serait envoyée au service de géolocalisation.
+    """
+    adresse_corrigee = CORRECTIONS.get(adresse.lower().strip(), adresse)
+    if ", france" not in adresse_corrigee.lower():
+        return f"{adresse_corrigee}, France"
+    return adresse_corrigee
+
+
+def _cle_requete(adresse_requete: str):
+    """Clé normalisée d'une adresse de requête, sans le suffixe ', France'."""
+    cle = normaliser_nom_ville(adresse_requete)
+    if cle.endswith(", france"):
+        cle = cle[: -len(", france")].strip()
+    return cle
+
+
+def charger_gazetteer(chemin: str):
+    """
+    Charge le gazetteer local (communes et régions françaises).
+    Retourne un dict {nom normalisé: (lat, lon)} ; les régions ne masquent pas les communes homonymes.
+    """
+    with open(chemin, "r", encoding="utf-8") as f:
+        donnees = json.load(f)
+    gazetteer = {}
+    for section in ("regions", "communes"):
+        for entree in donnees.get(section, []):
+            gazetteer[normaliser_nom_ville(entree["nom"])] = (float(entree["lat"]), float(entree["lon"]))
+    return gazetteer
+
+
+class CacheGeocodage:
+    """
+    Cache disque (fichier JSON) des résultats du service de géolocalisation distant.
+    Lecture paresseuse, écriture atomique ; partagé entre sessions via un verrou.
+    """
+
+    def __init__(self, chemin: str):
+        self.chemin = chemin
+        self._verrou = threading.Lock()
+        self._entrees = None
+
+    def _charger(self):
+        if self._entrees is None:
+            try:
+                with open(self.chemin, "r", encoding="utf-8") as f:
+                    self._entrees = {cle: tuple(coords) for cle, coords in json.load(f).items()}
+            except (FileNotFoundError, json.JSONDecodeError, AttributeError, TypeError):
+                self._entrees = {}
+        return self._entrees
+
+    def lire(self, cle: str):
+        with self._verrou:
+            return self._charger().get(cle)
+
+    def ecrire(self, cle: str, coords: tuple):
+        with self._verrou:
+            entrees = self._charger()
+            entrees[cle] = (float(coords[0]), float(coords[1]))
+            dossier = os.path.dirname(os.path.abspath(self.chemin))
+            os.makedirs(dossier, exist_ok=True)
+            descripteur, chemin_temp = tempfile.mkstemp(dir=dossier, suffix=".tmp")
+            try:
+                with os.fdopen(descripteur, "w", encoding="utf-8") as f:
+                    json.dump(entrees, f, ensure_ascii=False, indent=0)
+                os.replace(chemin_temp, self.chemin)
+            except Exception:
+                if os.path.exists(chemin_temp):
+                    os.remove(chemin_temp)
+                raise
+
+
+def geocodeur_geopy(geolocator):
+    """
+    Adapte un géocodeur geopy (ex : Nominatim) en service distant pour ResolveurGeocodage.
+    Les exceptions geopy (timeout, indisponibilité) sont propagées à l'appelant.
+    """
+    def geocoder(adresse_requete: str):
+        loc = geolocator.geocode(adresse_requete)
+        if loc:
+            return (loc.latitude, loc.longitude)
+        return None
+    return geocoder
+
+
+class ResolveurGeocodage:
+    """
+    Résolveur de localisations en couches :
+    1. table CORRECTIONS (zones vagues -> ville de référence),
+    2. gazetteer local des communes et régions françaises (nom normalisé),
+    3. cache disque des résultats distants précédents,
+    4. service distant facultatif (`distant(adresse_requete) -> (lat, lon) | None`).
+    Sans service distant, la résolution fonctionne entièrement hors ligne.
+    """
+
+    def __init__(self, gazetteer: dict = None, cache: CacheGeocodage = None, distant=None):
+        self.gazetteer = gazetteer or {}
+        self.cache = cache
+        self.distant = distant
+
+    def connait(self, adresse: str):
+        """True si `adresse` se résout sans le service distant (table CORRECTIONS, gazetteer ou cache disque)."""
+        adresse_requete = corriger_adresse(adresse)
+        if any(cle in self.gazetteer for cle in (_cle_requete(adresse_requete), normaliser_nom_ville(adresse))):
+            return True
+        return self.cache is not None and self.cache.lire(_cle_requete(adresse_requete)) is not None
+
+    def resoudre(self, adresse: str):
+        """
+        Retourne un tuple (lat, lon) ou None si la localisation est introuvable.
+        Les erreurs du service distant sont propagées telles quelles.
+        """
+        adresse_requete = corriger_adresse(adresse)
+        for cle in (_cle_requete(adresse_requete), normaliser_nom_ville(adresse)):
+            if cle in self.gazetteer:
+                attribuer(source="gazetteer")
+                return self.gazetteer[cle]
+
+        cle_cache = _cle_requete(adresse_requete)
+        if self.cache is not None:
+            coords = self.cache.lire(cle_cache)
+            if coords is not None:
+                attribuer(source="cache")
+                return coords
+
+        if self.distant is None:
+            attribuer(source="introuvable")
+            return None
+        with span("geocodage.distant", adresse=adresse_requete):
+            coords = self.distant(adresse_requete)
+        if coords is not None and self.cache is not None:
+            self.cache.ecrire(cle_cache, coords)
+        return coords
@@ -0,0 +1,43 @@
+# --- index_drapeaux.py ---
+# Index inversé en bitsets sur une colonne de drapeaux (équipements, formats de projection)
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+class IndexDrapeaux:
+    """
+    Index inversé d'une colonne de drapeaux binaires (IntFlag) : pour chaque drapeau,
+    l'ensemble des lignes qui le portent sous forme de bitset compacté (8 lignes par octet).
+    Filtrer sur une combinaison de drapeaux revient à des OU / ET sur quelques bitsets,
+    sans relire la colonne ni les textes d'origine.
+    """
+
+    def __init__(self, bitsets, nb_lignes: int):
+        """`bitsets` : tableau uint8 (nb_drapeaux, ceil(nb_lignes / 8)), ligne i = drapeau 1 << i."""
+        self.bitsets = bitsets
+        self.nb_lignes = int(nb_lignes)
+
+    @classmethod
+    def depuis_colonne(cls, colonne, nb_drapeaux: int):
+        """Construit l'index des `nb_drapeaux` premiers bits d'une colonne d'entiers."""
+        colonne = np.asarray(colonne, dtype=np.int64)
+        presents = ((colonne[None, :] >> np.arange(nb_drapeaux, dtype=np.int64)[:, None]) & 1).astype(bool)
+        bitsets = np.packbits(presents, axis=1, bitorder="little")
+        bitsets.flags.writeable = False
+        return cls(bitsets, len(colonne))
+
+    def vide(self):
+        """Bitset sans aucune ligne."""
+        return np.zeros(self.bitsets.shape[1], dtype=np.uint8)
+
+    def bitset(self, drapeaux: int):
+        """Bitset des lignes portant au moins un des `drapeaux`."""
+        rangs = [i for i in range(len(self.bitsets)) if int(drapeaux) >> i & 1]
+        if not rangs:
+            return self.vide()
+        return np.bitwise_or.reduce(self.bitsets[rangs], axis=0)
+
+    def masque(self, bitset):
+        """Convertit un bitset en masque booléen sur les lignes."""
+        return np.unpackbits(bitset, count=self.nb_lignes, bitorder="little").view(bool)
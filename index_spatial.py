@@ -0,0 +1,168 @@
+# --- index_spatial.py ---
+# Index spatial en grille (lat/lon) pour les requêtes "dans un rayon" et "k plus proches"
+# -*- coding: utf-8 -*-
+
+import math
+
+import numpy as np
+
+# Longueur minimale d'un degré de méridien sur WGS-84 (à l'équateur), et d'un degré de
+# parallèle à l'équateur. Utilisées pour borner la zone à examiner autour d'un point.
+KM_PAR_DEGRE_LAT_MIN = 110.574
+KM_PAR_DEGRE_LON_EQUATEUR = 111.320
+MARGE_BOITE = 1.01
+
+TAILLE_CELLULE_DEG = 0.25
+RAYON_INITIAL_KNN_KM = 10.0
+DECIMALES_TRI = 2
+
+
+class IndexGrille:
+    """
+    Index spatial construit une seule fois sur un nuage de PointsGeodesiques.
+    Les points sont rangés par cellule de grille (lat/lon) : une requête n'examine que
+    les cellules de la boîte englobant le cercle de recherche, puis calcule les distances
+    exactes sur ces seuls candidats.
+
+    Les résultats sont triés comme dans trouver_cinemas_proches : distance arrondie à
+    2 décimales, puis clé secondaire croissante (ex : -capacité), puis ordre d'origine.
+    """
+
+    def __init__(self, points, taille_cellule_deg: float = TAILLE_CELLULE_DEG, ordre=None, cles_triees=None):
+        """
+        Construit l'index sur `points`. `ordre` et `cles_triees` permettent de réutiliser
+        un index pré-construit (ex : lu depuis un bundle binaire) sans recalcul.
+        """
+        self.points = points
+        self.taille_cellule = taille_cellule_deg
+        self.nb_colonnes = int(math.ceil(360.0 / taille_cellule_deg)) + 1
+        if ordre is None or cles_triees is None:
+            cles = self._ligne(points.lats) * self.nb_colonnes + self._colonne(points.lons)
+            ordre = np.argsort(cles, kind="stable")
+            cles_triees = cles[ordre]
+            ordre.flags.writeable = False
+            cles_triees.flags.writeable = False
+        self.ordre = ordre
+        self.cles_triees = cles_triees
+
+    def _ligne(self, lats):
+        return np.floor((np.asarray(lats) + 90.0) / self.taille_cellule).astype(np.int64)
+
+    def _colonne(self, lons):
+        return np.floor((np.asarray(lons) + 180.0) / self.taille_cellule).astype(np.int64)
+
+    def _candidats(self, lat: float, lon: float, rayon_km: float):
+        """
+        Retourne les indices des points situés dans les cellules de la boîte englobante
+        du cercle (lat, lon, rayon_km), ou None si la boîte n'est pas exploitable
+        (proche d'un pôle ou de l'antiméridien) et qu'il faut tout examiner.
+        """
+        delta_lat = rayon_km / KM_PAR_DEGRE_LAT_MIN * MARGE_BOITE
+        lat_min, lat_max = lat - delta_lat, lat + delta_lat
+        lat_extreme = max(abs(lat_min), abs(lat_max))
+        if lat_extreme >= 89.0:
+            return None
+        delta_lon = rayon_km / (KM_PAR_DEGRE_LON_EQUATEUR * math.cos(math.radians(lat_extreme))) * MARGE_BOITE
+        lon_min, lon_max = lon - delta_lon, lon + delta_lon
+        if lon_min < -180.0 or lon_max > 180.0:
+            return None
+
+        lignes = np.arange(self._ligne(lat_min), self._ligne(lat_max) + 1, dtype=np.int64)
+        debuts = np.searchsorted(self.cles_triees, lignes * self.nb_colonnes + self._colonne(lon_min), "left")
+        fins = np.searchsorted(self.cles_triees, lignes * self.nb_colonnes + self._colonne(lon_max), "right")
+        tranches = [self.ordre[d:f] for d, f in zip(debuts, fins) if f > d]
+        if not tranches:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(tranches)
+
+    def _trier(self, indices, distances, cle_secondaire):
+        """Trie (indices, distances) selon (distance arrondie, clé secondaire, indice)."""
+        cles = [indices]
+        if cle_secondaire is not None:
+            cles.append(cle_secondaire[indices])
+        cles.append(np.round(distances, DECIMALES_TRI))
+        ordre = np.lexsort(cles)
+        return indices[ordre], distances[ordre]
+
+    def dans_rayon(self, lat: float, lon: float, rayon_km: float, eligibles=None, cle_secondaire=None):
+        """
+        Retourne (indices, distances_km) de tous les points à moins de `rayon_km`,
+        triés par distance. `eligibles` (masque booléen) restreint les points retenus,
+        `cle_secondaire` (tableau par point) départage les distances arrondies égales.
+        """
+        candidats = self._candidats(lat, lon, rayon_km)
+        if candidats is None:
+            candidats = np.arange(len(self.points), dtype=np.int64)
+        if eligibles is not None:
+            candidats = candidats[eligibles[candidats]]
+        distances = self.points.distances_km(lat, lon, indices=candidats)
+        garder = distances <= rayon_km
+        return self._trier(candidats[garder], distances[garder], cle_secondaire)
+
+    def k_plus_proches(self, lat: float, lon: float, k: int, rayon_max_km: float = None,
+                       eligibles=None, cle_secondaire=None):
+        """
+        Retourne (indices, distances_km) des `k` points les plus proches (au plus),
+        éventuellement limités à `rayon_max_km`, dans le même ordre que dans_rayon.
+        Le rayon de recherche est doublé jusqu'à contenir k points, puis élargi d'un
+        centième de km pour inclure les ex aequo à l'arrondi près.
+        """
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        nb_eligibles = len(self.points) if eligibles is None else int(np.count_nonzero(eligibles))
+        rayon = RAYON_INITIAL_KNN_KM if rayon_max_km is None else min(RAYON_INITIAL_KNN_KM, rayon_max_km)
+        while True:
+            indices, distances = self.dans_rayon(lat, lon, rayon, eligibles, cle_secondaire)
+            limite_atteinte = rayon_max_km is not None and rayon >= rayon_max_km
+            if len(indices) >= k or limite_atteinte or len(indices) >= nb_eligibles:
+                break
+            rayon = rayon * 2 if rayon_max_km is None else min(rayon * 2, rayon_max_km)
+        if len(indices) >= k:
+            rayon_ex_aequo = float(distances[k - 1]) + 10 ** -DECIMALES_TRI
+            if rayon_max_km is not None:
+                rayon_ex_aequo = min(rayon_ex_aequo, rayon_max_km)
+            if rayon_ex_aequo > rayon:
+                indices, distances = self.dans_rayon(lat, lon, rayon_ex_aequo, eligibles, cle_secondaire)
+        return indices[:k], distances[:k]
+
+    def candidats_lot(self, lats, lons, rayons_max_km, eligibles=None):
+        """
+        Pour plusieurs points de requête, retourne une liste de (indices, distances_km)
+        des points situés dans le rayon de chaque requête (None : tous les points), non triés.
+        Une seule matrice de distances (requêtes x points éligibles) est calculée.
+        """
+        if len(rayons_max_km) == 0:
+            return []
+        points = np.arange(len(self.points), dtype=np.int64)
+        if eligibles is not None:
+            points = points[eligibles]
+        matrice = self.points.matrice_distances_km(lats, lons, indices=points)
+        candidats = []
+        for distances, rayon_max_km in zip(matrice, rayons_max_km):
+            if rayon_max_km is None:
+                candidats.append((points, distances))
+            else:
+                garder = distances <= rayon_max_km
+                candidats.append((points[garder], distances[garder]))
+        return candidats
+
+    def k_plus_proches_lot(self, lats, lons, ks, rayons_max_km, eligibles=None, cle_secondaire=None):
+        """
+        Version groupée de k_plus_proches pour plusieurs points de requête (voir candidats_lot),
+        `ks` et `rayons_max_km` donnant k et le rayon maximal (ou None) de chaque requête.
+        Retourne une liste de (indices, distances_km) dans l'ordre des requêtes, identique
+        à ce que retourneraient des appels successifs à k_plus_proches.
+        """
+        resultats = []
+        for (candidats, distances), k in zip(self.candidats_lot(lats, lons, rayons_max_km, eligibles), ks):
+            if k <= 0:
+                resultats.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)))
+                continue
+            if len(candidats) > k:
+                # Seuls les points dont la distance arrondie ne dépasse pas celle du k-ième sont triés
+                arrondies = np.round(distances, DECIMALES_TRI)
+                garder = arrondies <= np.partition(arrondies, k - 1)[k - 1]
+                candidats, distances = candidats[garder], distances[garder]
+            indices, distances = self._trier(candidats, distances, cle_secondaire)
+            resultats.append((indices[:k], distances[:k]))
+        return resultats
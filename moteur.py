@@ -0,0 +1,582 @@
+# --- moteur.py ---
+# Moteur de planification sans interface : plan de diffusion (IA), recherche des salles et raffinage.
+# Utilisé par l'application Streamlit (ai.py) et par le traitement par lots (planifier_lot.py).
+# -*- coding: utf-8 -*-
+
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+from analyse_locale import analyser_plan, analyser_raffinage, texte_expansions_zones
+from cache_llm import ClientLLMEnCache, creer_cache
+from filtres import (SallesGroupes, compiler_modification, compiler_suppression, drapeaux_equipement, evaluer,
+                     groupes_cibles, masque_salles)
+from geocodage import (CacheGeocodage, ResolveurGeocodage, charger_gazetteer, corriger_adresse,
+                       geocodeur_geopy, normaliser_nom_ville)
+from recherche import GEOCODAGE_THREADS, DemandeZone, LimiteurDebit, rechercher_zones
+from reponses_llm import (MAX_TOKENS_CONTEXTE, MAX_TOKENS_PLAN, MAX_TOKENS_RAFFINAGE, SCHEMA_CONTEXTE, SCHEMA_PLAN,
+                          SCHEMA_RAFFINAGE, extraire_json, options_generation, plan_conforme, reponse_valide,
+                          valider_contexte, valider_plan, valider_raffinage)
+from resultats import Resultats
+from traces import attribuer, evenement, span
+
+# --- Configuration (variables d'environnement lues au chargement) ---
+GEOCATED_CINEMAS_FILE = "cinemas_groupedBig.json"
+GEOCODER_USER_AGENT = "CinemaMapApp/1.0 (App)"
+GEOCODER_TIMEOUT = 10
+GAZETTEER_FILE = "gazetteer_france.json"
+GEOCODE_CACHE_FILE = os.path.join(".cache", "geocodage.json")
+GEOCODAGE_HORS_LIGNE = os.getenv("GEOCODAGE_HORS_LIGNE", "0") == "1"
+NOMINATIM_REQUETES_PAR_S = float(os.getenv("NOMINATIM_REQUETES_PAR_S", "1"))  # Politique d'usage de Nominatim
+LLM_CACHE_TYPE = os.getenv("LLM_CACHE", "sqlite")  # "sqlite", "memoire" ou "aucun"
+LLM_CACHE_FILE = os.path.join(".cache", "reponses_llm.sqlite")
+LLM_CACHE_TTL_S = int(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+LLM_CACHE_TAILLE_MAX = 2000
+LLM_SORTIE_STRUCTUREE = os.getenv("LLM_SORTIE_STRUCTUREE", "1") == "1"  # Réponses contraintes par schéma JSON
+ANALYSE_LOCALE = os.getenv("ANALYSE_LOCALE", "1") == "1"  # Demandes simples interprétées sans le modèle (analyse_locale.py)
+
+MODELE_PLAN = "gpt-4o"
+MODELE_CONTEXTE = "gpt-4"
+MODELE_RAFFINAGE = "gpt-4o"
+RAYON_DEFAUT_KM = 50
+RAYON_AJOUT_KM = 100  # Rayon minimal des ajouts de salles par raffinage
+
+PROMPT_PLAN = (
+    "Tu es un expert en distribution de films en salles en France. L'utilisateur te décrit un projet (test, avant-première, tournée, etc.).\n\n"
+
+    "🎯 Ton objectif : retourner une liste JSON valide de villes avec :\n"
+    "- \"localisation\" : une ville en France,\n"
+    "- \"nombre\" : nombre de spectateurs à atteindre,\n"
+    "- \"nombre_seances\" : (optionnel) nombre de séances prévues.\n\n"
+
+    "🎯 Si l'utilisateur précise un nombre de séances et une fourchette de spectateurs (ex : entre 30 000 et 40 000) :\n"
+    "- Choisis un total réaliste dans cette fourchette,\n"
+    "- Répartis ce total entre les villes proportionnellement au nombre de séances,\n"
+    "- Ne dépasse jamais le maximum, et ne descends jamais en dessous du minimum.\n\n"
+
+    "🎯 Si l'utilisateur précise seulement une fourchette de spectateurs pour une zone :\n"
+    "- Choisis un total dans la fourchette,\n"
+    "- Répartis les spectateurs équitablement entre les villes de cette zone,\n"
+    "- Suppose 1 séance par ville sauf indication contraire.\n\n"
+
+    "🎯 Si plusieurs zones sont mentionnées, génère plusieurs blocs JSON.\n\n"
+
+    "🗺️ Pour les zones vagues, utilise les remplacements suivants :\n"
+    + texte_expansions_zones() + "\n"
+
+    "💡 Le résultat doit être une **liste JSON strictement valide** :\n"
+    "- Format : [{\"localisation\": \"Paris\", \"nombre\": 1000, \"nombre_seances\": 10}]\n"
+    "- Utilise des guillemets doubles,\n"
+    "- Mets des virgules entre les paires clé/valeur,\n"
+    "- Ne retourne **aucun texte en dehors** du JSON.\n\n"
+
+    "💡 Si aucun lieu ni objectif n'est identifiable, retourne simplement : []\n\n"
+
+    "🔐 Règle obligatoire :\n"
+    "- Le **nombre total de séances** (addition des \"nombre_seances\") doit correspondre **exactement** à ce que demande l'utilisateur,\n"
+    "- Ne t'arrête pas à une distribution ronde ou facile : ajuste si besoin pour que la somme soit strictement exacte."
+    "🔐 Règle stricte sur la fourchette :\n"
+    "- Si l'utilisateur donne une fourchette de spectateurs (ex : minimum 30 000, maximum 160 000),\n"
+    "- Alors le **nombre total de spectateurs** (toutes zones confondues) doit rester **strictement dans cette fourchette**.\n"
+    "- Tu ne dois **pas appliquer cette fourchette à une seule zone**, mais à l'ensemble de la demande.\n"
+)
+
+PROMPT_CONTEXTE = (
+    "Tu es un expert en distribution cinématographique et en analyse démographique en France.\n\n"
+    "🎯 Ton objectif : analyser le contexte d'un projet cinématographique pour suggérer les régions les plus pertinentes.\n\n"
+    "Considère les facteurs suivants :\n"
+    "1. Public cible (âge, centres d'intérêt)\n"
+    "2. Thème du film\n"
+    "3. Type d'événement (avant-première, test, etc.)\n"
+    "4. Contexte local (activités, industries, centres d'intérêt)\n\n"
+    "Retourne un JSON avec :\n"
+    "- regions : liste des régions suggérées\n"
+    "- justification : explication pour chaque région\n"
+    "- public_cible : description du public cible identifié\n"
+    "- facteurs_cles : liste des facteurs qui ont influencé le choix\n\n"
+    "Exemple de format de réponse :\n"
+    "{\n"
+    '  "regions": ["Île-de-France", "Lyon", "Bordeaux"],\n'
+    '  "justification": "Ces régions ont une forte concentration de jeunes urbains et d\'activités liées au thème",\n'
+    '  "public_cible": "Jeunes adultes 18-35 ans, urbains, intéressés par le thème",\n'
+    '  "facteurs_cles": ["Population jeune", "Centres urbains", "Activités liées au thème"]\n'
+    "}"
+)
+
+PROMPT_RAFFINAGE = (
+    "Tu es un expert en analyse de requêtes de modification pour une application de planification cinématographique.\n\n"
+    "🎯 Ton objectif : analyser une demande de modification et retourner des instructions claires.\n\n"
+    "Types de modifications supportées :\n"
+    "1. AJOUTER des salles ou séances : 'rajoute X salles à [ville]', 'ajoute 10 séances à [ville]', 'ajoute une salle à [ville]'\n"
+    "2. SUPPRIMER des salles ou séances : 'supprime les salles de moins de X places', 'enlève les salles à plus de X km', 'supprime les séances à [ville]'\n"
+    "3. MODIFIER des critères : 'augmente le rayon à X km pour [ville]', 'cherche des salles de plus de X places', 'je veux des salles IMAX'\n"
+    "   Les salles qui ne respectent plus le critère sont remplacées par d'autres salles de la zone.\n\n"
+    "Le terme 'séance(s)' doit être compris comme 'salle(s)' dans ce contexte.\n"
+    "Exemples :\n"
+    "- 'ajoute 10 séances à Paris' => ajouter 10 salles à Paris\n"
+    "- 'supprime les séances à Marseille' => supprimer toutes les salles à Marseille\n"
+    "- 'supprime les salles à Lyon' => supprimer toutes les salles à Lyon\n\n"
+    "Retourne un JSON avec :\n"
+    "- action : 'ajouter', 'supprimer', 'modifier'\n"
+    "- localisation : ville concernée (si applicable)\n"
+    "- nombre : nombre de salles (pour ajout)\n"
+    "- critere : critère de suppression/modification ('capacite_min', 'capacite_max', 'distance_max', 'equipement', 'cinema')\n"
+    "- valeur : valeur du critère (nombre ; texte pour 'equipement' : IMAX, 3D, Atmos, 4DX, ScreenX... et pour 'cinema' : nom du cinéma)\n"
+    "- operateur : 'superieur', 'inferieur', 'egal' (pour clarifier la logique)\n\n"
+    "Exemple :\n"
+    "{\n"
+    '  "action": "ajouter",\n'
+    '  "localisation": "Marseille",\n'
+    '  "nombre": 1\n'
+    "}\n\n"
+    "Pour les suppressions :\n"
+    "{\n"
+    '  "action": "supprimer",\n'
+    '  "critere": "capacite_min",\n'
+    '  "valeur": 100,\n'
+    '  "operateur": "inferieur"\n'
+    "}\n\n"
+    "Pour les modifications :\n"
+    "{\n"
+    '  "action": "modifier",\n'
+    '  "localisation": "Paris",\n'
+    '  "critere": "distance_max",\n'
+    '  "valeur": 100\n'
+    "}\n\n"
+    "Pour supprimer toutes les salles d'une ville :\n"
+    "{\n"
+    '  "action": "supprimer",\n'
+    '  "localisation": "Marseille"\n'
+    "}\n\n"
+    "Si la demande n'est pas claire ou non supportée, retourne :\n"
+    "{\n"
+    '  "action": "incompris",\n'
+    '  "message": "explication"\n'
+    "}\n\n"
+    "⚠️ IMPORTANT : Retourne UNIQUEMENT le JSON, sans préfixe 'json', sans backticks, sans texte avant ou après."
+)
+
+
+def ignorer(niveau: str, message: str):
+    """
+    Signaleur par défaut : les messages du moteur sont ignorés. Un signaleur reçoit
+    (niveau, message), niveau parmi "info", "succes", "avertissement" et "erreur" ; le détail
+    des étapes passe par les événements de traces.py.
+    """
+
+
+@dataclass(frozen=True, slots=True)
+class OptionsRecherche:
+    """Options de recherche communes à toutes les zones (voir recherche.rechercher_zones)."""
+    allocation_globale: bool = True
+    objectif_capacite: bool = False
+    poids_capacite: float = 0.0
+    max_salles_par_cinema: int = 1
+    equipements_requis: tuple = ()
+
+    @classmethod
+    def depuis_dict(cls, options: dict):
+        """Options lues depuis un dict (ex : ligne JSONL) ; "equipements_requis" liste des termes ("3D", "IMAX"...)."""
+        options = dict(options or {})
+        termes = options.pop("equipements_requis", None) or ()
+        inconnues = set(options) - set(cls.__slots__)
+        if inconnues:
+            raise ValueError(f"Option(s) de recherche inconnue(s) : {', '.join(sorted(inconnues))}.")
+        return cls(**options, equipements_requis=tuple(drapeaux_equipement(t) for t in termes))
+
+
+def creer_client_llm(cle_api: str = None, type_cache: str = LLM_CACHE_TYPE, fichier_cache: str = LLM_CACHE_FILE,
+                     taille_max: int = LLM_CACHE_TAILLE_MAX, ttl_s: float = LLM_CACHE_TTL_S):
+    """
+    Crée le client du modèle de langage (OpenAI) derrière son cache de réponses.
+    Lève openai.OpenAIError si aucune clé d'API n'est disponible.
+    """
+    from openai import OpenAI
+
+    client = OpenAI(api_key=cle_api or os.getenv("OPENAI_API_KEY"))
+    return ClientLLMEnCache(client, creer_cache(type_cache, fichier_cache, taille_max, ttl_s))
+
+
+def creer_resolveur_geocodage(fichier_gazetteer: str = GAZETTEER_FILE, fichier_cache: str = GEOCODE_CACHE_FILE,
+                              hors_ligne: bool = GEOCODAGE_HORS_LIGNE, requetes_par_s: float = NOMINATIM_REQUETES_PAR_S):
+    """
+    Résolution locale d'abord (gazetteer + cache disque) ; Nominatim n'est appelé qu'en dernier
+    recours, jamais `hors_ligne`, et au plus `requetes_par_s` fois par seconde (tous threads confondus).
+    """
+    try:
+        gazetteer = charger_gazetteer(fichier_gazetteer)
+    except (FileNotFoundError, json.JSONDecodeError):
+        gazetteer = {}
+    distant = None
+    if not hors_ligne:
+        from geopy.geocoders import Nominatim
+
+        distant = geocodeur_geopy(Nominatim(user_agent=GEOCODER_USER_AGENT, timeout=GEOCODER_TIMEOUT))
+        distant = LimiteurDebit(requetes_par_s).envelopper(distant)
+    return ResolveurGeocodage(gazetteer, CacheGeocodage(fichier_cache), distant)
+
+
+def demandes_du_plan(instructions: list, rayons_par_localisation: dict = None, rayon_defaut_km: float = RAYON_DEFAUT_KM):
+    """
+    Convertit les instructions valides d'un plan (localisation, nombre de spectateurs, nombre
+    de séances facultatif) en DemandeZone ; une séance = une salle, 1 salle par défaut.
+    Retourne (demandes, instructions retenues), dans l'ordre du plan.
+    """
+    rayons_par_localisation = rayons_par_localisation or {}
+    demandes, retenues = [], []
+    for instruction in instructions:
+        if not (instruction.get("localisation") and isinstance(instruction.get("nombre"), int) and instruction["nombre"] >= 0):
+            continue
+        nombre_seances = instruction.get("nombre_seances")
+        nombre_salles = nombre_seances if isinstance(nombre_seances, int) and nombre_seances > 0 else 1
+        demandes.append(DemandeZone(instruction["localisation"], nombre_salles,
+                                    rayons_par_localisation.get(instruction["localisation"], rayon_defaut_km),
+                                    instruction["nombre"]))
+        retenues.append(instruction)
+    return demandes, retenues
+
+
+def groupe_de_zone(zone):
+    """Groupe de résultats (format de session) d'une zone recherchée."""
+    return {"localisation": zone.demande.localisation, "resultats": zone.resultats,
+            "nombre_salles_demandees": zone.demande.nombre_salles, "curseur": zone.curseur}
+
+
+def salles_deja_retenues(groupes: list):
+    """Retourne les identifiants des salles déjà attribuées à une zone."""
+    if not groupes:
+        return np.empty(0, dtype=np.int32)
+    return np.concatenate([groupe["resultats"].ids_salles for groupe in groupes])
+
+
+def signaler_zone(zone, signaler=ignorer):
+    """
+    Signale les erreurs/avertissements d'une zone recherchée : localisation introuvable
+    ou erreur du géocodeur, puis salles manquantes.
+    """
+    localisation_cible = zone.demande.localisation
+    if zone.coords is None:
+        from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
+
+        adresse_requete = corriger_adresse(localisation_cible)
+        if zone.erreur is None:
+            signaler("avertissement", f"⚠️ Adresse '{adresse_requete}' (issue de '{localisation_cible}') non trouvée par le service de géolocalisation.")
+        elif isinstance(zone.erreur, (GeocoderTimedOut, GeocoderUnavailable)):
+            signaler("erreur", f"❌ Erreur de géocodage (timeout/indisponible) pour '{adresse_requete}': {zone.erreur}")
+        else:
+            signaler("erreur", f"❌ Erreur inattendue lors du géocodage de '{adresse_requete}': {zone.erreur}")
+        return
+    if len(zone.resultats) == 0:
+        signaler("avertissement", f"Aucune salle trouvée pour '{localisation_cible}' dans un rayon de {zone.demande.rayon_km} km.")
+    elif len(zone.resultats) < zone.demande.nombre_salles:
+        signaler("avertissement", f"⚠️ Seulement {len(zone.resultats)} salle(s) trouvée(s) pour '{localisation_cible}' (au lieu de {zone.demande.nombre_salles} demandées).")
+
+
+class MoteurPlanification:
+    """
+    Pipeline de planification sans dépendance à l'interface : interprétation du plan par
+    le modèle de langage, recherche des salles de toutes les zones, raffinage des résultats.
+    Les messages destinés à l'utilisateur passent par un `signaler(niveau, message)`.
+    Sans `client_llm`, seules les étapes sans IA sont disponibles (plan déjà structuré), sauf si
+    `fabrique_client_llm` est fourni : le client est alors créé au premier appel au modèle.
+    Avec `analyse_locale`, les plans et demandes de raffinage simples sont interprétés par règles,
+    sans appel au modèle (voir analyse_locale.py).
+    """
+
+    def __init__(self, jeu, resolveur, client_llm=None, sortie_structuree: bool = LLM_SORTIE_STRUCTUREE,
+                 max_workers: int = GEOCODAGE_THREADS, fabrique_client_llm=None, analyse_locale: bool = ANALYSE_LOCALE):
+        self.jeu = jeu
+        self.resolveur = resolveur
+        self.client_llm = client_llm
+        self.fabrique_client_llm = fabrique_client_llm
+        self.analyse_locale = analyse_locale
+        self.sortie_structuree = sortie_structuree
+        self.max_workers = max_workers
+
+    def _completer(self, modele: str, prompt_systeme: str, texte: str, nom_schema: str, schema: dict, max_tokens: int,
+                   valider):
+        """Réponse brute du modèle ; seule une réponse qui passe `valider` (ex : valider_plan) est mise en cache."""
+        if self.client_llm is None and self.fabrique_client_llm is not None:
+            self.client_llm = self.fabrique_client_llm()  # Import d'openai et création du client au premier appel
+        if self.client_llm is None:
+            raise RuntimeError("Aucun client de modèle de langage configuré (OPENAI_API_KEY).")
+        return self.client_llm.completer(
+            modele, prompt_systeme, texte, accepter=lambda contenu: reponse_valide(valider, contenu),
+            **options_generation(modele, nom_schema, schema, max_tokens, self.sortie_structuree)
+        )
+
+    def _analyser_localement(self, analyser, texte: str):
+        """Interprétation par règles (analyse_locale.py) ; None si désactivée ou si le texte n'est pas compris."""
+        if not self.analyse_locale:
+            return None
+        with span("analyse_locale"):
+            resultat = analyser(texte, self.resolveur.connait)
+            attribuer(reconnu=resultat is not None)
+        return resultat
+
+    def analyser_requete(self, question: str, signaler=ignorer):
+        """
+        Interprète la requête de l'utilisateur pour extraire les localisations et la
+        fourchette de spectateurs cible : par règles pour les plans simples, sinon par le modèle.
+        Retourne un tuple (liste_instructions, reponse_brute_ia) ; la réponse brute est vide
+        si le plan a été interprété sans le modèle. ([], réponse) en cas d'échec.
+        """
+        instructions = self._analyser_localement(analyser_plan, question)
+        if instructions is not None:
+            evenement("debug", "Plan interprété sans le modèle", instructions=instructions)
+            return instructions, ""
+
+        import openai
+
+        raw_response = ""
+        try:
+            raw_response = self._completer(MODELE_PLAN, PROMPT_PLAN, question, "plan_diffusion", SCHEMA_PLAN, MAX_TOKENS_PLAN,
+                                           plan_conforme)
+            instructions, avertissements = valider_plan(extraire_json(raw_response))
+            for avertissement in avertissements:
+                signaler("avertissement", avertissement)
+            return instructions, raw_response
+        except (json.JSONDecodeError, ValueError):
+            signaler("erreur", "Impossible d'interpréter la réponse de l'IA.")
+        except openai.APIError as e:
+            signaler("erreur", f"Erreur OpenAI : {e}")
+        except Exception as e:
+            signaler("erreur", f"Erreur inattendue : {e}")
+        return [], raw_response
+
+    def analyser_contexte(self, description_projet: str, signaler=ignorer):
+        """
+        Analyse le contexte du projet pour suggérer les régions les plus pertinentes.
+        Retourne un dictionnaire (regions, justification, public_cible, facteurs_cles) ou None.
+        """
+        try:
+            raw_response = self._completer(MODELE_CONTEXTE, PROMPT_CONTEXTE, description_projet, "analyse_contexte",
+                                           SCHEMA_CONTEXTE, MAX_TOKENS_CONTEXTE, valider_contexte)
+            return valider_contexte(extraire_json(raw_response))
+        except Exception as e:
+            signaler("erreur", f"Erreur lors de l'analyse du contexte : {e}")
+            return None
+
+    def rechercher(self, demandes: list, options: OptionsRecherche = OptionsRecherche(), salles_exclues=None):
+        """Recherche toutes les zones en une passe ; retourne les ResultatZone dans l'ordre des demandes."""
+        with span("recherche", zones=len(demandes)):
+            return rechercher_zones(self.jeu, self.resolveur, demandes, self.max_workers,
+                                    allocation_globale=options.allocation_globale, salles_exclues=salles_exclues,
+                                    objectif_capacite=options.objectif_capacite, poids_capacite=options.poids_capacite,
+                                    max_salles_par_cinema=options.max_salles_par_cinema,
+                                    equipements_requis=options.equipements_requis)
+
+    def rechercher_zone(self, localisation: str, nombre: int, rayon_km: float = RAYON_DEFAUT_KM,
+                        options: OptionsRecherche = OptionsRecherche(), salles_exclues=None, signaler=ignorer):
+        """Recherche une seule zone et signale ses avertissements ; retourne le ResultatZone."""
+        zone = self.rechercher([DemandeZone(localisation, nombre, rayon_km)], options, salles_exclues)[0]
+        signaler_zone(zone, signaler)
+        return zone
+
+    def planifier(self, instructions: list, rayons_par_localisation: dict = None,
+                  options: OptionsRecherche = OptionsRecherche(), signaler=ignorer):
+        """
+        Recherche les salles d'un plan déjà structuré (voir demandes_du_plan).
+        Retourne (groupes, zones) : groupes au format de session et ResultatZone, dans l'ordre du plan.
+        """
+        demandes, _ = demandes_du_plan(instructions, rayons_par_localisation)
+        zones = self.rechercher(demandes, options)
+        for zone in zones:
+            signaler_zone(zone, signaler)
+        return [groupe_de_zone(zone) for zone in zones], zones
+
+    def tirer_salles_groupe(self, groupe: dict, nombre: int, options: OptionsRecherche = OptionsRecherche(),
+                            salles_exclues=None, masque_salles=None, rayon_min_km: float = None, signaler=ignorer):
+        """
+        Tire les `nombre` prochaines salles du curseur du groupe, sans nouveau géocodage ni
+        nouveau parcours : le flux classé de la zone reprend là où il s'était arrêté.
+        Le rayon est d'abord porté à `rayon_min_km` si besoin. Met à jour groupe["curseur"].
+        Retourne les Resultats tirés (éventuellement moins de `nombre` si la zone est épuisée).
+        """
+        curseur = groupe.get("curseur")
+        if curseur is None:
+            # Zone non résolue lors de la recherche : nouvelle tentative de géocodage
+            curseur = self.rechercher_zone(groupe["localisation"], 0, rayon_min_km or RAYON_DEFAUT_KM, options,
+                                           signaler=signaler).curseur
+            if curseur is None:
+                return Resultats.vide()
+        with span("curseur.tirage", localisation=groupe["localisation"], nombre=nombre):
+            if rayon_min_km is not None:
+                curseur = curseur.elargir(self.jeu, rayon_min_km)
+            resultats, groupe["curseur"] = curseur.suivantes(self.jeu, nombre, salles_exclues, masque_salles)
+            attribuer(tirees=len(resultats))
+        return resultats
+
+    def raffiner(self, groupes: list, demande: str, options: OptionsRecherche = OptionsRecherche(), signaler=ignorer):
+        """
+        Interprète une demande de modification (par règles si possible, sinon par le modèle :
+        "ajoute 2 salles à Paris", "supprime les salles
+        de moins de 100 places"...) et l'applique aux `groupes` (modifiés en place).
+        Retourne True si des modifications ont été appliquées.
+        """
+        raw_response = ""
+        try:
+            instruction = self._analyser_localement(analyser_raffinage, demande)
+            if instruction is not None:
+                evenement("debug", "Demande interprétée sans le modèle", instruction=instruction)
+                return self.appliquer_raffinage(groupes, instruction, options, signaler)
+            evenement("debug", "Envoi de la demande à l'IA")
+            raw_response = self._completer(MODELE_RAFFINAGE, PROMPT_RAFFINAGE, demande, "action_raffinage",
+                                           SCHEMA_RAFFINAGE, MAX_TOKENS_RAFFINAGE, valider_raffinage)
+            evenement("debug", "Réponse brute de l'IA", reponse=raw_response)
+            # Décodage tolérant (blocs ```json...) puis validation unique : champs nuls omis, séance(s) -> salle(s)
+            instruction = valider_raffinage(extraire_json(raw_response))
+            evenement("debug", "Instruction parsée", instruction=instruction)
+            return self.appliquer_raffinage(groupes, instruction, options, signaler)
+        except json.JSONDecodeError as e:
+            signaler("erreur", f"❌ Erreur JSON lors de l'analyse de la demande de modification : {e}")
+            evenement("erreur", "Réponse JSON invalide", reponse=raw_response)
+        except Exception as e:
+            signaler("erreur", f"❌ Erreur inattendue : {e}")
+            evenement("erreur", "Erreur inattendue", type=type(e).__name__, detail=str(e))
+        return False
+
+    def appliquer_raffinage(self, groupes: list, instruction: dict, options: OptionsRecherche = OptionsRecherche(),
+                            signaler=ignorer):
+        """Applique une action de raffinage validée aux `groupes` ; retourne True si elle a modifié les résultats."""
+        with span("raffinage.application", action=instruction.get("action")):
+            modifie = self._appliquer_action(groupes, instruction, options, signaler)
+            attribuer(modifie=modifie)
+        return modifie
+
+    def _appliquer_action(self, groupes: list, instruction: dict, options: OptionsRecherche, signaler):
+        action = instruction.get("action")
+        if action == "ajouter":
+            return self._ajouter(groupes, instruction, options, signaler)
+        if action == "supprimer":
+            return self._supprimer(groupes, instruction, signaler)
+        if action == "modifier":
+            return self._modifier(groupes, instruction, options, signaler)
+        if action == "incompris":
+            signaler("avertissement", f"⚠️ Demande non comprise : {instruction.get('message', 'Format non reconnu')}")
+            signaler("info", "💡 Exemples de demandes supportées :\n- 'rajoute une salle à Marseille'\n- 'supprime les salles de moins de 100 places'\n- 'ajoute 2 salles à Paris'")
+            return False
+        signaler("avertissement", "⚠️ Type d'action non supporté")
+        return False
+
+    def _ajouter(self, groupes: list, instruction: dict, options: OptionsRecherche, signaler):
+        localisation = instruction.get("localisation")
+        nombre = instruction.get("nombre", 1)
+        if not localisation:
+            signaler("erreur", "❌ Localisation manquante dans la demande d'ajout")
+            return False
+        try:
+            nombre = int(nombre)
+        except (ValueError, TypeError):
+            signaler("erreur", "❌ Nombre de salles invalide")
+            return False
+        if nombre <= 0:
+            signaler("erreur", "❌ Le nombre de salles doit être positif")
+            return False
+
+        cle = normaliser_nom_ville(localisation)
+        groupe_existant = next((groupe for groupe in groupes if normaliser_nom_ville(groupe["localisation"]) == cle), None)
+        if groupe_existant is not None:
+            # Reprise du curseur de la zone (ni géocodage ni nouvelle recherche), rayon porté au besoin à RAYON_AJOUT_KM
+            evenement("debug", "Tirage de salles supplémentaires", localisation=localisation, nombre=nombre,
+                      rayon_min_km=RAYON_AJOUT_KM)
+            nouvelles_salles = self.tirer_salles_groupe(groupe_existant, nombre, options, salles_deja_retenues(groupes),
+                                                        rayon_min_km=RAYON_AJOUT_KM, signaler=signaler)
+            if len(nouvelles_salles) == 0:
+                signaler("avertissement", f"⚠️ Aucune nouvelle salle trouvée pour {localisation}")
+                return False
+            groupe_existant["resultats"] = groupe_existant["resultats"].concatener(nouvelles_salles)
+            groupe_existant["nombre_salles_demandees"] += len(nouvelles_salles)
+            signaler("succes", f"✅ {len(nouvelles_salles)} nouvelle(s) salle(s) ajoutée(s) à {localisation}")
+            return True
+
+        evenement("debug", "Création d'un nouveau groupe", localisation=localisation, nombre=nombre)
+        # Rayon plus large pour les nouveaux groupes
+        zone = self.rechercher_zone(localisation, nombre, RAYON_AJOUT_KM, options,
+                                    salles_exclues=salles_deja_retenues(groupes), signaler=signaler)
+        if len(zone.resultats) == 0:
+            signaler("avertissement", f"⚠️ Aucune salle trouvée pour {localisation}")
+            return False
+        groupes.append({"localisation": localisation, "resultats": zone.resultats,
+                        "nombre_salles_demandees": len(zone.resultats), "curseur": zone.curseur})
+        signaler("succes", f"✅ Nouveau groupe créé pour {localisation} avec {len(zone.resultats)} salle(s)")
+        return True
+
+    def _supprimer(self, groupes: list, instruction: dict, signaler):
+        localisation = instruction.get("localisation")
+        try:
+            # L'action est compilée en prédicats, évalués en un seul masque sur les salles de tous les groupes
+            predicats = compiler_suppression(instruction)
+        except ValueError as e:
+            signaler("erreur", f"❌ {e}")
+            return False
+        salles_groupes = SallesGroupes.depuis_groupes(groupes)
+        a_retirer = salles_groupes.par_groupe(evaluer(self.jeu, predicats, salles_groupes))
+        salles_supprimees = 0
+        for groupe, masque in zip(groupes, a_retirer):
+            if masque.any():
+                groupe["resultats"] = groupe["resultats"].filtrer(~masque)
+                salles_supprimees += int(masque.sum())
+                evenement("debug", "Salles supprimées", localisation=groupe["localisation"], supprimees=int(masque.sum()),
+                          restantes=len(groupe["resultats"]))
+        if salles_supprimees > 0:
+            if instruction.get("critere"):
+                portee = f" pour {localisation}" if localisation else ""
+                signaler("succes", f"✅ {salles_supprimees} salle(s) supprimée(s){portee} selon le critère : "
+                                   f"{instruction.get('critere')} {instruction.get('operateur', 'inferieur')} {instruction.get('valeur')}")
+            else:
+                signaler("succes", f"✅ Toutes les salles supprimées pour {localisation} ({salles_supprimees} salles)")
+            return True
+        if instruction.get("critere"):
+            signaler("info", "ℹ️ Aucune salle ne correspondait aux critères de suppression")
+        else:
+            signaler("info", f"ℹ️ Aucune salle à supprimer pour {localisation}")
+        return False
+
+    def _modifier(self, groupes: list, instruction: dict, options: OptionsRecherche, signaler):
+        try:
+            condition = compiler_modification(instruction)
+        except ValueError as e:
+            signaler("erreur", f"❌ {e}")
+            return False
+        cibles = groupes_cibles(groupes, instruction.get("localisation"))
+        if not cibles:
+            signaler("info", f"ℹ️ Aucune zone '{instruction.get('localisation')}' dans les résultats")
+            return False
+        salles_groupes = SallesGroupes.depuis_groupes(groupes)
+        non_conformes = salles_groupes.par_groupe(~evaluer(self.jeu, [condition], salles_groupes))
+        masque_remplacement = masque_salles(self.jeu, [condition])
+        modifications_appliquees = False
+        for i in cibles:
+            groupe = groupes[i]
+            retirees = int(non_conformes[i].sum())
+            groupe["resultats"] = groupe["resultats"].filtrer(~non_conformes[i])
+            if condition.champ == "equipement" and groupe.get("curseur") is not None:
+                # Le flux de la zone ne contient plus que des salles équipées
+                groupe["curseur"] = groupe["curseur"].exiger(drapeaux_equipement(condition.valeur))
+            # Le rayon suit le critère de distance : élargi (ou réduit) sans nouveau géocodage, et conservé
+            # dans le curseur pour les ajouts suivants même si le groupe est déjà complet
+            rayon = condition.valeur if condition.champ == "distance" else None
+            curseur = groupe.get("curseur")
+            rayon_modifie = rayon is not None and curseur is not None and rayon != curseur.rayon_km
+            if rayon_modifie:
+                groupe["curseur"] = (curseur.elargir(self.jeu, rayon) if rayon > curseur.rayon_km
+                                     else curseur.restreindre(self.jeu, rayon))
+            manquantes = groupe["nombre_salles_demandees"] - len(groupe["resultats"])
+            ajoutees = Resultats.vide()
+            if manquantes > 0:
+                ajoutees = self.tirer_salles_groupe(groupe, manquantes, options, salles_deja_retenues(groupes),
+                                                    masque_remplacement, rayon_min_km=rayon, signaler=signaler)
+                groupe["resultats"] = groupe["resultats"].concatener(ajoutees)
+            evenement("debug", "Salles remplacées", localisation=groupe["localisation"], retirees=retirees,
+                      ajoutees=len(ajoutees))
+            if retirees or len(ajoutees) or rayon_modifie:
+                modifications_appliquees = True
+                precision_rayon = f", rayon de recherche : {rayon:g} km" if rayon_modifie else ""
+                signaler("succes", f"✅ {groupe['localisation']} : {retirees} salle(s) retirée(s), {len(ajoutees)} salle(s) ajoutée(s) "
+                                   f"({len(groupe['resultats'])}/{groupe['nombre_salles_demandees']}){precision_rayon}")
+        if not modifications_appliquees:
+            signaler("info", "ℹ️ Les salles retenues respectent déjà ce critère")
+        return modifications_appliquees
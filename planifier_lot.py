@@ -0,0 +1,157 @@
+# --- planifier_lot.py ---
+# Planification par lots, sans interface : une demande de plan par ligne JSONL, traitées en parallèle
+# -*- coding: utf-8 -*-
+#
+# Usage : python planifier_lot.py demandes.jsonl resultats.jsonl [--parquet resultats.parquet]
+#                                 [--processus N] [--hors-ligne] [--donnees cinemas_groupedBig.json]
+#
+# Chaque ligne d'entrée est un objet JSON :
+#   {"id": "avp-1", "requete": "avant-première à Lyon et Marseille, 2 séances chacune"}   (plan interprété par l'IA)
+#   {"id": "test-2", "zones": [{"localisation": "Paris", "nombre": 800, "nombre_seances": 3}]}   (plan déjà structuré)
+# avec, facultativement, "rayons" ({localisation: km}) et "options" (voir moteur.OptionsRecherche,
+# ex : {"max_salles_par_cinema": 2, "equipements_requis": ["3D"]}). Les requêtes simples ("3 séances à Lyon
+# (500 pers.)") sont interprétées par règles, sans clé d'API ni appel au modèle (voir analyse_locale.py).
+#
+# Chaque ligne de sortie reprend l'"id" avec les zones et leurs salles (colonnes d'export), les messages
+# du moteur et l'erreur éventuelle, dans l'ordre des demandes. Avec --parquet, toutes les salles sont
+# aussi écrites à plat (colonnes "id", "Zone" puis celles de l'export).
+#
+# Le jeu de données est compilé (bundle) par le processus principal avant le démarrage des workers :
+# chacun le projette ensuite en mémoire, les pages sont partagées par le système entre les processus.
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from donnees_cinemas import charger_cinemas
+from exports import COLONNE_ZONE
+from moteur import (GEOCATED_CINEMAS_FILE, GEOCODAGE_HORS_LIGNE, NOMINATIM_REQUETES_PAR_S, MoteurPlanification,
+                    OptionsRecherche, creer_client_llm, creer_resolveur_geocodage)
+from resultats import COLONNES_EXPORT, colonnes_export
+from traces import tracer
+
+TAILLE_PAQUET = 4  # Demandes envoyées à la fois à un worker
+
+_moteur = None  # Moteur du processus worker (voir _initialiser_worker)
+
+
+def _initialiser_worker(chemin_donnees: str, hors_ligne: bool, requetes_par_s: float):
+    global _moteur
+    _moteur = MoteurPlanification(charger_cinemas(chemin_donnees),
+                                  creer_resolveur_geocodage(hors_ligne=hors_ligne, requetes_par_s=requetes_par_s),
+                                  fabrique_client_llm=creer_client_llm)
+
+
+def _zone_en_sortie(jeu, groupe: dict):
+    colonnes = colonnes_export(jeu, groupe["resultats"])
+    return {"localisation": groupe["localisation"], "nombre_salles_demandees": groupe["nombre_salles_demandees"],
+            "salles": [dict(zip(COLONNES_EXPORT, valeurs)) for valeurs in zip(*colonnes.values())]}
+
+
+def planifier_demande(demande: dict):
+    """
+    Traite une demande (ligne d'entrée) dans le worker courant.
+    Retourne la ligne de sortie : id, zones, messages [niveau, message] et erreur (None si succès).
+    """
+    messages = []
+
+    def signaler(niveau, message):
+        messages.append([niveau, message])
+
+    sortie = {"id": demande.get("id"), "zones": [], "messages": messages, "erreur": None}
+    try:
+        # Trace exportée si TRACES_EXPORT est défini (voir traces.py)
+        with tracer("lot.demande", id=str(demande.get("id"))):
+            options = OptionsRecherche.depuis_dict(demande.get("options"))
+            instructions = demande.get("zones")
+            if instructions is None:
+                if not demande.get("requete"):
+                    raise ValueError("la demande n'a ni 'zones' ni 'requete'")
+                instructions, _ = _moteur.analyser_requete(demande["requete"], signaler)
+            groupes, _ = _moteur.planifier(instructions, demande.get("rayons"), options, signaler)
+            sortie["zones"] = [_zone_en_sortie(_moteur.jeu, groupe) for groupe in groupes]
+    except Exception as e:
+        sortie["erreur"] = f"{type(e).__name__}: {e}"
+    return sortie
+
+
+def lire_demandes(chemin: str):
+    """Lit les demandes JSONL (lignes vides ignorées) ; un "id" est attribué aux lignes qui n'en ont pas."""
+    with open(chemin, "r", encoding="utf-8") as f:
+        for numero, ligne in enumerate(f, 1):
+            if ligne.strip():
+                demande = json.loads(ligne)
+                demande.setdefault("id", numero)
+                yield demande
+
+
+def _table_parquet(sortie: dict, schema):
+    """Salles d'une sortie à plat (une ligne par salle), colonnes "id", "Zone" puis celles de l'export."""
+    import pyarrow as pa
+
+    colonnes = {nom: [] for nom in schema.names}
+    for zone in sortie["zones"]:
+        for salle in zone["salles"]:
+            colonnes["id"].append(str(sortie["id"]))
+            colonnes[COLONNE_ZONE].append(zone["localisation"])
+            for colonne in COLONNES_EXPORT:
+                colonnes[colonne].append(salle[colonne])
+    return pa.Table.from_pydict(colonnes, schema=schema)
+
+
+def planifier_lot(chemin_demandes: str, chemin_sortie: str, chemin_parquet: str = None, processus: int = None,
+                  hors_ligne: bool = GEOCODAGE_HORS_LIGNE, chemin_donnees: str = GEOCATED_CINEMAS_FILE):
+    """
+    Traite toutes les demandes sur un pool de `processus` workers (un moteur chacun) et écrit
+    les résultats au fil de l'eau, dans l'ordre des demandes. Le débit Nominatim autorisé est
+    réparti entre les workers. Retourne (nombre de demandes, nombre de demandes en erreur).
+    """
+    processus = processus or os.cpu_count() or 1
+    charger_cinemas(chemin_donnees)  # Compile le bundle une fois, avant que les workers ne le projettent
+    writer_parquet = None
+    if chemin_parquet:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([("id", pa.string()), (COLONNE_ZONE, pa.string()), ("Cinéma", pa.string()),
+                            ("Salle", pa.string()), ("Adresse", pa.string()), ("Capacité", pa.int32()),
+                            ("Distance (km)", pa.float64()), ("Contact", pa.string()), ("Latitude", pa.float64()),
+                            ("Longitude", pa.float64())])
+        writer_parquet = pq.ParquetWriter(chemin_parquet, schema)
+    nb_demandes = nb_erreurs = 0
+    try:
+        with ProcessPoolExecutor(processus, initializer=_initialiser_worker,
+                                 initargs=(chemin_donnees, hors_ligne, NOMINATIM_REQUETES_PAR_S / processus)) as pool, \
+                open(chemin_sortie, "w", encoding="utf-8") as f:
+            for sortie in pool.map(planifier_demande, lire_demandes(chemin_demandes), chunksize=TAILLE_PAQUET):
+                f.write(json.dumps(sortie, ensure_ascii=False) + "\n")
+                f.flush()
+                if writer_parquet is not None:
+                    writer_parquet.write_table(_table_parquet(sortie, schema))
+                nb_demandes += 1
+                nb_erreurs += sortie["erreur"] is not None
+    finally:
+        if writer_parquet is not None:
+            writer_parquet.close()
+    return nb_demandes, nb_erreurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Planification par lots de demandes JSONL.")
+    parser.add_argument("demandes", help="fichier JSONL des demandes (une par ligne)")
+    parser.add_argument("sortie", help="fichier JSONL des résultats")
+    parser.add_argument("--parquet", help="écrit aussi toutes les salles retenues dans ce fichier Parquet")
+    parser.add_argument("--processus", type=int, default=None, help="nombre de workers (défaut : nombre de cœurs)")
+    parser.add_argument("--hors-ligne", action="store_true", default=GEOCODAGE_HORS_LIGNE,
+                        help="géocodage local uniquement (gazetteer et cache), sans Nominatim")
+    parser.add_argument("--donnees", default=GEOCATED_CINEMAS_FILE, help="fichier des cinémas géocodés")
+    arguments = parser.parse_args()
+    debut = time.perf_counter()
+    nb_demandes, nb_erreurs = planifier_lot(arguments.demandes, arguments.sortie, arguments.parquet,
+                                            arguments.processus, arguments.hors_ligne, arguments.donnees)
+    print(f"{nb_demandes} demande(s) traitée(s) dans '{arguments.sortie}' en {time.perf_counter() - debut:.1f} s"
+          f" ({nb_erreurs} en erreur).")
+    sys.exit(1 if nb_erreurs else 0)
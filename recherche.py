@@ -0,0 +1,389 @@
+# --- recherche.py ---
+# Recherche multi-zones : géocodage concurrent (débit limité) puis requête groupée sur l'index spatial
+# -*- coding: utf-8 -*-
+
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from index_spatial import DECIMALES_TRI
+from resultats import Resultats
+from selection import selectionner_par_capacite
+from traces import attribuer, propager, span
+
+GEOCODAGE_THREADS = 8
+
+
+class LimiteurDebit:
+    """
+    Espace les appels d'au moins 1 / requetes_par_s secondes, tous threads confondus
+    (ex : politique d'usage de Nominatim, 1 requête par seconde).
+    """
+
+    def __init__(self, requetes_par_s: float):
+        self.intervalle = 1.0 / requetes_par_s if requetes_par_s > 0 else 0.0
+        self._verrou = threading.Lock()
+        self._prochain = 0.0
+
+    def attendre(self):
+        with self._verrou:
+            maintenant = time.monotonic()
+            attente = self._prochain - maintenant
+            self._prochain = max(maintenant, self._prochain) + self.intervalle
+        if attente > 0:
+            attribuer(attente_limiteur_ms=round(attente * 1000, 1))
+            time.sleep(attente)
+
+    def envelopper(self, fonction):
+        """Retourne `fonction` précédée d'un passage par le limiteur."""
+        def fonction_limitee(*args, **kwargs):
+            self.attendre()
+            return fonction(*args, **kwargs)
+        return fonction_limitee
+
+
+@dataclass(frozen=True, slots=True)
+class DemandeZone:
+    """Une zone du plan : localisation, nombre de salles à trouver, rayon maximal (km), objectif de spectateurs."""
+    localisation: str
+    nombre_salles: int
+    rayon_km: float
+    spectateurs: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class CurseurZone:
+    """
+    Flux classé et reprenable des salles candidates d'une zone : point de recherche,
+    rayon, plafond de salles par cinéma, équipements requis et position atteinte dans le flux.
+    Le flux (salles du rayon triées par distance arrondie, -capacité, identifiant) n'est
+    calculé qu'au premier tirage, puis conservé : ajouter des salles, élargir le rayon
+    ou remplacer des salles supprimées ne refait ni géocodage ni parcours complet.
+    Les méthodes retournent un nouveau curseur (à ranger à la place de l'ancien).
+    """
+    lat: float
+    lon: float
+    rayon_km: float
+    max_salles_par_cinema: int = 1
+    equipements_requis: tuple = ()
+    ids_salles: np.ndarray = None
+    distances_km: np.ndarray = None
+    position: int = 0
+
+    def _avec_flux(self, jeu):
+        if self.ids_salles is not None:
+            return self
+        ids_salles, distances = _salles_classees(jeu, self.lat, self.lon, 0.0, self.rayon_km, self.max_salles_par_cinema,
+                                                 jeu.masque_equipements(self.equipements_requis))
+        return replace(self, ids_salles=ids_salles, distances_km=distances)
+
+    def suivantes(self, jeu, nombre: int, salles_exclues=None, masque_salles=None):
+        """
+        Tire les `nombre` prochaines salles du flux, en sautant les `salles_exclues`
+        (identifiants, ex : salles déjà retenues) et celles où `masque_salles` (booléens
+        indexés par salle) est faux. Retourne (Resultats, nouveau curseur) ; moins de
+        `nombre` salles si le flux est épuisé dans le rayon.
+        """
+        curseur = self._avec_flux(jeu)
+        prises = np.zeros(len(jeu.salles.capacite), dtype=bool)
+        if salles_exclues is not None:
+            prises[np.asarray(salles_exclues, dtype=np.int64)] = True
+        retenues, position, taille_bloc = [], curseur.position, max(2 * nombre, 16)
+        while nombre > 0 and position < len(curseur.ids_salles):
+            bloc = curseur.ids_salles[position:position + taille_bloc]
+            valides = ~prises[bloc]
+            if masque_salles is not None:
+                valides &= masque_salles[bloc]
+            trouvees = np.flatnonzero(valides)[:nombre]
+            retenues.append(position + trouvees)
+            nombre -= len(trouvees)
+            position = position + int(trouvees[-1]) + 1 if nombre == 0 else position + len(bloc)
+            taille_bloc *= 2
+        positions = np.concatenate(retenues) if retenues else np.empty(0, dtype=np.int64)
+        resultats = Resultats.depuis(curseur.ids_salles[positions], curseur.distances_km[positions])
+        return resultats, replace(curseur, position=position)
+
+    def restreindre(self, jeu, rayon_km: float):
+        """Retourne un curseur de rayon `rayon_km`, le flux étant tronqué aux salles de ce rayon."""
+        if rayon_km >= self.rayon_km:
+            return self
+        curseur = self._avec_flux(jeu)
+        garder = curseur.distances_km <= rayon_km
+        return replace(curseur, rayon_km=rayon_km, ids_salles=curseur.ids_salles[garder],
+                       distances_km=curseur.distances_km[garder],
+                       position=int(np.count_nonzero(garder[:curseur.position])))
+
+    def exiger(self, *exigences):
+        """
+        Retourne un curseur dont le flux ne contient que les salles remplissant aussi les
+        `exigences` (couples (Equipement, FormatProjection)). Le flux est recalculé depuis
+        le début : le plafond par cinéma s'applique alors aux plus grandes salles équipées.
+        """
+        requis = self.equipements_requis + tuple(e for e in exigences if e not in self.equipements_requis)
+        if requis == self.equipements_requis:
+            return self
+        return replace(self, equipements_requis=requis, ids_salles=None, distances_km=None, position=0)
+
+    def elargir(self, jeu, rayon_km: float):
+        """
+        Retourne un curseur de rayon `rayon_km` : seules les salles de la couronne
+        (ancien rayon, nouveau rayon] sont calculées et ajoutées à la suite du flux.
+        """
+        if rayon_km <= self.rayon_km:
+            return self
+        curseur = self._avec_flux(jeu)
+        ids_salles, distances = _salles_classees(jeu, self.lat, self.lon, self.rayon_km, rayon_km, self.max_salles_par_cinema,
+                                                 jeu.masque_equipements(self.equipements_requis))
+        return replace(curseur, rayon_km=rayon_km,
+                       ids_salles=np.concatenate([curseur.ids_salles, ids_salles]),
+                       distances_km=np.concatenate([curseur.distances_km, distances]))
+
+
+@dataclass(frozen=True, slots=True)
+class ResultatZone:
+    """
+    Résultat d'une zone. `coords` vaut None si la localisation n'a pas été résolue :
+    `erreur` contient alors l'exception du géocodeur, ou None si l'adresse est simplement introuvable.
+    `curseur` permet de poursuivre la recherche de la zone (None si non résolue).
+    """
+    demande: DemandeZone
+    coords: tuple
+    resultats: Resultats
+    erreur: Exception = None
+    curseur: CurseurZone = None
+
+
+def geolocaliser_zones(resolveur, localisations, max_workers: int = GEOCODAGE_THREADS):
+    """
+    Résout les localisations en parallèle (chaque localisation distincte une seule fois).
+    Retourne un dict {localisation: (coords | None, exception | None)}.
+    """
+    uniques = list(dict.fromkeys(localisations))
+    if not uniques:
+        return {}
+
+    def resoudre(localisation):
+        with span("geocodage.zone", localisation=localisation):
+            return resolveur.resoudre(localisation)
+
+    with span("geocodage", localisations=len(uniques)), \
+            ThreadPoolExecutor(max_workers=min(max_workers, len(uniques))) as executeur:
+        futures = {localisation: executeur.submit(propager(resoudre), localisation) for localisation in uniques}
+    resolues = {}
+    for localisation, future in futures.items():
+        try:
+            resolues[localisation] = (future.result(), None)
+        except Exception as erreur:
+            resolues[localisation] = (None, erreur)
+    return resolues
+
+
+def developper_salles(jeu, indices_cinemas, distances, max_par_cinema: int = None, masque_salles=None):
+    """
+    Remplace chaque cinéma candidat par ses `max_par_cinema` plus grandes salles valides
+    (toutes si None), lues dans les plages pré-triées du jeu de données. Avec `masque_salles`
+    (booléens indexés par salle, ex : salles équipées 3D), seules les salles du masque sont
+    retenues et le plafond s'applique aux plus grandes d'entre elles.
+    Retourne (ids_salles, distances_km), chaque salle portant la distance de son cinéma.
+    """
+    indices_cinemas = np.asarray(indices_cinemas, dtype=np.int64)
+    comptes = jeu.cinemas.nb_salles[indices_cinemas].astype(np.int64)
+    if max_par_cinema is not None and masque_salles is None:
+        comptes = np.minimum(comptes, max_par_cinema)
+    decalages = np.cumsum(comptes) - comptes
+    debuts = jeu.cinemas.debut_salles[indices_cinemas].astype(np.int64)
+    ids_salles = np.repeat(debuts - decalages, comptes) + np.arange(int(comptes.sum()), dtype=np.int64)
+    distances = np.repeat(np.asarray(distances, dtype=np.float64), comptes)
+    if masque_salles is None:
+        return ids_salles, distances
+    garder = masque_salles[ids_salles]
+    ids_salles, distances = ids_salles[garder], distances[garder]
+    if max_par_cinema is not None and len(ids_salles):
+        # Rang de chaque salle parmi les salles retenues de son cinéma (plages contiguës)
+        cinemas = jeu.salles.cinema[ids_salles]
+        debuts_plages = np.flatnonzero(np.r_[True, cinemas[1:] != cinemas[:-1]])
+        rangs = np.arange(len(ids_salles)) - np.repeat(debuts_plages, np.diff(np.r_[debuts_plages, len(ids_salles)]))
+        ids_salles, distances = ids_salles[rangs < max_par_cinema], distances[rangs < max_par_cinema]
+    return ids_salles, distances
+
+
+def fusionner_salles(jeu, indices_cinemas, distances, nombre: int, max_par_cinema: int = None):
+    """
+    Retourne les `nombre` meilleures salles (ids_salles, distances_km) parmi les cinémas
+    candidats, au plus `max_par_cinema` par cinéma, dans l'ordre (distance arrondie,
+    -capacité, identifiant). Fusion par tas des listes de salles pré-triées de chaque
+    cinéma : seules les salles effectivement retenues sont examinées.
+    """
+    capacites, debuts, nb_salles = jeu.salles.capacite, jeu.cinemas.debut_salles, jeu.cinemas.nb_salles
+    tas = []
+    for cinema, distance in zip(np.asarray(indices_cinemas).tolist(), np.asarray(distances).tolist()):
+        if nb_salles[cinema] > 0:
+            salle = int(debuts[cinema])
+            tas.append((round(distance, DECIMALES_TRI), -int(capacites[salle]), salle, distance, cinema, 0))
+    heapq.heapify(tas)
+    ids_salles, distances_salles = [], []
+    while tas and len(ids_salles) < nombre:
+        distance_arrondie, _, salle, distance, cinema, rang = heapq.heappop(tas)
+        ids_salles.append(salle)
+        distances_salles.append(distance)
+        rang += 1
+        if rang < nb_salles[cinema] and (max_par_cinema is None or rang < max_par_cinema):
+            heapq.heappush(tas, (distance_arrondie, -int(capacites[salle + 1]), salle + 1, distance, cinema, rang))
+    return np.asarray(ids_salles, dtype=np.int64), np.asarray(distances_salles, dtype=np.float64)
+
+
+def allouer_salles(candidats_par_zone: list, besoins: list, cle_secondaire, salles_exclues=None):
+    """
+    Affectation globale des salles aux zones, la plus proche d'abord : tous les couples
+    (zone, salle candidate) sont triés par (distance arrondie, clé secondaire, salle, zone)
+    et parcourus une fois ; un couple est retenu si la salle est encore libre et que la
+    zone n'a pas atteint son besoin. Une salle n'est ainsi attribuée qu'à une seule zone,
+    celle dont elle est la plus proche parmi les zones qui en ont encore besoin.
+    `candidats_par_zone` : liste de (ids_salles, distances_km) ; `cle_secondaire` : tableau
+    indexé par identifiant de salle (ex : -capacité) ; `salles_exclues` : salles déjà prises.
+    Retourne une liste de (ids_salles, distances_km) par zone, dans l'ordre de tri.
+    """
+    vides = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)) for _ in candidats_par_zone]
+    if not candidats_par_zone:
+        return vides
+    zones = np.repeat(np.arange(len(candidats_par_zone)), [len(ids) for ids, _ in candidats_par_zone])
+    salles = np.concatenate([np.asarray(ids, dtype=np.int64) for ids, _ in candidats_par_zone])
+    distances = np.concatenate([np.asarray(d, dtype=np.float64) for _, d in candidats_par_zone])
+    if len(salles) == 0:
+        return vides
+    ordre = np.lexsort((zones, salles, cle_secondaire[salles], np.round(distances, DECIMALES_TRI)))
+
+    restants = np.maximum(np.asarray(besoins, dtype=np.int64), 0)
+    a_attribuer = int(restants.sum())
+    prises = set() if salles_exclues is None else set(np.asarray(salles_exclues).tolist())
+    retenus = [[] for _ in candidats_par_zone]
+    for position, zone, salle in zip(ordre.tolist(), zones[ordre].tolist(), salles[ordre].tolist()):
+        if a_attribuer == 0:
+            break
+        if restants[zone] == 0 or salle in prises:
+            continue
+        prises.add(salle)
+        retenus[zone].append(position)
+        restants[zone] -= 1
+        a_attribuer -= 1
+    return [(salles[positions], distances[positions]) if positions else vide
+            for positions, vide in zip(retenus, vides)]
+
+
+def _trier_salles(ids_salles, distances, cle_secondaire):
+    """Trie des salles par (distance arrondie, clé secondaire, identifiant)."""
+    ordre = np.lexsort((ids_salles, cle_secondaire[ids_salles], np.round(distances, DECIMALES_TRI)))
+    return ids_salles[ordre], distances[ordre]
+
+
+def _salles_classees(jeu, lat: float, lon: float, rayon_min_km: float, rayon_max_km: float, max_par_cinema: int = None,
+                     masque_salles=None):
+    """
+    Salles des cinémas situés à une distance comprise dans (rayon_min_km, rayon_max_km],
+    au plus `max_par_cinema` par cinéma (parmi celles de `masque_salles` s'il est donné),
+    triées par (distance arrondie, -capacité, identifiant).
+    """
+    indices, distances = jeu.index.dans_rayon(lat, lon, rayon_max_km, eligibles=jeu.cinemas_eligibles(masque_salles))
+    if rayon_min_km > 0:
+        garder = distances > rayon_min_km
+        indices, distances = indices[garder], distances[garder]
+    ids_salles, distances = developper_salles(jeu, indices, distances, max_par_cinema, masque_salles)
+    return _trier_salles(ids_salles, distances, -jeu.salles.capacite)
+
+
+def selectionner_zones_par_capacite(candidats_par_zone: list, demandes: list, capacites, poids_capacite: float = 0.0,
+                                    allocation_globale: bool = True, salles_exclues=None):
+    """
+    Pour chaque zone, choisit exactement `nombre_salles` salles dont la capacité totale atteint
+    l'objectif `spectateurs` (voir selection.selectionner_par_capacite). Les zones sont traitées
+    dans l'ordre ; avec `allocation_globale`, les salles retenues par une zone ne sont plus
+    proposées aux suivantes.
+    Retourne une liste de (ids_salles, distances_km) par zone, triés par distance.
+    """
+    prises = np.zeros(len(capacites), dtype=bool)
+    if salles_exclues is not None:
+        prises[np.asarray(salles_exclues, dtype=np.int64)] = True
+    lots = []
+    for (ids_salles, distances), demande in zip(candidats_par_zone, demandes):
+        libres = ~prises[ids_salles]
+        ids_salles, distances = ids_salles[libres], distances[libres]
+        choix = selectionner_par_capacite(distances, capacites[ids_salles], demande.nombre_salles,
+                                          demande.spectateurs, demande.rayon_km, poids_capacite)
+        lots.append(_trier_salles(ids_salles[choix], distances[choix], -capacites))
+        if allocation_globale:
+            prises[lots[-1][0]] = True
+    return lots
+
+
+def rechercher_zones(jeu, resolveur, demandes: list, max_workers: int = GEOCODAGE_THREADS,
+                     allocation_globale: bool = True, salles_exclues=None,
+                     objectif_capacite: bool = False, poids_capacite: float = 0.0, max_salles_par_cinema: int = 1,
+                     equipements_requis: tuple = ()):
+    """
+    Recherche les salles de plusieurs zones :
+    1. toutes les localisations sont géocodées en parallèle,
+    2. les zones résolues sont traitées en une seule requête groupée sur l'index spatial
+       (cinémas ayant au moins une salle valide, triés par distance arrondie puis capacité),
+    3. chaque cinéma retenu contribue ses `max_salles_par_cinema` plus grandes salles
+       (1 par défaut, None : toutes), de sorte que N salles peuvent venir de moins de N cinémas.
+    Avec `allocation_globale`, une salle n'est attribuée qu'à une seule zone (voir allouer_salles) ;
+    `salles_exclues` (identifiants) écarte des salles déjà retenues ailleurs.
+    Avec `objectif_capacite`, les salles de chaque zone sont choisies pour atteindre son objectif
+    de spectateurs plutôt que par simple proximité (voir selectionner_zones_par_capacite).
+    `equipements_requis` : couples (Equipement, FormatProjection) que chaque salle doit remplir ;
+    les cinémas sans salle équipée sont écartés avant tout calcul de distance (index en bitsets).
+    Retourne une liste de ResultatZone dans l'ordre des demandes ; l'échec d'une zone
+    (localisation introuvable, erreur du géocodeur) n'affecte pas les autres.
+    """
+    coords_par_localisation = geolocaliser_zones(resolveur, [d.localisation for d in demandes], max_workers)
+    resolues = [i for i, d in enumerate(demandes) if coords_par_localisation[d.localisation][0]]
+    lats = [coords_par_localisation[demandes[i].localisation][0][0] for i in resolues]
+    lons = [coords_par_localisation[demandes[i].localisation][0][1] for i in resolues]
+    besoins = [demandes[i].nombre_salles for i in resolues]
+    rayons = [demandes[i].rayon_km for i in resolues]
+    masque_salles = jeu.masque_equipements(equipements_requis)
+    eligibles = jeu.cinemas_eligibles(masque_salles)
+
+    if objectif_capacite or allocation_globale or salles_exclues is not None or masque_salles is not None:
+        with span("index.candidats", zones=len(resolues)):
+            lots_cinemas = jeu.index.candidats_lot(lats, lons, rayons, eligibles)
+        candidats = []
+        for i, (indices, distances) in zip(resolues, lots_cinemas):
+            with span("zone.candidats", localisation=demandes[i].localisation, cinemas=len(indices)):
+                candidats.append(developper_salles(jeu, indices, distances, max_salles_par_cinema, masque_salles))
+        cle_secondaire = -jeu.salles.capacite
+        with span("allocation", mode="capacite" if objectif_capacite else "globale" if allocation_globale else "zone",
+                  salles_candidates=sum(len(ids) for ids, _ in candidats)):
+            if objectif_capacite:
+                lots = selectionner_zones_par_capacite(candidats, [demandes[i] for i in resolues], jeu.salles.capacite,
+                                                       poids_capacite, allocation_globale, salles_exclues)
+            elif allocation_globale:
+                lots = allouer_salles(candidats, besoins, cle_secondaire, salles_exclues)
+            else:
+                lots = [allouer_salles([c], [b], cle_secondaire, salles_exclues)[0] for c, b in zip(candidats, besoins)]
+    else:
+        # Les N cinémas les plus proches suffisent à fournir N salles, fusionnées par tas
+        with span("index.k_plus_proches", zones=len(resolues)):
+            lots_cinemas = jeu.index.k_plus_proches_lot(lats, lons, besoins, rayons, eligibles=eligibles,
+                                                        cle_secondaire=-jeu.cinemas.capacite_max)
+        lots = []
+        for i, (indices, distances), besoin in zip(resolues, lots_cinemas, besoins):
+            with span("zone.fusion", localisation=demandes[i].localisation, cinemas=len(indices)):
+                lots.append(fusionner_salles(jeu, indices, distances, besoin, max_salles_par_cinema))
+    par_demande = dict(zip(resolues, lots))
+
+    zones = []
+    for i, demande in enumerate(demandes):
+        coords, erreur = coords_par_localisation[demande.localisation]
+        if i in par_demande:
+            resultats = Resultats.depuis(*par_demande[i])
+            curseur = CurseurZone(coords[0], coords[1], demande.rayon_km, max_salles_par_cinema,
+                                  equipements_requis=tuple(equipements_requis))
+        else:
+            resultats, curseur = Resultats.vide(), None
+        zones.append(ResultatZone(demande, coords, resultats, erreur, curseur))
+    return zones
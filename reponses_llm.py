@@ -0,0 +1,204 @@
+# --- reponses_llm.py ---
+# Schémas de sortie structurée et validation des réponses du modèle (plan, contexte, raffinage)
+# -*- coding: utf-8 -*-
+
+import json
+
+# Modèles acceptant `response_format={"type": "json_schema", ...}` ; pour les autres,
+# seule la limite de tokens est appliquée et la réponse texte est analysée par extraire_json.
+MODELES_SORTIE_STRUCTUREE = ("gpt-4o", "gpt-4o-mini")
+
+MAX_TOKENS_PLAN = 1000
+MAX_TOKENS_CONTEXTE = 600
+MAX_TOKENS_RAFFINAGE = 200
+
+ACTIONS_RAFFINAGE = ["ajouter", "supprimer", "modifier", "incompris"]
+CRITERES_RAFFINAGE = ["capacite_min", "capacite_max", "distance_max", "equipement", "cinema"]
+OPERATEURS_RAFFINAGE = ["superieur", "inferieur", "egal"]
+
+
+def _nullable(schema: dict):
+    """En mode strict tous les champs sont requis : un champ facultatif accepte null."""
+    return {**schema, "type": [schema["type"], "null"]}
+
+
+SCHEMA_PLAN = {
+    "type": "object",
+    "properties": {
+        "zones": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "localisation": {"type": "string"},
+                    "nombre": {"type": "integer"},
+                    "nombre_seances": _nullable({"type": "integer"}),
+                },
+                "required": ["localisation", "nombre", "nombre_seances"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["zones"],
+    "additionalProperties": False,
+}
+
+SCHEMA_CONTEXTE = {
+    "type": "object",
+    "properties": {
+        "regions": {"type": "array", "items": {"type": "string"}},
+        "justification": {"type": "string"},
+        "public_cible": {"type": "string"},
+        "facteurs_cles": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["regions", "justification", "public_cible", "facteurs_cles"],
+    "additionalProperties": False,
+}
+
+SCHEMA_RAFFINAGE = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ACTIONS_RAFFINAGE},
+        "localisation": _nullable({"type": "string"}),
+        "nombre": _nullable({"type": "integer"}),
+        "critere": {"type": ["string", "null"], "enum": CRITERES_RAFFINAGE + [None]},
+        "valeur": {"type": ["number", "string", "null"]},
+        "operateur": {"type": ["string", "null"], "enum": OPERATEURS_RAFFINAGE + [None]},
+        "message": _nullable({"type": "string"}),
+    },
+    "required": ["action", "localisation", "nombre", "critere", "valeur", "operateur", "message"],
+    "additionalProperties": False,
+}
+
+
+def options_generation(modele: str, nom_schema: str, schema: dict, max_tokens: int, sortie_structuree: bool = True):
+    """
+    Retourne les options de chat.completions.create pour un appel : limite de tokens,
+    et format de réponse contraint par le schéma si le modèle le permet.
+    """
+    options = {"max_tokens": max_tokens}
+    if sortie_structuree and modele in MODELES_SORTIE_STRUCTUREE:
+        options["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {"name": nom_schema, "strict": True, "schema": schema},
+        }
+    return options
+
+
+def extraire_json(texte: str):
+    """
+    Décode le JSON d'une réponse texte : accepte les blocs ```json, un préfixe "json "
+    et du texte autour du JSON (le premier objet ou la première liste est retenu).
+    Lève json.JSONDecodeError si aucun JSON n'est décodable.
+    """
+    texte = (texte or "").strip()
+    if texte.startswith("```"):
+        texte = texte.strip("`").strip()
+    if texte[:4].lower() == "json":
+        texte = texte[4:].strip()
+    try:
+        return json.loads(texte)
+    except json.JSONDecodeError as erreur:
+        debuts = [i for i in (texte.find("["), texte.find("{")) if i >= 0]
+        if not debuts:
+            raise erreur
+        donnees, _ = json.JSONDecoder().raw_decode(texte, min(debuts))
+        return donnees
+
+
+def _entier(valeur):
+    try:
+        return int(valeur)
+    except (ValueError, TypeError):
+        return None
+
+
+def reponse_valide(valider, texte: str):
+    """True si `texte` se décode (voir extraire_json) et passe `valider` (ex : valider_plan) sans ValueError."""
+    try:
+        valider(extraire_json(texte))
+    except ValueError:  # json.JSONDecodeError en dérive
+        return False
+    return True
+
+
+def valider_plan(donnees):
+    """
+    Valide un plan de diffusion : liste d'intentions, objet {"zones": [...]} (sortie structurée),
+    objet enveloppant une liste, ou intention seule.
+    Retourne (instructions, avertissements) ; chaque instruction a "localisation" (str),
+    "nombre" (int) et éventuellement "nombre_seances" (int).
+    """
+    if isinstance(donnees, dict) and "message" in donnees and "localisation" not in donnees:
+        return [], [f"⚠️ L'IA a répondu : {donnees['message']}"]
+    if isinstance(donnees, dict) and "localisation" in donnees and "nombre" in donnees:
+        elements = [donnees]
+    elif isinstance(donnees, dict):
+        cles = ["zones", "resultats", "projections", "locations", "intentions", "data", "result"]
+        elements = next((donnees[cle] for cle in cles if isinstance(donnees.get(cle), list)), None)
+        if elements is None:
+            return [], ["L'IA a retourné un objet, mais aucune structure attendue (liste d'intentions) n'a été trouvée."]
+    elif isinstance(donnees, list):
+        elements = donnees
+    else:
+        return [], ["La réponse n'est ni une liste ni un dictionnaire exploitable."]
+
+    instructions, tous_valides = [], True
+    for element in elements:
+        if not (isinstance(element, dict) and "localisation" in element and "nombre" in element):
+            tous_valides = False
+            continue
+        nombre = _entier(element["nombre"])
+        if nombre is None:
+            nombre, tous_valides = 0, False
+        instruction = {"localisation": str(element["localisation"]).strip(), "nombre": nombre}
+        nombre_seances = _entier(element.get("nombre_seances"))
+        if nombre_seances is not None:
+            instruction["nombre_seances"] = nombre_seances
+        instructions.append(instruction)
+    avertissements = []
+    if not tous_valides:
+        avertissements.append("Certains éléments retournés par l'IA n'ont pas le format attendu (localisation/nombre).")
+    return instructions, avertissements
+
+
+def plan_conforme(donnees):
+    """Variante stricte de valider_plan : lève ValueError au premier avertissement (réponse hors schéma)."""
+    instructions, avertissements = valider_plan(donnees)
+    if avertissements:
+        raise ValueError(avertissements[0])
+    return instructions
+
+
+def valider_contexte(donnees):
+    """
+    Valide l'analyse de contexte. Retourne un dict avec regions, justification,
+    public_cible et facteurs_cles ; lève ValueError si la réponse n'est pas un objet.
+    """
+    if not isinstance(donnees, dict):
+        raise ValueError("l'analyse de contexte n'est pas un objet JSON")
+    listes = {cle: [str(v) for v in donnees.get(cle) or [] if v] for cle in ("regions", "facteurs_cles")}
+    return {
+        "regions": listes["regions"],
+        "justification": str(donnees.get("justification") or "Non spécifié"),
+        "public_cible": str(donnees.get("public_cible") or "Non spécifié"),
+        "facteurs_cles": listes["facteurs_cles"],
+    }
+
+
+def valider_raffinage(donnees):
+    """
+    Valide une action de raffinage. Les champs nuls sont omis, 'séance(s)' est ramené à
+    'salle(s)' et "nombre" est converti en entier (1 par défaut s'il est invalide).
+    Lève ValueError si la réponse n'est pas un objet.
+    """
+    if not isinstance(donnees, dict):
+        raise ValueError("l'action de raffinage n'est pas un objet JSON")
+    instruction = {cle: valeur for cle, valeur in donnees.items() if valeur is not None}
+    for cle in ("action", "critere"):
+        if isinstance(instruction.get(cle), str):
+            instruction[cle] = instruction[cle].replace("séance", "salle")
+    if "nombre" in instruction:
+        nombre = _entier(instruction["nombre"])
+        instruction["nombre"] = 1 if nombre is None else nombre
+    return instruction
@@ -0,0 +1,118 @@
+# --- resultats.py ---
+# Résultats de recherche compacts (identifiants de salles + distances) et matérialisation à l'affichage
+# -*- coding: utf-8 -*-
+
+from dataclasses import dataclass
+
+import numpy as np
+
+COLONNES_EXPORT = ["Cinéma", "Salle", "Adresse", "Capacité", "Distance (km)", "Contact", "Latitude", "Longitude"]
+COLONNES_AFFICHAGE = ["Cinéma", "Salle", "Capacité", "Distance (km)", "Contact"]
+
+
+@dataclass(frozen=True, slots=True)
+class Resultats:
+    """
+    Salles retenues pour une zone : identifiants dans les ColonnesSalles du jeu de
+    données et distances (km, arrondies à 2 décimales) au point de recherche.
+    C'est tout ce que conserve la session ; noms, adresses et contacts sont lus dans
+    le jeu de données partagé au moment de l'affichage ou de l'export.
+    """
+    ids_salles: np.ndarray
+    distances_km: np.ndarray
+
+    def __len__(self):
+        return len(self.ids_salles)
+
+    @classmethod
+    def vide(cls):
+        return cls(np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64))
+
+    @classmethod
+    def depuis(cls, ids_salles, distances_km):
+        return cls(np.asarray(ids_salles, dtype=np.int32), np.round(np.asarray(distances_km, dtype=np.float64), 2))
+
+    def concatener(self, autres):
+        """Retourne un nouveau Resultats avec les salles de `autres` ajoutées à la fin."""
+        return Resultats(np.concatenate([self.ids_salles, autres.ids_salles]),
+                         np.concatenate([self.distances_km, autres.distances_km]))
+
+    def tranche(self, debut: int, fin: int):
+        """Retourne les salles de positions [debut, fin) (vues, sans copie)."""
+        return Resultats(self.ids_salles[debut:fin], self.distances_km[debut:fin])
+
+    def filtrer(self, masque):
+        """Retourne un nouveau Resultats ne gardant que les salles où `masque` est vrai."""
+        return Resultats(self.ids_salles[masque], self.distances_km[masque])
+
+
+def capacites(jeu, resultats: Resultats):
+    """Retourne les capacités (int) des salles retenues."""
+    return jeu.salles.capacite[resultats.ids_salles]
+
+
+def _texte_contact(jeu, idx_cinema: int):
+    chaines, cinemas = jeu.chaines, jeu.cinemas
+    return " / ".join(filter(None, [
+        chaines[cinemas.contact_nom[idx_cinema]],
+        chaines[cinemas.contact_email[idx_cinema]],
+        chaines[cinemas.contact_telephone[idx_cinema]],
+    ]))
+
+
+def lignes(jeu, resultats: Resultats):
+    """
+    Matérialise les salles retenues en dictionnaires (pour la carte et les popups).
+    Retourne une liste de dicts : cinema, salle, adresse, lat, lon, capacite, distance_km, contact.
+    """
+    chaines, cinemas, salles = jeu.chaines, jeu.cinemas, jeu.salles
+    resultat = []
+    for id_salle, distance in zip(resultats.ids_salles.tolist(), resultats.distances_km.tolist()):
+        idx_cinema = int(salles.cinema[id_salle])
+        resultat.append({
+            "cinema": chaines[cinemas.nom[idx_cinema]], "salle": chaines[salles.nom[id_salle]],
+            "adresse": chaines[cinemas.adresse[idx_cinema]],
+            "lat": float(jeu.points.lats[idx_cinema]), "lon": float(jeu.points.lons[idx_cinema]),
+            "capacite": int(salles.capacite[id_salle]), "distance_km": distance,
+            "contact": {
+                "nom": chaines[cinemas.contact_nom[idx_cinema]],
+                "email": chaines[cinemas.contact_email[idx_cinema]],
+                "telephone": chaines[cinemas.contact_telephone[idx_cinema]],
+            },
+        })
+    return resultat
+
+
+def colonnes_export(jeu, resultats: Resultats):
+    """
+    Lit les colonnes d'export des salles retenues dans le jeu de données.
+    Retourne un dict {colonne de COLONNES_EXPORT: liste de valeurs Python}.
+    """
+    chaines, cinemas, salles = jeu.chaines, jeu.cinemas, jeu.salles
+    idx_cinemas = salles.cinema[resultats.ids_salles]
+    return {
+        "Cinéma": [chaines[i] for i in cinemas.nom[idx_cinemas]],
+        "Salle": [chaines[i] for i in salles.nom[resultats.ids_salles]],
+        "Adresse": [chaines[i] for i in cinemas.adresse[idx_cinemas]],
+        "Capacité": capacites(jeu, resultats).tolist(),
+        "Distance (km)": resultats.distances_km.tolist(),
+        "Contact": [_texte_contact(jeu, i) for i in idx_cinemas.tolist()],
+        "Latitude": jeu.points.lats[idx_cinemas].tolist(),
+        "Longitude": jeu.points.lons[idx_cinemas].tolist(),
+    }
+
+
+def dataframe(jeu, resultats: Resultats):
+    """Matérialise les salles retenues en DataFrame (colonnes COLONNES_EXPORT)."""
+    import pandas as pd
+
+    return pd.DataFrame(colonnes_export(jeu, resultats), columns=COLONNES_EXPORT)
+
+
+def dataframes_par_zone(jeu, groupes: list):
+    """
+    Matérialise les DataFrames d'export des zones ayant au moins une salle.
+    Retourne un dict {localisation: DataFrame}, dans l'ordre des groupes.
+    """
+    return {groupe["localisation"]: dataframe(jeu, groupe["resultats"])
+            for groupe in groupes if len(groupe["resultats"]) > 0}
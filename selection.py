@@ -0,0 +1,118 @@
+# --- selection.py ---
+# Sélection de N salles atteignant un objectif de spectateurs (sac à dos borné sur capacités quantifiées)
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+NB_CANDIDATS_PROCHES = 60   # Candidats retenus par distance (au moins 4 x N)
+NB_SEAUX_CAPACITE = 400     # Résolution de la capacité dans la programmation dynamique
+
+
+def _candidats(distances, capacites, nombre: int):
+    """
+    Préfiltre : les max(NB_CANDIDATS_PROCHES, 4N) salles les plus proches, plus les 2N plus
+    grandes (pour que l'objectif reste atteignable quand les salles proches sont petites).
+    Retourne les positions retenues.
+    """
+    nb_proches = max(NB_CANDIDATS_PROCHES, 4 * nombre)
+    if len(distances) <= nb_proches:
+        return np.arange(len(distances))
+    proches = np.argpartition(distances, nb_proches - 1)[:nb_proches]
+    grandes = np.argpartition(-capacites, 2 * nombre - 1)[:2 * nombre] if len(capacites) > 2 * nombre else np.arange(len(capacites))
+    return np.union1d(proches, grandes)
+
+
+def _echanges(choisis, capacites, couts, cible: int):
+    """
+    Vérification exacte après la programmation dynamique : tant qu'une salle choisie peut être
+    remplacée par une salle libre moins coûteuse sans que la capacité réelle passe sous `cible`,
+    l'échange le plus avantageux est appliqué. Retourne les positions choisies (dans `capacites`).
+    """
+    pris = np.zeros(len(capacites), dtype=bool)
+    pris[choisis] = True
+    while True:
+        selection, libres = np.flatnonzero(pris), np.flatnonzero(~pris)
+        if not len(libres):
+            break
+        marge = int(capacites[selection].sum()) - cible
+        gains = couts[selection][:, None] - couts[libres][None, :]
+        gains[capacites[libres][None, :] < capacites[selection][:, None] - marge] = -np.inf
+        sortant, entrant = np.unravel_index(int(np.argmax(gains)), gains.shape)
+        if gains[sortant, entrant] <= 1e-12:
+            break
+        pris[selection[sortant]], pris[libres[entrant]] = False, True
+    return np.flatnonzero(pris)
+
+
+def selectionner_par_capacite(distances, capacites, nombre: int, cible: int, rayon_km: float,
+                              poids_capacite: float = 0.0):
+    """
+    Choisit exactement `nombre` salles (ou toutes s'il y en a moins) dont la capacité totale
+    atteint `cible`, en minimisant le coût total
+        (1 - poids_capacite) * distance / rayon_km - poids_capacite * capacité / capacité_max.
+    `poids_capacite` = 0 : les salles les plus proches qui atteignent l'objectif ;
+    `poids_capacite` = 1 : les plus grandes salles du rayon.
+    Si l'objectif est inatteignable, les `nombre` plus grandes salles sont retenues.
+
+    Programmation dynamique sur (nombre de salles, capacité quantifiée plafonnée à la cible) :
+    les capacités sont arrondies par défaut, une sélection retenue atteint donc réellement la cible.
+    Le résultat est optimal tant que `cible` <= NB_SEAUX_CAPACITE (un seau par place) ; au-delà,
+    l'arrondi peut écarter de bonnes sélections et le résultat est approché, corrigé par des
+    échanges vérifiés sur les capacités réelles (voir _echanges).
+    Seules deux lignes de coûts sont conservées ; la remontée lit une table de bits (salle prise
+    ou non) et, pour le seau plafond, le seau d'origine.
+    Retourne les positions choisies (dans `distances`), non triées.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    capacites = np.asarray(capacites, dtype=np.int64)
+    nombre = min(int(nombre), len(distances))
+    if nombre <= 0:
+        return np.empty(0, dtype=np.int64)
+    positions = _candidats(distances, capacites, nombre)
+    d, c = distances[positions], capacites[positions]
+    cible = max(int(cible), 0)
+    couts = (1.0 - poids_capacite) * d / max(float(rayon_km), 1e-9) - poids_capacite * c / max(int(c.max()), 1)
+
+    # Objectif inatteignable, vérifié sur les capacités réelles (les 2N plus grandes salles sont candidates)
+    plus_grandes = np.lexsort((couts, -c))[:nombre]
+    if int(c[plus_grandes].sum()) < cible:
+        return positions[plus_grandes]
+
+    pas = max(1, -(-cible // NB_SEAUX_CAPACITE))
+    nb_seaux = -(-cible // pas)
+    seaux = np.minimum(c // pas, nb_seaux)
+
+    # valeurs[n, s] : coût minimal de n salles parmi les candidats déjà vus, atteignant s seaux
+    # (s plafonné à nb_seaux) ; prises[i] : bits des états améliorés en ajoutant le candidat i
+    valeurs = np.full((nombre + 1, nb_seaux + 1), np.inf)
+    valeurs[0, 0] = 0.0
+    candidat = np.empty_like(valeurs)
+    prises = np.zeros((len(positions), nombre + 1, (nb_seaux + 8) // 8), dtype=np.uint8)
+    origines = np.zeros((len(positions), nombre + 1), dtype=np.int16)
+    for i in range(len(positions)):
+        k, n_max = int(seaux[i]), min(i + 1, nombre)
+        candidat.fill(np.inf)
+        if k < nb_seaux:
+            candidat[1:n_max + 1, k:nb_seaux] = valeurs[:n_max, :nb_seaux - k] + couts[i]
+        debut = max(nb_seaux - k, 0)
+        meilleurs = np.argmin(valeurs[:n_max, debut:], axis=1)
+        candidat[1:n_max + 1, nb_seaux] = valeurs[np.arange(n_max), debut + meilleurs] + couts[i]
+        origines[i, 1:n_max + 1] = debut + meilleurs
+        ameliores = candidat < valeurs
+        prises[i] = np.packbits(ameliores, axis=1)
+        np.minimum(valeurs, candidat, out=valeurs)
+
+    if not np.isfinite(valeurs[nombre, nb_seaux]):
+        # Atteignable en capacités réelles mais pas une fois arrondies : les plus grandes salles
+        choisis = plus_grandes
+    else:
+        choisis, n, seau = [], nombre, nb_seaux
+        for i in range(len(positions) - 1, -1, -1):
+            if n == 0:
+                break
+            if not (prises[i, n, seau >> 3] >> (7 - (seau & 7))) & 1:
+                continue
+            choisis.append(i)
+            seau = seau - int(seaux[i]) if seau < nb_seaux else int(origines[i, n])
+            n -= 1
+    return positions[_echanges(np.asarray(choisis, dtype=np.int64), c, couts, cible)]
@@ -0,0 +1,108 @@
+# --- tests/test_analyse_locale.py ---
+# Interprétation par règles des plans et des raffinages : formulations reconnues, et celles laissées au modèle
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from analyse_locale import analyser_plan, analyser_raffinage
+from geocodage import normaliser_nom_ville
+from reponses_llm import valider_plan, valider_raffinage
+
+LIEUX_CONNUS = {normaliser_nom_ville(lieu) for lieu in
+                ("Paris", "Lyon", "Marseille", "Lille", "Rennes", "Nantes", "Bordeaux", "Toulouse", "Nice")}
+
+
+def est_connu(lieu: str):
+    return normaliser_nom_ville(lieu) in LIEUX_CONNUS
+
+
+PLANS_RECONNUS = [
+    ("5 séances à Paris (500 pers.) et 2 séances test à Rennes (100 pers.)",
+     [{"localisation": "Paris", "nombre": 500, "nombre_seances": 5},
+      {"localisation": "Rennes", "nombre": 100, "nombre_seances": 2}]),
+    ("5 séances à Paris (500 pers.) et 2 à Rennes (100 pers.)",
+     [{"localisation": "Paris", "nombre": 500, "nombre_seances": 5},
+      {"localisation": "Rennes", "nombre": 100, "nombre_seances": 2}]),
+    ("3 séances à Lyon (300 pers.), deux à Lille (200 pers.) et 1 à Nantes (50 pers.)",
+     [{"localisation": "Lyon", "nombre": 300, "nombre_seances": 3},
+      {"localisation": "Lille", "nombre": 200, "nombre_seances": 2},
+      {"localisation": "Nantes", "nombre": 50, "nombre_seances": 1}]),
+    ("5 séances à Paris (500 pers.) puis 2 séances à Lille (150 pers.)",
+     [{"localisation": "Paris", "nombre": 500, "nombre_seances": 5},
+      {"localisation": "Lille", "nombre": 150, "nombre_seances": 2}]),
+    ("10 séances à Paris (1 000 pers.)",
+     [{"localisation": "Paris", "nombre": 1000, "nombre_seances": 10}]),
+    ("une séance à Lyon (80 spectateurs)",
+     [{"localisation": "Lyon", "nombre": 80, "nombre_seances": 1}]),
+    ("3 séances à Bordeaux (entre 300 et 500 personnes)",
+     [{"localisation": "Bordeaux", "nombre": 400, "nombre_seances": 3}]),
+    ("4 séances en IDF (2k pers.)",
+     [{"localisation": "île-de-france", "nombre": 2000, "nombre_seances": 4}]),
+    ("6 séances dans le sud (600 pers.)",
+     [{"localisation": "Marseille", "nombre": 200, "nombre_seances": 2},
+      {"localisation": "Toulouse", "nombre": 200, "nombre_seances": 2},
+      {"localisation": "Nice", "nombre": 200, "nombre_seances": 2}]),
+    ("Paris (500 pers.) et Lyon (300 pers.)",
+     [{"localisation": "Paris", "nombre": 500}, {"localisation": "Lyon", "nombre": 300}]),
+    ("2 séances à Paris, 3 séances à Lyon, 40 000 spectateurs au total",
+     [{"localisation": "Paris", "nombre": 16000, "nombre_seances": 2},
+      {"localisation": "Lyon", "nombre": 24000, "nombre_seances": 3}]),
+]
+
+PLANS_LAISSES_AU_MODELE = [
+    "5 séances à Paris et Lyon (1000 pers.)",  # Audience de Lyon seule, ou des deux villes ?
+    "2 séances dans le sud (600 pers.)",  # Moins de séances que de villes dans la zone
+    "5 séances à Paris",  # Audience inconnue
+    "2 à Rennes (100 pers.)",  # Nombre seul, sans zone précédente qui précise ses séances
+    "5 séances à Paris (500 pers.) et 2 séances à Gotham (100 pers.)",  # Lieu inconnu localement
+    "3 séances à Paris (500 pers.) pour des étudiants",  # Mots non compris
+    "5 séances à Paris (entre 500 et 300 pers.)",  # Fourchette inversée
+    "5 séances à Paris (500 pers.) et 2 séances à Lyon (300 pers.), 1000 spectateurs au total",
+    "un film sur le rugby pour les jeunes",
+]
+
+
+@pytest.mark.parametrize("texte, attendu", PLANS_RECONNUS)
+def test_plan_reconnu(texte, attendu):
+    instructions = analyser_plan(texte, est_connu)
+
+    assert instructions == attendu
+    assert valider_plan(instructions) == (attendu, [])  # Même schéma que les réponses validées du modèle
+
+
+@pytest.mark.parametrize("texte", PLANS_LAISSES_AU_MODELE)
+def test_plan_laisse_au_modele(texte):
+    assert analyser_plan(texte, est_connu) is None
+
+
+RAFFINAGES_RECONNUS = [
+    ("ajoute 2 salles à Paris", {"action": "ajouter", "localisation": "Paris", "nombre": 2}),
+    ("rajoute une salle à Marseille", {"action": "ajouter", "localisation": "Marseille", "nombre": 1}),
+    ("supprime les salles de moins de 100 places",
+     {"action": "supprimer", "critere": "capacite_min", "valeur": 100, "operateur": "inferieur"}),
+    ("enlève les salles à plus de 30 km",
+     {"action": "supprimer", "critere": "distance_max", "valeur": 30, "operateur": "inferieur"}),
+    ("supprime les séances à Lyon", {"action": "supprimer", "localisation": "Lyon"}),
+    ("augmente le rayon à 100 km pour Paris",
+     {"action": "modifier", "localisation": "Paris", "critere": "distance_max", "valeur": 100}),
+    ("cherche des salles de plus de 150 places", {"action": "modifier", "critere": "capacite_min", "valeur": 150}),
+    ("je veux des salles IMAX", {"action": "modifier", "critere": "equipement", "valeur": "IMAX"}),
+]
+
+RAFFINAGES_LAISSES_AU_MODELE = [
+    "ajoute 2 salles à Gotham",
+    "fais quelque chose de mieux",
+]
+
+
+@pytest.mark.parametrize("texte, attendu", RAFFINAGES_RECONNUS)
+def test_raffinage_reconnu(texte, attendu):
+    instruction = analyser_raffinage(texte, est_connu)
+
+    assert instruction == attendu
+    assert valider_raffinage(instruction) == attendu
+
+
+@pytest.mark.parametrize("texte", RAFFINAGES_LAISSES_AU_MODELE)
+def test_raffinage_laisse_au_modele(texte):
+    assert analyser_raffinage(texte, est_connu) is None
@@ -0,0 +1,76 @@
+# --- tests/test_cache_llm.py ---
+# ClientLLMEnCache : ce qui est mis en cache, et ce qui ne l'est pas (réponses tronquées ou hors schéma)
+# -*- coding: utf-8 -*-
+
+from types import SimpleNamespace
+
+from cache_llm import CacheMemoire, ClientLLMEnCache
+from moteur import MoteurPlanification
+from reponses_llm import plan_conforme, reponse_valide, valider_raffinage
+
+
+class ClientSimule:
+    """Client OpenAI de test : renvoie les réponses prévues, dans l'ordre, et compte les appels."""
+
+    def __init__(self, *reponses):
+        self.reponses = list(reponses)
+        self.appels = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.creer))
+
+    def creer(self, **_):
+        contenu, finish_reason = self.reponses[self.appels]
+        self.appels += 1
+        choix = SimpleNamespace(message=SimpleNamespace(content=contenu), finish_reason=finish_reason)
+        return SimpleNamespace(choices=[choix], usage=None)
+
+
+def test_reponse_complete_servie_depuis_le_cache():
+    client = ClientSimule(('{"regions": []}', "stop"))
+    llm = ClientLLMEnCache(client, CacheMemoire())
+
+    assert llm.completer("modele", "systeme", "texte") == '{"regions": []}'
+    assert llm.completer("modele", "systeme", " texte ") == '{"regions": []}'
+    assert client.appels == 1
+
+
+def test_reponse_tronquee_non_mise_en_cache():
+    client = ClientSimule(('{"regions": ["Lyon", "Li', "length"), ('{"regions": ["Lyon"]}', "stop"))
+    llm = ClientLLMEnCache(client, CacheMemoire())
+
+    assert llm.completer("modele", "systeme", "texte", max_tokens=600) == '{"regions": ["Lyon", "Li'
+    assert llm.completer("modele", "systeme", "texte", max_tokens=600) == '{"regions": ["Lyon"]}'
+    assert client.appels == 2
+
+
+def test_reponse_refusee_non_servie_depuis_le_cache():
+    client = ClientSimule(("Désolé, je ne peux pas répondre.", "stop"), ('{"action": "ajouter"}', "stop"))
+    llm = ClientLLMEnCache(client, CacheMemoire())
+    accepter = lambda contenu: reponse_valide(valider_raffinage, contenu)
+
+    assert llm.completer("modele", "systeme", "texte", accepter=accepter) == "Désolé, je ne peux pas répondre."
+    assert llm.completer("modele", "systeme", "texte", accepter=accepter) == '{"action": "ajouter"}'
+    assert llm.completer("modele", "systeme", "texte", accepter=accepter) == '{"action": "ajouter"}'
+    assert client.appels == 2
+
+
+def test_entree_refusee_deja_en_cache_ignoree():
+    cache = CacheMemoire()
+    llm = ClientLLMEnCache(ClientSimule(('[{"localisation": "Lyon"}]', "stop")), cache)
+    llm.completer("modele", "systeme", "texte")  # Mise en cache sans validation
+    client = ClientSimule(('[{"localisation": "Lyon", "nombre": 300}]', "stop"))
+    llm = ClientLLMEnCache(client, cache)
+
+    contenu = llm.completer("modele", "systeme", "texte", accepter=lambda c: reponse_valide(plan_conforme, c))
+
+    assert contenu == '[{"localisation": "Lyon", "nombre": 300}]'
+    assert client.appels == 1
+
+
+def test_moteur_ne_rejoue_pas_une_reponse_hors_schema():
+    client = ClientSimule(('{"zones": "Paris"}', "stop"), ('{"zones": [{"localisation": "Paris", "nombre": 500}]}', "stop"))
+    moteur = MoteurPlanification(None, None, ClientLLMEnCache(client, CacheMemoire()), analyse_locale=False)
+
+    assert moteur.analyser_requete("un plan")[0] == []
+    assert moteur.analyser_requete("un plan")[0] == [{"localisation": "Paris", "nombre": 500}]
+    assert moteur.analyser_requete("un plan")[0] == [{"localisation": "Paris", "nombre": 500}]
+    assert client.appels == 2
@@ -0,0 +1,51 @@
+# --- tests/test_exports.py ---
+# CacheExports : artefacts resservis, évincés et libérés
+# -*- coding: utf-8 -*-
+
+import os
+
+from exports import CacheExports, supprimer_fichier
+
+
+def test_artefact_construit_une_seule_fois():
+    cache = CacheExports(2)
+    constructions = []
+
+    def construire():
+        constructions.append(1)
+        return "artefact"
+
+    assert cache.obtenir("excel", "e1", construire) == cache.obtenir("excel", "e1", construire) == "artefact"
+    assert len(constructions) == 1
+
+
+def test_construction_concurrente_conserve_le_premier_artefact(tmp_path):
+    cache = CacheExports(2, liberer=supprimer_fichier)
+    chemins = iter([tmp_path / "premier.csv", tmp_path / "second.csv"])
+
+    def construire():
+        chemin = next(chemins)
+        chemin.write_text("zone;salle\n")
+        return str(chemin)
+
+    def construire_pendant_un_autre_thread():
+        # Un autre thread construit et remet le même artefact pendant cette construction
+        remis.append(cache.obtenir("csv", "e1", construire))
+        return construire()
+
+    remis = []
+    retourne = cache.obtenir("csv", "e1", construire_pendant_un_autre_thread)
+
+    assert retourne == remis[0]
+    assert os.path.exists(retourne)
+    assert not os.path.exists(tmp_path / "second.csv")
+    assert cache.obtenir("csv", "e1", construire) == retourne
+
+
+def test_artefacts_evinces_liberes():
+    liberes = []
+    cache = CacheExports(2, liberer=liberes.append)
+    for empreinte in ("e1", "e2", "e3"):
+        cache.obtenir("csv", empreinte, lambda empreinte=empreinte: f"fichier_{empreinte}")
+
+    assert liberes == ["fichier_e1"]
@@ -0,0 +1,103 @@
+# --- tests/test_moteur.py ---
+# Actions de raffinage du moteur de planification sur des groupes de résultats réels
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+import pytest
+
+from donnees_cinemas import charger_cinemas
+from moteur import MoteurPlanification
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COORDS = {"Paris": (48.8566, 2.3522), "Lyon": (45.7640, 4.8357)}
+
+
+class ResolveurFixe:
+    """Géocodeur de test : coordonnées de COORDS, sans service distant."""
+
+    def resoudre(self, adresse: str):
+        return COORDS.get(adresse)
+
+    def connait(self, adresse: str):
+        return adresse in COORDS
+
+
+@pytest.fixture(scope="module")
+def jeu():
+    return charger_cinemas(os.path.join(RACINE, "cinemas_groupedBig.json"), utiliser_bundle=False)
+
+
+@pytest.fixture
+def moteur(jeu):
+    return MoteurPlanification(jeu, ResolveurFixe(), analyse_locale=False)
+
+
+@pytest.fixture
+def groupes(moteur):
+    groupes, _ = moteur.planifier([{"localisation": "Paris", "nombre": 2000, "nombre_seances": 8},
+                                   {"localisation": "Lyon", "nombre": 1000, "nombre_seances": 8}])
+    return groupes
+
+
+def _capacites(jeu, groupe):
+    return jeu.salles.capacite[groupe["resultats"].ids_salles]
+
+
+def test_supprimer_critere_et_localisation_limite_a_la_zone(jeu, moteur, groupes):
+    seuil = int(np.median(np.concatenate([_capacites(jeu, groupe) for groupe in groupes])))
+    avant = {groupe["localisation"]: groupe["resultats"].ids_salles.copy() for groupe in groupes}
+
+    modifie = moteur.appliquer_raffinage(groupes, {"action": "supprimer", "localisation": "Lyon",
+                                                   "critere": "capacite_min", "valeur": seuil, "operateur": "inferieur"})
+
+    paris, lyon = groupes
+    assert modifie
+    assert paris["resultats"].ids_salles.tolist() == avant["Paris"].tolist()
+    assert np.all(_capacites(jeu, lyon) >= seuil)
+    assert len(lyon["resultats"]) < len(avant["Lyon"])
+
+
+def test_supprimer_critere_sans_localisation_sur_toutes_les_zones(jeu, moteur, groupes):
+    seuil = int(np.median(np.concatenate([_capacites(jeu, groupe) for groupe in groupes])))
+
+    moteur.appliquer_raffinage(groupes, {"action": "supprimer", "critere": "capacite_min", "valeur": seuil,
+                                         "operateur": "inferieur"})
+
+    for groupe in groupes:
+        assert np.all(_capacites(jeu, groupe) >= seuil)
+
+
+def test_supprimer_localisation_seule_vide_la_zone(moteur, groupes):
+    moteur.appliquer_raffinage(groupes, {"action": "supprimer", "localisation": "Paris"})
+
+    assert len(groupes[0]["resultats"]) == 0
+    assert len(groupes[1]["resultats"]) == 8
+
+
+def test_modifier_rayon_elargi_conserve_pour_les_ajouts(moteur, groupes):
+    paris = groupes[0]
+    rayon_initial = paris["curseur"].rayon_km
+
+    modifie = moteur.appliquer_raffinage(groupes, {"action": "modifier", "localisation": "Paris",
+                                                   "critere": "distance_max", "valeur": 300})
+
+    assert modifie  # Groupe complet : seul le rayon change
+    assert len(paris["resultats"]) == paris["nombre_salles_demandees"]
+    assert paris["curseur"].rayon_km == 300 > rayon_initial
+
+    moteur.appliquer_raffinage(groupes, {"action": "ajouter", "localisation": "Paris", "nombre": 400})
+
+    assert paris["curseur"].rayon_km == 300
+    assert 100 < paris["resultats"].distances_km.max() <= 300
+
+
+def test_modifier_rayon_reduit_remplace_les_salles_hors_rayon(moteur, groupes):
+    paris = groupes[0]
+
+    moteur.appliquer_raffinage(groupes, {"action": "modifier", "localisation": "Paris",
+                                         "critere": "distance_max", "valeur": 3})
+
+    assert paris["curseur"].rayon_km == 3
+    assert paris["resultats"].distances_km.max() <= 3
@@ -0,0 +1,186 @@
+# --- tests/test_recherche.py ---
+# Allocation globale des salles (allouer_salles) et curseur reprenable par zone (CurseurZone)
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+import pytest
+
+from donnees_cinemas import Equipement, FormatProjection, charger_cinemas
+from recherche import CurseurZone, DemandeZone, allouer_salles, rechercher_zones
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARIS = (48.8566, 2.3522)
+
+
+class ResolveurFixe:
+    """Géocodeur de test : toute localisation se résout au même point."""
+
+    def __init__(self, coords):
+        self.coords = coords
+
+    def resoudre(self, adresse: str):
+        return self.coords
+
+
+@pytest.fixture(scope="module")
+def jeu():
+    return charger_cinemas(os.path.join(RACINE, "cinemas_groupedBig.json"), utiliser_bundle=False)
+
+
+def _candidats(ids, distances):
+    return np.asarray(ids, dtype=np.int64), np.asarray(distances, dtype=np.float64)
+
+
+# --- allouer_salles ---
+
+@pytest.mark.parametrize("graine", range(20))
+def test_allocation_globale_sans_doublon(graine):
+    rng = np.random.default_rng(graine)
+    nb_salles = 60
+    cle_secondaire = -rng.integers(50, 500, nb_salles)
+    candidats = []
+    for _ in range(4):  # Zones qui se chevauchent : une même salle est candidate de plusieurs zones
+        ids = rng.choice(nb_salles, size=int(rng.integers(5, 40)), replace=False)
+        candidats.append(_candidats(ids, rng.uniform(0, 30, len(ids))))
+    besoins = rng.integers(0, 15, len(candidats)).tolist()
+    exclues = rng.choice(nb_salles, size=5, replace=False)
+
+    lots = allouer_salles(candidats, besoins, cle_secondaire, exclues)
+
+    attribuees = np.concatenate([ids for ids, _ in lots])
+    assert len(set(attribuees.tolist())) == len(attribuees)
+    assert not set(attribuees.tolist()) & set(exclues.tolist())
+    for (ids, distances), (ids_candidats, distances_candidates), besoin in zip(lots, candidats, besoins):
+        assert len(ids) <= besoin
+        assert set(ids.tolist()) <= set(ids_candidats.tolist())
+        correspondance = dict(zip(ids_candidats.tolist(), distances_candidates.tolist()))
+        assert distances.tolist() == [correspondance[salle] for salle in ids.tolist()]
+
+
+def test_allocation_globale_salle_a_la_zone_la_plus_proche():
+    cle_secondaire = np.zeros(4, dtype=np.int64)
+    candidats = [_candidats([0, 1, 2], [5.0, 1.0, 2.0]), _candidats([0, 3], [0.5, 3.0])]
+
+    lots = allouer_salles(candidats, [2, 2], cle_secondaire)
+
+    assert lots[0][0].tolist() == [1, 2]
+    assert lots[1][0].tolist() == [0, 3]
+
+
+def test_allocation_globale_zone_servie_par_les_salles_restantes():
+    cle_secondaire = np.zeros(3, dtype=np.int64)
+    candidats = [_candidats([0, 1], [1.0, 2.0]), _candidats([0, 1, 2], [1.5, 2.5, 9.0])]
+
+    lots = allouer_salles(candidats, [2, 2], cle_secondaire)
+
+    assert lots[0][0].tolist() == [0, 1]
+    assert lots[1][0].tolist() == [2]  # Moins de salles que demandé : les autres sont prises
+
+
+def test_allocation_departage_distance_capacite_identifiant():
+    capacites = np.array([100, 300, 300, 200, 500, 300])
+    # Distances égales une fois arrondies à DECIMALES_TRI, sauf la salle 4, plus lointaine
+    candidats = [_candidats([5, 4, 3, 2, 1, 0], [1.001, 1.02, 1.0, 1.004, 0.998, 1.0])]
+
+    ids, _ = allouer_salles(candidats, [6], -capacites)[0]
+
+    assert ids.tolist() == [1, 2, 5, 3, 0, 4]
+
+
+def test_allocation_besoin_nul_ou_sans_candidat():
+    cle_secondaire = np.zeros(3, dtype=np.int64)
+    candidats = [_candidats([0, 1], [1.0, 2.0]), _candidats([], [])]
+
+    lots = allouer_salles(candidats, [0, 3], cle_secondaire)
+
+    assert [len(ids) for ids, _ in lots] == [0, 0]
+
+
+# --- CurseurZone ---
+
+def _cle_tri(jeu, ids, distances):
+    return [(round(d, 2), -int(jeu.salles.capacite[s]), int(s)) for s, d in zip(ids.tolist(), distances.tolist())]
+
+
+def _tout_tirer(jeu, curseur, taille_lot: int, **options):
+    lots = []
+    while True:
+        resultats, curseur = curseur.suivantes(jeu, taille_lot, **options)
+        if not len(resultats):
+            return np.concatenate([lot.ids_salles for lot in lots]) if lots else np.empty(0, dtype=np.int32), curseur
+        lots.append(resultats)
+
+
+def test_curseur_flux_trie(jeu):
+    resultats, _ = CurseurZone(*PARIS, 20.0).suivantes(jeu, 10_000)
+
+    cles = _cle_tri(jeu, resultats.ids_salles, resultats.distances_km)
+    assert len(resultats) > 50
+    assert cles == sorted(cles)
+    assert np.all(resultats.distances_km <= 20.0)
+
+
+def test_curseur_par_lots_identique_a_un_seul_tirage(jeu):
+    curseur = CurseurZone(*PARIS, 20.0)
+    complet, _ = curseur.suivantes(jeu, 10_000)
+
+    par_lots, _ = _tout_tirer(jeu, curseur, 7)
+
+    assert par_lots.tolist() == complet.ids_salles.tolist()
+
+
+def test_curseur_premier_tirage_identique_a_la_recherche(jeu):
+    demande = DemandeZone("Paris", 25, 20.0)
+    zone = rechercher_zones(jeu, ResolveurFixe(PARIS), [demande], allocation_globale=False)[0]
+
+    resultats, _ = zone.curseur.suivantes(jeu, demande.nombre_salles)
+
+    assert resultats.ids_salles.tolist() == zone.resultats.ids_salles.tolist()
+
+
+@pytest.mark.parametrize("deja_tirees", [0, 5, 40])
+def test_curseur_elargi_identique_a_une_recherche_plus_large(jeu, deja_tirees):
+    curseur = CurseurZone(*PARIS, 10.0)
+    premieres, curseur = curseur.suivantes(jeu, deja_tirees)
+
+    suite, _ = _tout_tirer(jeu, curseur.elargir(jeu, 40.0), 9)
+    neuf, _ = CurseurZone(*PARIS, 40.0).suivantes(jeu, 10_000)
+
+    reprise = premieres.ids_salles.tolist() + suite.tolist()
+    assert reprise == neuf.ids_salles.tolist()
+
+
+def test_curseur_restreint_identique_a_une_recherche_plus_etroite(jeu):
+    curseur = CurseurZone(*PARIS, 40.0)
+    premieres, curseur = curseur.suivantes(jeu, 12)
+
+    suite, _ = _tout_tirer(jeu, curseur.restreindre(jeu, 8.0), 5)
+    neuf, _ = CurseurZone(*PARIS, 8.0).suivantes(jeu, 10_000)
+
+    attendues = [salle for salle in neuf.ids_salles.tolist() if salle not in set(premieres.ids_salles.tolist())]
+    assert suite.tolist() == attendues
+
+
+def test_curseur_saute_les_salles_exclues(jeu):
+    curseur = CurseurZone(*PARIS, 20.0)
+    complet, _ = curseur.suivantes(jeu, 10_000)
+    exclues = complet.ids_salles[::3]
+
+    resultats, _ = _tout_tirer(jeu, curseur, 4, salles_exclues=exclues)
+
+    assert resultats.tolist() == [salle for salle in complet.ids_salles.tolist() if salle not in set(exclues.tolist())]
+
+
+def test_curseur_exigence_identique_a_une_recherche_equipee(jeu):
+    exigence = (Equipement.TROIS_D, FormatProjection(0))
+    curseur = CurseurZone(*PARIS, 30.0, max_salles_par_cinema=2)
+    _, curseur = curseur.suivantes(jeu, 5)
+
+    resultats, _ = curseur.exiger(exigence).suivantes(jeu, 10_000)
+    neuf, _ = CurseurZone(*PARIS, 30.0, 2, (exigence,)).suivantes(jeu, 10_000)
+
+    assert len(resultats) > 0
+    assert resultats.ids_salles.tolist() == neuf.ids_salles.tolist()
+    assert np.all(jeu.masque_equipements((exigence,))[resultats.ids_salles])
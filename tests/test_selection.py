@@ -0,0 +1,99 @@
+# --- tests/test_selection.py ---
+# selection.selectionner_par_capacite comparée à une recherche exhaustive sur de petits jeux aléatoires
+# -*- coding: utf-8 -*-
+
+import itertools
+
+import numpy as np
+import pytest
+
+from selection import NB_SEAUX_CAPACITE, selectionner_par_capacite
+
+RAYON_KM = 50.0
+
+
+def _cout(distances, capacites, positions, poids_capacite):
+    positions = list(positions)
+    return float(((1.0 - poids_capacite) * distances[positions] / RAYON_KM
+                  - poids_capacite * capacites[positions] / capacites.max()).sum())
+
+
+def _exhaustive(distances, capacites, nombre, cible, poids_capacite):
+    """Coût minimal des sélections atteignant `cible`, None si aucune ne l'atteint."""
+    couts = [_cout(distances, capacites, choix, poids_capacite)
+             for choix in itertools.combinations(range(len(distances)), nombre)
+             if capacites[list(choix)].sum() >= cible]
+    return min(couts) if couts else None
+
+
+@pytest.mark.parametrize("graine", range(40))
+@pytest.mark.parametrize("echelle", [1, 100])
+def test_optimal_contre_recherche_exhaustive(graine, echelle):
+    rng = np.random.default_rng(graine)
+    for _ in range(20):
+        nb_salles, nombre = int(rng.integers(1, 10)), int(rng.integers(1, 5))
+        distances = rng.uniform(0, RAYON_KM, nb_salles)
+        capacites = rng.integers(1, 150, nb_salles) * echelle
+        cible = int(rng.integers(0, capacites.sum() + 1))
+        poids_capacite = float(rng.choice([0.0, 0.3, 1.0]))
+        meilleur = _exhaustive(distances, capacites, min(nombre, nb_salles), cible, poids_capacite)
+        if meilleur is None:
+            continue
+
+        choix = selectionner_par_capacite(distances, capacites, nombre, cible, RAYON_KM, poids_capacite)
+
+        assert len(set(choix.tolist())) == len(choix) == min(nombre, nb_salles)
+        assert capacites[choix].sum() >= cible
+        if cible <= NB_SEAUX_CAPACITE:  # Un seau par place : résultat exact
+            assert _cout(distances, capacites, choix, poids_capacite) == pytest.approx(meilleur, abs=1e-9)
+
+
+def test_arrondi_des_capacites_corrige_par_echanges():
+    # Capacités arrondies au seau de 13 places : la sélection optimale (4 976 places) tombe sous la cible
+    distances = np.array([7.7, 35.3, 4.0, 48.5, 10.1])
+    capacites = np.array([1818, 2299, 859, 2328, 645])
+
+    choix = selectionner_par_capacite(distances, capacites, 3, 4970, RAYON_KM)
+
+    assert sorted(choix.tolist()) == [0, 1, 2]
+
+
+def test_capacite_totale_insuffisante():
+    distances = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+    capacites = np.array([100, 300, 50, 200, 80])
+
+    choix = selectionner_par_capacite(distances, capacites, 2, 10_000, RAYON_KM)
+
+    assert sorted(choix.tolist()) == [1, 3]  # Les deux plus grandes salles
+
+
+def test_objectif_inatteignable_departage_par_cout():
+    distances = np.array([9.0, 1.0, 5.0, 2.0])
+    capacites = np.array([200, 200, 200, 50])
+
+    choix = selectionner_par_capacite(distances, capacites, 2, 1_000, RAYON_KM)
+
+    assert sorted(choix.tolist()) == [1, 2]  # À capacité égale, les plus proches
+
+
+def test_moins_de_salles_que_demande():
+    distances = np.array([3.0, 1.0])
+    capacites = np.array([10, 20])
+
+    choix = selectionner_par_capacite(distances, capacites, 5, 10, RAYON_KM)
+
+    assert sorted(choix.tolist()) == [0, 1]
+
+
+def test_aucune_salle_demandee():
+    assert len(selectionner_par_capacite(np.array([1.0]), np.array([10]), 0, 10, RAYON_KM)) == 0
+
+
+def test_objectif_nul_retient_les_plus_proches():
+    rng = np.random.default_rng(0)
+    distances = rng.uniform(0, RAYON_KM, 200)
+    capacites = rng.integers(30, 500, 200)
+
+    choix = selectionner_par_capacite(distances, capacites, 10, 0, RAYON_KM)
+
+    assert sorted(choix.tolist()) == sorted(np.argsort(distances)[:10].tolist())
@@ -0,0 +1,42 @@
+# --- tests/test_traces.py ---
+# Événements des traces : ordre chronologique, égalités d'horodatage
+# -*- coding: utf-8 -*-
+
+import traces
+from traces import evenement, evenements, span, tracer
+
+
+def test_evenements_simultanes_dans_l_ordre_d_enregistrement(monkeypatch):
+    monkeypatch.setattr(traces.time, "time_ns", lambda: 1_000)
+    with tracer("action", "debug") as trace, span("etape"):
+        evenement("info", "message", detail={"a": 1})
+        evenement("info", "message", detail={"b": 2})
+
+    assert [attributs for _, _, _, _, attributs in evenements(trace)] == [{"detail": {"a": 1}}, {"detail": {"b": 2}}]
+
+
+def test_evenements_par_ordre_chronologique():
+    with tracer("action", "debug") as trace:
+        with span("premiere"):
+            evenement("info", "un")
+        with span("seconde"):
+            evenement("info", "deux")
+
+    assert [message for _, _, _, message, _ in evenements(trace)] == ["un", "deux"]
+
+
+def test_attribut_paresseux_calcule_seulement_si_enregistre():
+    appels = []
+
+    def groupes():
+        appels.append(1)
+        return ["Paris (5 salles)"]
+
+    evenement("debug", "hors trace", groupes=groupes)
+    with tracer("action", "info"):
+        evenement("debug", "sous le niveau", groupes=groupes)
+    with tracer("action", "debug") as trace:
+        evenement("debug", "enregistre", groupes=groupes)
+
+    assert len(appels) == 1
+    assert evenements(trace)[0][4] == {"groupes": ["Paris (5 salles)"]}
@@ -0,0 +1,312 @@
+# --- traces.py ---
+# Instrumentation légère des étapes (spans imbriqués, événements par niveau) et export JSONL / OpenTelemetry
+# -*- coding: utf-8 -*-
+#
+# Une trace couvre une action de l'utilisateur (analyse, recherche, raffinage...) ou une demande traitée par
+# lot. Hors d'une trace, span(), attribuer() et evenement() ne font rien : l'instrumentation laissée dans
+# les chemins critiques se réduit à la lecture d'une variable de contexte.
+#
+# Export facultatif de chaque trace terminée (ajout en fin de fichier, une ligne par écriture) :
+#   TRACES_EXPORT=jsonl  -> un span par ligne (TRACES_FICHIER, défaut .cache/traces.jsonl)
+#   TRACES_EXPORT=otlp   -> une requête OTLP/JSON (ExportTraceServiceRequest) par ligne, lisible par le
+#                           récepteur "otlpjsonfile" du collecteur OpenTelemetry (défaut .cache/traces.otlp.jsonl)
+
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import nullcontext
+
+TRACES_EXPORT = os.getenv("TRACES_EXPORT", "")  # "", "jsonl" ou "otlp"
+FICHIERS_EXPORT = {"jsonl": os.path.join(".cache", "traces.jsonl"), "otlp": os.path.join(".cache", "traces.otlp.jsonl")}
+TRACES_FICHIER = os.getenv("TRACES_FICHIER") or FICHIERS_EXPORT.get(TRACES_EXPORT)
+NOM_SERVICE = "assistant-cinema"
+
+# Niveaux des événements ; une trace n'enregistre que ceux de son niveau ou au-dessus
+NIVEAUX = {"debug": 10, "info": 20, "avertissement": 30, "erreur": 40}
+
+_courant = contextvars.ContextVar("traces_courant", default=None)  # (Trace, Span) actifs
+
+
+class Span:
+    """Étape chronométrée : nom, parent, horodatages (ns depuis l'époque), attributs et événements."""
+
+    __slots__ = ("nom", "id", "parent", "debut_ns", "fin_ns", "attributs", "evenements", "statut")
+
+    def __init__(self, nom: str, parent, attributs: dict):
+        self.nom = nom
+        self.id = secrets.randbits(64) or 1
+        self.parent = parent
+        self.debut_ns = time.time_ns()
+        self.fin_ns = None
+        self.attributs = attributs
+        self.evenements = []  # (temps_ns, niveau, message, attributs)
+        self.statut = "ok"
+
+    @property
+    def duree_ms(self):
+        return ((self.fin_ns or time.time_ns()) - self.debut_ns) / 1e6
+
+
+class _SpanActif:
+    """Contexte d'un span : le rend courant à l'entrée, le termine (et note l'erreur éventuelle) à la sortie."""
+
+    __slots__ = ("trace", "span", "_jeton")
+
+    def __init__(self, trace, span: Span):
+        self.trace = trace
+        self.span = span
+
+    def __enter__(self):
+        self._jeton = _courant.set((self.trace, self.span))
+        return self.span
+
+    def __exit__(self, type_exception, exception, _):
+        self.span.fin_ns = time.time_ns()
+        if isinstance(exception, Exception):
+            self.span.statut = "erreur"
+            self.span.attributs["erreur"] = f"{type_exception.__name__}: {exception}"
+        _courant.reset(self._jeton)
+        return False
+
+
+class Trace:
+    """
+    Ensemble des spans d'une action, le premier étant la racine. Les spans peuvent être
+    ouverts depuis plusieurs threads (voir propager) ; seuls les événements de niveau
+    supérieur ou égal à `niveau` sont conservés.
+    """
+
+    def __init__(self, nom: str, niveau: str = "info", **attributs):
+        self.id = secrets.randbits(128) or 1
+        self.rang_min = NIVEAUX[niveau]
+        self._verrou = threading.Lock()
+        self._nb_exportes = 0
+        self.spans = []
+        self.racine = self._ouvrir(nom, None, attributs)
+
+    def _ouvrir(self, nom: str, parent, attributs: dict):
+        span = Span(nom, parent, attributs)
+        with self._verrou:
+            self.spans.append(span)
+        return span
+
+    def span(self, nom: str, parent: Span = None, **attributs):
+        """Contexte d'un nouveau span, enfant de `parent` (de la racine par défaut)."""
+        return _SpanActif(self, self._ouvrir(nom, (parent or self.racine).id, attributs))
+
+    def spans_termines(self):
+        """Spans terminés, par ordre de début."""
+        with self._verrou:
+            spans = list(self.spans)
+        return sorted((s for s in spans if s.fin_ns is not None), key=lambda s: s.debut_ns)
+
+    def a_exporter(self):
+        """
+        Spans ajoutés depuis le dernier export, une fois tous terminés (chaque span n'est
+        exporté qu'une fois). Retourne [] tant qu'un de ces spans est encore ouvert.
+        """
+        with self._verrou:
+            nouveaux = self.spans[self._nb_exportes:]
+            if any(s.fin_ns is None for s in nouveaux):
+                return []
+            self._nb_exportes = len(self.spans)
+        return nouveaux
+
+
+def tracer(nom: str, niveau: str = "info", **attributs):
+    """
+    Démarre une trace : le contexte retourné rend sa racine courante et produit la Trace ;
+    la trace est exportée à la sortie si TRACES_EXPORT est défini.
+    """
+    return _ContexteTrace(Trace(nom, niveau, **attributs))
+
+
+def reprendre(trace):
+    """
+    Rattache les spans ouverts dans le contexte retourné à la racine d'une trace déjà terminée
+    (ex : carte rendue au rerun suivant la recherche). Sans trace, ne fait rien.
+    """
+    return nullcontext() if trace is None else _ContexteTrace(trace, reprise=True)
+
+
+class _ContexteTrace:
+    __slots__ = ("trace", "reprise", "_jeton")
+
+    def __init__(self, trace: Trace, reprise: bool = False):
+        self.trace = trace
+        self.reprise = reprise
+
+    def __enter__(self):
+        self._jeton = _courant.set((self.trace, self.trace.racine))
+        return self.trace
+
+    def __exit__(self, type_exception, exception, _):
+        racine = self.trace.racine
+        if not self.reprise:
+            racine.fin_ns = time.time_ns()
+            if isinstance(exception, Exception):
+                racine.statut = "erreur"
+                racine.attributs["erreur"] = f"{type_exception.__name__}: {exception}"
+        _courant.reset(self._jeton)
+        if TRACES_EXPORT and TRACES_FICHIER:
+            exporter(self.trace, TRACES_EXPORT, TRACES_FICHIER)
+        return False
+
+
+def span(nom: str, **attributs):
+    """Contexte d'un span enfant du span courant ; sans trace active, contexte vide."""
+    actif = _courant.get()
+    if actif is None:
+        return nullcontext()
+    trace, parent = actif
+    return trace.span(nom, parent, **attributs)
+
+
+def attribuer(**attributs):
+    """Ajoute des attributs au span courant (sans effet hors trace)."""
+    actif = _courant.get()
+    if actif is not None:
+        actif[1].attributs.update(attributs)
+
+
+def evenement(niveau: str, message: str, **attributs):
+    """
+    Enregistre un événement horodaté sur le span courant si la trace active l'accepte
+    (niveau suffisant). Hors trace ou sous le niveau, l'appel est sans effet : le message
+    doit être une constante, les valeurs variables passent par les attributs. Un attribut
+    coûteux à calculer se passe sous forme de fonction sans argument, appelée seulement
+    si l'événement est enregistré.
+    """
+    actif = _courant.get()
+    if actif is None or NIVEAUX[niveau] < actif[0].rang_min:
+        return
+    attributs = {cle: valeur() if callable(valeur) else valeur for cle, valeur in attributs.items()}
+    actif[1].evenements.append((time.time_ns(), niveau, message, attributs))
+
+
+def propager(fonction):
+    """Enveloppe `fonction` pour qu'elle s'exécute (ex : dans un autre thread) sous le span courant."""
+    contexte = contextvars.copy_context()
+    return lambda *args, **kwargs: contexte.run(fonction, *args, **kwargs)
+
+
+def _json(valeur):
+    if valeur is None or isinstance(valeur, (bool, int, float, str)):
+        return valeur
+    if isinstance(valeur, (list, tuple)):
+        return [_json(v) for v in valeur]
+    return str(valeur)
+
+
+def lignes_jsonl(trace: Trace, spans: list):
+    """Un objet JSON par span (identifiants hexadécimaux, durée en ms, événements)."""
+    for s in spans:
+        yield json.dumps({
+            "trace": f"{trace.id:032x}", "span": f"{s.id:016x}", "parent": None if s.parent is None else f"{s.parent:016x}",
+            "nom": s.nom, "debut_ns": s.debut_ns, "duree_ms": round(s.duree_ms, 3), "statut": s.statut,
+            "attributs": {cle: _json(v) for cle, v in s.attributs.items()},
+            "evenements": [{"temps_ns": t, "niveau": niveau, "message": message,
+                            "attributs": {cle: _json(v) for cle, v in attributs.items()}}
+                           for t, niveau, message, attributs in s.evenements],
+        }, ensure_ascii=False)
+
+
+def _valeur_otlp(valeur):
+    if isinstance(valeur, bool):
+        return {"boolValue": valeur}
+    if isinstance(valeur, int):
+        return {"intValue": str(valeur)}
+    if isinstance(valeur, float):
+        return {"doubleValue": valeur}
+    if isinstance(valeur, (list, tuple)):
+        return {"arrayValue": {"values": [_valeur_otlp(v) for v in valeur]}}
+    return {"stringValue": str(valeur)}
+
+
+def _attributs_otlp(attributs: dict):
+    return [{"key": cle, "value": _valeur_otlp(valeur)} for cle, valeur in attributs.items() if valeur is not None]
+
+
+def requete_otlp(trace: Trace, spans: list):
+    """Spans au format OTLP/JSON (ExportTraceServiceRequest)."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": _attributs_otlp({"service.name": NOM_SERVICE})},
+        "scopeSpans": [{"scope": {"name": "traces"}, "spans": [{
+            "traceId": f"{trace.id:032x}",
+            "spanId": f"{s.id:016x}",
+            "parentSpanId": "" if s.parent is None else f"{s.parent:016x}",
+            "name": s.nom,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(s.debut_ns),
+            "endTimeUnixNano": str(s.fin_ns),
+            "attributes": _attributs_otlp(s.attributs),
+            "events": [{"timeUnixNano": str(t), "name": message,
+                        "attributes": _attributs_otlp({"niveau": niveau, **attributs})}
+                       for t, niveau, message, attributs in s.evenements],
+            "status": {"code": 2, "message": str(s.attributs.get("erreur", ""))} if s.statut == "erreur" else {"code": 1},
+        } for s in spans]}],
+    }]}
+
+
+def exporter(trace: Trace, format_export: str, chemin: str):
+    """
+    Ajoute à `chemin` les spans de la trace terminés depuis le dernier export, au format
+    "jsonl" (un span par ligne) ou "otlp" (une requête OTLP/JSON par ligne). Les erreurs
+    d'écriture sont ignorées : l'instrumentation ne doit jamais faire échouer une action.
+    """
+    spans = trace.a_exporter()
+    if not spans:
+        return
+    if format_export == "otlp":
+        texte = json.dumps(requete_otlp(trace, spans), ensure_ascii=False) + "\n"
+    else:
+        texte = "".join(ligne + "\n" for ligne in lignes_jsonl(trace, spans))
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(chemin)), exist_ok=True)
+        with open(chemin, "a", encoding="utf-8") as f:
+            f.write(texte)
+    except OSError:
+        pass
+
+
+def cascade(trace: Trace):
+    """
+    Lignes de la cascade (waterfall) d'une trace : un span terminé par ligne, dans l'ordre
+    de l'arbre, avec libellé indenté selon la profondeur, début et fin relatifs (ms).
+    """
+    spans = trace.spans_termines()
+    if not spans:
+        return []
+    enfants = {}
+    for s in spans:
+        enfants.setdefault(s.parent, []).append(s)
+    origine = spans[0].debut_ns
+    lignes, libelles = [], set()
+
+    def parcourir(s, profondeur):
+        precision = s.attributs.get("localisation") or s.attributs.get("modele") or s.attributs.get("format")
+        libelle = "\u00a0\u00a0" * profondeur + s.nom + (f" · {precision}" if precision else "")
+        n = 1
+        while libelle in libelles:
+            n += 1
+            libelle = "\u00a0\u00a0" * profondeur + s.nom + (f" · {precision}" if precision else "") + f" ({n})"
+        libelles.add(libelle)
+        lignes.append({"etape": libelle, "debut_ms": (s.debut_ns - origine) / 1e6, "fin_ms": (s.fin_ns - origine) / 1e6,
+                       "duree_ms": round(s.duree_ms, 2), "statut": s.statut, "ordre": len(lignes)})
+        for enfant in enfants.get(s.id, []):
+            parcourir(enfant, profondeur + 1)
+
+    ids = {s.id for s in spans}
+    for racine in (s for s in spans if s.parent is None or s.parent not in ids):
+        parcourir(racine, 0)
+    return lignes
+
+
+def evenements(trace: Trace):
+    """Événements de tous les spans terminés, par ordre chronologique : (temps_ns, niveau, étape, message, attributs)."""
+    return sorted(((t, niveau, s.nom, message, attributs)
+                   for s in trace.spans_termines() for t, niveau, message, attributs in s.evenements),
+                  key=lambda e: e[0])  # Tri stable : les égalités gardent l'ordre d'enregistrement